@@ -0,0 +1,250 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.read import read_archive
+from homeconnect_watcher.session import (
+    ACTIVE_OPERATION_STATES,
+    ACTIVE_PROGRAM,
+    OPERATION_STATE,
+    PROGRAM_FINISHED,
+    REMAINING_PROGRAM_TIME,
+    SESSION_TIMEOUT,
+    Session,
+    _text,
+)
+
+try:
+    import numpy as np  # ty: ignore[unresolved-import]
+except ImportError as e:
+    raise ImportError("The analytics module requires numpy; run `pip install 'homeconnect-watcher[analytics]'`.") from e
+
+RUN = "BSH.Common.EnumType.OperationState.Run"
+PRESENT = "BSH.Common.EnumType.EventPresentState.Present"
+
+
+def _codes(values: list[str]) -> tuple[list[str], "np.ndarray"]:
+    """Encode strings as codes into their sorted categories, so that codes compare like the strings."""
+    categories, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+    return list(categories), codes.astype(np.int32)
+
+
+@dataclass
+class EventTable:
+    """
+    Events in columnar arrays, sorted by appliance, timestamp and event name.
+
+    The events have a row each, with their appliance and event type as codes into `appliances` and `event_types`.
+    Their items are held in long format, with a row per key/value pair: the row of the event, the key as a code
+    into `keys`, and the value as text (like the ->> operator in PostgreSQL) as a code into `texts`, or -1 if null.
+    Numeric values are also held as floats, and NaN otherwise.
+    """
+
+    appliances: list[str]
+    event_types: list[str]
+    keys: list[str]
+    texts: list[str]
+    timestamp: "np.ndarray"  # float64
+    appliance: "np.ndarray"  # int32
+    event: "np.ndarray"  # int32
+    item_row: "np.ndarray"  # int64
+    item_key: "np.ndarray"  # int32
+    item_text: "np.ndarray"  # int32
+    item_number: "np.ndarray"  # float64
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    @classmethod
+    def from_events(cls, events: Iterable[HomeConnectEvent]) -> "EventTable":
+        timestamps, appliances, event_types = [], [], []
+        item_rows, keys, texts, numbers = [], [], [], []
+        for event in events:
+            row = len(timestamps)
+            timestamps.append(event.timestamp)
+            appliances.append(event.appliance_id or "")
+            event_types.append(event.event)
+            for key, value in event.items.items():
+                item_rows.append(row)
+                keys.append(key)
+                texts.append(_text(value))
+                numbers.append(value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan)
+        # The events are sorted like the window functions of the views, and like the Sessionizer expects them.
+        appliance_categories, appliance = _codes(appliances)
+        event_categories, event = _codes(event_types)
+        timestamp = np.array(timestamps, dtype=np.float64)
+        order = np.lexsort((event, timestamp, appliance))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+
+        key_categories, key = _codes(keys)
+        text_categories, text = _codes([t for t in texts if t is not None])
+        item_text = np.full(len(texts), -1, dtype=np.int32)
+        item_text[np.array([t is not None for t in texts], dtype=bool)] = text
+        item_row = rank[np.array(item_rows, dtype=np.int64)] if item_rows else np.zeros(0, dtype=np.int64)
+        item_order = np.argsort(item_row, kind="stable")
+        return cls(
+            appliances=appliance_categories,
+            event_types=event_categories,
+            keys=key_categories,
+            texts=text_categories,
+            timestamp=timestamp[order],
+            appliance=appliance[order],
+            event=event[order],
+            item_row=item_row[item_order],
+            item_key=key[item_order],
+            item_text=item_text[item_order],
+            item_number=np.array(numbers, dtype=np.float64)[item_order],
+        )
+
+    @classmethod
+    def from_archive(cls, path: Path, start: float | None = None, end: float | None = None) -> "EventTable":
+        """Load the events from the jsonl files in a directory (see read_archive)."""
+        return cls.from_events(read_archive(path, start=start, end=end))
+
+    def text_code(self, text: str) -> int:
+        """The code of a text value, or -2 if it does not occur, which matches no value."""
+        index = int(np.searchsorted(self.texts, text)) if self.texts else 0
+        return index if index < len(self.texts) and self.texts[index] == text else -2
+
+    def column(self, key: str) -> tuple["np.ndarray", "np.ndarray"]:
+        """The text codes of the values of a key per event, or -1, and whether the events have the key."""
+        text = np.full(len(self), -1, dtype=np.int32)
+        present = np.zeros(len(self), dtype=bool)
+        index = int(np.searchsorted(self.keys, key)) if self.keys else 0
+        if index < len(self.keys) and self.keys[index] == key:
+            mask = self.item_key == index
+            text[self.item_row[mask]] = self.item_text[mask]
+            present[self.item_row[mask]] = True
+        return text, present
+
+    def numbers(self, key: str) -> "np.ndarray":
+        """The numeric values of a key per event, or NaN, e.g. for the energy consumption of each program."""
+        number = np.full(len(self), np.nan)
+        index = int(np.searchsorted(self.keys, key)) if self.keys else 0
+        if index < len(self.keys) and self.keys[index] == key:
+            mask = self.item_key == index
+            number[self.item_row[mask]] = self.item_number[mask]
+        return number
+
+    def is_event(self, *event_types: str) -> "np.ndarray":
+        codes = [self.event_types.index(event) for event in event_types if event in self.event_types]
+        return np.isin(self.event, codes)
+
+    def active_labels(self) -> "np.ndarray":
+        """Whether each event shows the appliance running a program: 1, 0 or -1 if unknown; see active_label."""
+        operation_state, _ = self.column(OPERATION_STATE)
+        active_program, _ = self.column(ACTIVE_PROGRAM)
+        remaining, has_remaining = self.column(REMAINING_PROGRAM_TIME)
+        program_finished, _ = self.column(PROGRAM_FINISHED)
+        active_states = [self.text_code(state) for state in ACTIVE_OPERATION_STATES]
+        label = np.where(operation_state >= 0, np.isin(operation_state, active_states), -1).astype(np.int8)
+        running = (active_program >= 0) & (~has_remaining | ((remaining >= 0) & (remaining != self.text_code("0"))))
+        label[running] = 1
+        label[program_finished == self.text_code(PRESENT)] = 0
+        label[self.is_event("CONNECTED", "DISCONNECTED", "GAP")] = 0
+        return label
+
+
+def _group_start(first: "np.ndarray") -> "np.ndarray":
+    """For every row, the index of the first row of its group, given whether each row starts a group."""
+    return np.maximum.accumulate(np.where(first, np.arange(len(first)), 0))
+
+
+def _forward_fill(valid: "np.ndarray", group_start: "np.ndarray") -> "np.ndarray":
+    """For every row, the index of the last valid row up to it within its group, or -1."""
+    index = np.maximum.accumulate(np.where(valid, np.arange(len(valid)), -1))
+    return np.where(index >= group_start, index, -1)
+
+
+def _group_cumsum(values: "np.ndarray", group_start: "np.ndarray") -> "np.ndarray":
+    total = np.cumsum(values, dtype=np.int64)
+    return total - total[group_start] + values[group_start]
+
+
+def session_ids(table: EventTable) -> tuple["np.ndarray", "np.ndarray"]:
+    """
+    The active state and session id of every event, as in v_raw_events_session_id, using vectorized operations.
+
+    Returns whether each event is active, and its session id, which is -1 where the view has NULL.
+    """
+    n = len(table)
+    index = np.arange(n)
+    first = np.ones(n, dtype=bool)
+    first[1:] = table.appliance[1:] != table.appliance[:-1]
+    group_start = _group_start(first)
+    previous = np.maximum(index - 1, 0)
+
+    # Forward fill the active labels, see sql/2_raw_events_active.sql.
+    label = table.active_labels()
+    filled = _forward_fill(label >= 0, group_start)
+    is_active = np.where(filled >= 0, label[np.maximum(filled, 0)], 0).astype(bool)
+    was_active = is_active[previous]
+
+    # The basic sessions, within which the active program is forward filled.
+    basic_start = is_active & ~was_active & ~first
+    basic_id = np.where(first & is_active, -1, _group_cumsum(basic_start.astype(np.int64), group_start))
+    basic_first = first.copy()
+    basic_first[1:] |= basic_id[1:] != basic_id[:-1]
+    own_program, _ = table.column(ACTIVE_PROGRAM)
+    program_row = _forward_fill(own_program >= 0, _group_start(basic_first))
+    program = np.where(program_row >= 0, own_program[np.maximum(program_row, 0)], -1)
+
+    # The session starts, with three-valued logic as in sql/3_raw_events_with_session_id.sql.
+    timestamp = table.timestamp
+    gap = timestamp - timestamp[previous]
+    starts = (is_active & ~was_active & (gap > 0)) | (is_active & (gap > SESSION_TIMEOUT))
+    has_programs = (program >= 0) & (program[previous] >= 0) & ~first
+    starts = (starts | (has_programs & (program != program[previous]))) & ~first
+    known = (starts | has_programs) & ~first
+    session_id = _group_cumsum(starts.astype(np.int64), group_start)
+    session_id[_group_cumsum(known.astype(np.int64), group_start) == 0] = -1
+    return is_active, session_id
+
+
+def sessions(table: EventTable) -> list[Session]:
+    """
+    Group the events into sessions, as in v_sessions, using vectorized operations.
+
+    The sessions are identical to those of the Sessionizer, except that they have no details.
+    """
+    is_active, session_id = session_ids(table)
+    operation_state, _ = table.column(OPERATION_STATE)
+    own_program, _ = table.column(ACTIVE_PROGRAM)
+    has_items = np.zeros(len(table), dtype=bool)
+    has_items[table.item_row] = True
+    rows = np.flatnonzero(is_active & has_items)
+    if len(rows) == 0:
+        return []
+    appliance, session = table.appliance[rows], session_id[rows]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (appliance[1:] != appliance[:-1]) | (session[1:] != session[:-1])
+    starts = np.flatnonzero(first)
+    ends = np.append(starts[1:], len(rows)) - 1
+    timestamp = table.timestamp[rows]
+
+    run = np.where(operation_state[rows] == table.text_code(RUN), timestamp, np.inf)
+    run_timestamp = np.minimum.reduceat(run, starts)
+    # Programs are compared by their name, e.g. "Cotton" of "LaundryCare.Washer.Program.Cotton".
+    names, name_codes = _codes([table.texts[code].rsplit(".", 1)[-1] for code in own_program[rows] if code >= 0])
+    name = np.full(len(rows), len(names), dtype=np.int64)
+    name[own_program[rows] >= 0] = name_codes
+    program = np.minimum.reduceat(name, starts)
+
+    return [
+        Session(
+            appliance_id=table.appliances[appliance[start]],
+            session_id=None if session[start] < 0 else int(session[start]),
+            trigger_time=_datetime(timestamp[start]),
+            start_time=_datetime(timestamp[start] if np.isinf(run_timestamp[i]) else run_timestamp[i]),
+            end_time=_datetime(timestamp[end]),
+            program=names[program[i]] if program[i] < len(names) else None,
+        )
+        for i, (start, end) in enumerate(zip(starts, ends))
+    ]
+
+
+def _datetime(timestamp: Any) -> datetime:
+    return datetime.fromtimestamp(float(timestamp)).astimezone()
@@ -1,28 +1,126 @@
-from contextlib import ExitStack
+from asyncio import Task, create_task, gather, sleep
+from contextlib import AsyncExitStack
+from logging import getLogger
+from typing import AsyncGenerator
 
 from dotenv import load_dotenv
 
 from homeconnect_watcher.client.client import HomeConnectClient, HomeConnectSimulationClient
-from homeconnect_watcher.exporter.base import BaseExporter
+from homeconnect_watcher.db import LeaseCoordinator
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.exporter.base import BaseAsyncExporter, BaseExporter
+from homeconnect_watcher.pipeline import DropPolicy, ExportPipeline
 from homeconnect_watcher.utils import Metrics
 
 load_dotenv()
+logger = getLogger(__name__)
 
 
-async def loop(client: HomeConnectClient, exporters: list[BaseExporter], metrics: Metrics | None = None):
-    if isinstance(client, HomeConnectSimulationClient):
-        await client.authenticate("username", "password")
+async def loop(
+    client: HomeConnectClient | list[HomeConnectClient],
+    exporters: list[BaseExporter | BaseAsyncExporter],
+    metrics: Metrics | None = None,
+    queue_size: int = 10_000,
+    batch_size: int = 500,
+    drop_policy: DropPolicy = DropPolicy.BLOCK,
+    restart_delay: int = 60,
+    coordinator: LeaseCoordinator | None = None,
+):
+    """
+    Watch the appliances of one or more clients, and export their events.
+
+    With a list of clients, e.g. for several accounts, all clients are watched concurrently and share the
+    exporters. A client that fails is restarted after `restart_delay` seconds, so that it does not stop the others.
+    With a coordinator, only the clients of the accounts leased by this worker are watched; the accounts are
+    named after the token caches of the clients.
+    """
+    clients = client if isinstance(client, list) else [client]
+    for c in clients:
+        if isinstance(c, HomeConnectSimulationClient):
+            await c.authenticate("username", "password")
 
     if len(exporters) == 0:
         raise ValueError("No exporters defined.")
-    with ExitStack() as stack:
+    async with AsyncExitStack() as stack:
         for exporter in exporters:
-            stack.enter_context(exporter)
+            if isinstance(exporter, BaseAsyncExporter):
+                await stack.enter_async_context(exporter)
+            else:
+                stack.enter_context(exporter)
+        if coordinator is not None:
+            await stack.enter_async_context(coordinator)
+
+        async with ExportPipeline(
+            exporters, max_size=queue_size, batch_size=batch_size, drop_policy=drop_policy, metrics=metrics
+        ) as pipeline:
+            if coordinator is not None:
+                await _coordinate(clients, coordinator, pipeline, metrics, restart_delay=restart_delay)
+            elif isinstance(client, list):
+                await gather(*(_supervise(c, pipeline, metrics, restart_delay=restart_delay) for c in clients))
+            else:
+                async for event in _watch(client, metrics):
+                    await pipeline.put(event)
+
+
+async def _watch(client: HomeConnectClient, metrics: Metrics | None) -> AsyncGenerator[HomeConnectEvent, None]:
+    if metrics is not None:
+        for appliance in await client.appliances:
+            metrics.init_labels(appliance_id=appliance.appliance_id)
+    async for event in client.watch():
+        yield event
+
+
+async def _supervise(
+    client: HomeConnectClient, pipeline: ExportPipeline, metrics: Metrics | None, restart_delay: int
+) -> None:
+    """Watch a client, restarting it when it fails. Failures of the exporters are raised."""
+    while True:
+        events = _watch(client, metrics)
+        try:
+            while True:
+                try:
+                    event = await anext(events)
+                except StopAsyncIteration:
+                    return
+                except Exception:
+                    logger.exception(f"Watching {client.token_cache} failed. Restarting in {restart_delay} seconds.")
+                    break
+                await pipeline.put(event)
+        finally:
+            await events.aclose()
+        await sleep(restart_delay)
 
-        if metrics is not None:
-            for appliance in await client.appliances:
-                metrics.init_labels(appliance_id=appliance.appliance_id)
 
-        async for event in client.watch():
-            for exporter in exporters:
-                exporter.export(event)
+async def _coordinate(
+    clients: list[HomeConnectClient],
+    coordinator: LeaseCoordinator,
+    pipeline: ExportPipeline,
+    metrics: Metrics | None,
+    restart_delay: int,
+) -> None:
+    """Watch the clients of the accounts leased by this worker, starting and stopping them as leases change."""
+    by_account = {client.token_cache.name: client for client in clients}
+    tasks: dict[str, Task] = {}
+    try:
+        while True:
+            accounts = await coordinator.rebalance()
+            for account in set(tasks) - accounts:
+                logger.info(f"Releasing account {account}.")
+                task = tasks.pop(account)
+                task.cancel()
+                # Stop watching the account before another worker can take it over.
+                await gather(task, return_exceptions=True)
+            for account in sorted(accounts - set(tasks)):
+                logger.info(f"Watching account {account}.")
+                tasks[account] = create_task(
+                    _supervise(by_account[account], pipeline, metrics, restart_delay=restart_delay)
+                )
+            for task in tasks.values():
+                if task.done():
+                    task.result()  # Raise failures of the exporters.
+            await sleep(coordinator.renew_interval)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        # Close the clients before the coordinator and the exporters are.
+        await gather(*tasks.values(), return_exceptions=True)
@@ -0,0 +1,130 @@
+import zlib
+from dataclasses import dataclass
+from json import dumps, loads
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from struct import Struct
+from typing import Iterator
+
+from homeconnect_watcher.event import HomeConnectEvent
+
+try:
+    import zstandard  # ty: ignore[unresolved-import]
+except ImportError:
+    zstandard = None
+
+# A block file starts with a header of MAGIC, the format version and the codec of its blocks. It is followed by
+# blocks, each consisting of a BLOCK_HEADER and the compressed payload. The payload is compact JSON holding a
+# table of the event names and appliance ids in the block, and the events with indices into that table.
+# As the block headers hold the time range of every block, readers can skip blocks without decompressing them.
+MAGIC = b"HCWB"
+VERSION = 1
+FILE_HEADER = Struct("<4sBB")  # magic, version, codec
+BLOCK_HEADER = Struct("<IIdd")  # payload length, number of events, first timestamp, last timestamp
+SUFFIX = ".hcwb"
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+
+def default_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def compress(payload: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Writing zstd blocks requires zstandard; run `pip install zstandard`.")
+        return zstandard.ZstdCompressor(level=10).compress(payload)
+    return zlib.compress(payload, level=9)
+
+
+def decompress(payload: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Reading zstd blocks requires zstandard; run `pip install zstandard`.")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return zlib.decompress(payload)
+
+
+def encode_block(events: list[HomeConnectEvent], codec: int) -> bytes:
+    """Encode events into a block, including its header."""
+    strings: dict[str, int] = {}
+    records = []
+    for event in events:
+        appliance = -1 if event.appliance_id is None else strings.setdefault(event.appliance_id, len(strings))
+        records.append(
+            [event.timestamp, strings.setdefault(event.event, len(strings)), appliance, event.data, event.error]
+        )
+    payload = compress(dumps([list(strings), records], separators=(",", ":")).encode(), codec)
+    timestamps = [event.timestamp for event in events]
+    return BLOCK_HEADER.pack(len(payload), len(events), min(timestamps), max(timestamps)) + payload
+
+
+def decode_block(payload: bytes, codec: int) -> list[HomeConnectEvent]:
+    strings, records = loads(decompress(payload, codec))
+    return [
+        HomeConnectEvent(
+            event=strings[event],
+            timestamp=timestamp,
+            appliance_id=None if appliance < 0 else strings[appliance],
+            data=data,
+            error=error,
+        )
+        for timestamp, event, appliance, data, error in records
+    ]
+
+
+@dataclass
+class Block:
+    offset: int  # Of the payload.
+    length: int
+    n_events: int
+    first_timestamp: float
+    last_timestamp: float
+
+
+def file_header(codec: int) -> bytes:
+    return FILE_HEADER.pack(MAGIC, VERSION, codec)
+
+
+def read_file_header(buffer: bytes | mmap) -> int:
+    """Validate the file header and return the codec."""
+    magic, version, codec = FILE_HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a block file, or of an unsupported version.")
+    return codec
+
+
+def iter_blocks(buffer: bytes | mmap) -> Iterator[Block]:
+    """Iterate over the block headers; a block that was not written completely ends the iteration."""
+    offset = FILE_HEADER.size
+    while offset + BLOCK_HEADER.size <= len(buffer):
+        length, n_events, first_timestamp, last_timestamp = BLOCK_HEADER.unpack_from(buffer, offset)
+        offset += BLOCK_HEADER.size
+        if offset + length > len(buffer):
+            return
+        yield Block(offset, length, n_events, first_timestamp, last_timestamp)
+        offset += length
+
+
+def read_block_file(path: Path, start: float | None = None, end: float | None = None) -> Iterator[HomeConnectEvent]:
+    """
+    Read the events from a block file, in the order in which they were written.
+
+    Only the blocks that overlap with [start, end) are decompressed, and only their events within that range
+    are yielded.
+    """
+    with path.open("rb") as fp:
+        if path.stat().st_size < FILE_HEADER.size:
+            return
+        with mmap(fp.fileno(), 0, access=ACCESS_READ) as buffer:
+            codec = read_file_header(buffer)
+            for block in iter_blocks(buffer):
+                if (start is not None and block.last_timestamp < start) or (
+                    end is not None and block.first_timestamp >= end
+                ):
+                    continue
+                for event in decode_block(buffer[block.offset : block.offset + block.length], codec):
+                    if (start is None or event.timestamp >= start) and (end is None or event.timestamp < end):
+                        yield event
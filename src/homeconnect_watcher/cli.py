@@ -1,32 +1,46 @@
 from asyncio import run as async_run
-from datetime import timedelta
+from datetime import datetime, timedelta
+from logging import getLogger
+from multiprocessing import get_context
+from multiprocessing.process import BaseProcess
 from pathlib import Path
-from typing import Annotated, Optional
+from socket import gethostname
+from time import monotonic, sleep
+from typing import Annotated, Any, Optional
 
 from fastapi import FastAPI
 from fastapi.responses import Response
-from typer import Option, Typer
+from typer import BadParameter, Option, Typer
 from uvicorn import run
 
 from homeconnect_watcher.api import loop
 from homeconnect_watcher.client.client import HomeConnectClient, HomeConnectSimulationClient
-from homeconnect_watcher.db import WatcherDBClient
+from homeconnect_watcher.db import LeaseCoordinator, SQLiteDBClient, WatcherDBClient, connect_db
+from homeconnect_watcher.db.sqlite import is_sqlite
 from homeconnect_watcher.db.utils import clean_schema
-from homeconnect_watcher.exporter.base import BaseExporter
-from homeconnect_watcher.exporter.file import FileExporter
-from homeconnect_watcher.exporter.postgres import PGExporter
-from homeconnect_watcher.read import read_events
+from homeconnect_watcher.exporter.base import BaseAsyncExporter, BaseExporter
+from homeconnect_watcher.exporter.block import BlockFileExporter
+from homeconnect_watcher.exporter.file import FileExporter, LogFormat
+from homeconnect_watcher.exporter.parquet import ParquetExporter
+from homeconnect_watcher.exporter.postgres import AsyncPGExporter
+from homeconnect_watcher.exporter.sqlite import SQLiteExporter
+from homeconnect_watcher.loader import BulkLoader
+from homeconnect_watcher.pipeline import DropPolicy
+from homeconnect_watcher.read import log_files, read_archive, read_events
+from homeconnect_watcher.session import RecordType, Session, Sessionizer
 from homeconnect_watcher.utils import LogLevel, Metrics, initialize_logging
 
 app = Typer()
+logger = getLogger(__name__)
 
 
 @app.command()
 def authorize(
     log_level: LogLevel = Option(LogLevel.INFO, envvar="HCW_LOGLEVEL"),
+    token: Path = Option(Path("token"), help="The token cache to write, e.g. one per account."),
 ):
     initialize_logging(level=log_level)
-    client = HomeConnectClient()
+    client = HomeConnectClient(token_cache=token)
 
     api = FastAPI()
 
@@ -49,17 +63,145 @@ def watch(
     log_level: LogLevel = Option(LogLevel.INFO, envvar="HCW_LOGLEVEL"),
     metrics_port: Optional[int] = Option(None, envvar="HCW_METRICS_PORT"),
     log_path: Annotated[Optional[str], Option(envvar="HOMECONNECT_PATH")] = None,
+    log_format: LogFormat = Option(LogFormat.JSONL, envvar="HCW_LOG_FORMAT"),
+    flush_events: Optional[int] = Option(
+        None, envvar="HCW_FLUSH_EVENTS", help="Also flush the jsonl logs after this many events."
+    ),
+    fsync: bool = Option(False, envvar="HCW_FSYNC", help="Sync the jsonl logs to disk at every flush."),
+    max_file_size: Optional[int] = Option(
+        None, envvar="HCW_MAX_FILE_SIZE", help="Roll the jsonl logs over into a new file after this many bytes."
+    ),
     db_uri: Annotated[Optional[str], Option(envvar="HCW_DB_URI")] = None,
+    queue_size: int = Option(10_000, envvar="HCW_QUEUE_SIZE"),
+    batch_size: int = Option(500, envvar="HCW_BATCH_SIZE"),
+    drop_policy: DropPolicy = Option(DropPolicy.BLOCK, envvar="HCW_DROP_POLICY"),
+    token: Annotated[
+        Optional[list[Path]],
+        Option(envvar="HCW_TOKENS", help="The token caches of the accounts to watch; repeat for several accounts."),
+    ] = None,
+    shard: bool = Option(
+        False, envvar="HCW_SHARD", help="Share the accounts with the other watchers on the database at --db-uri."
+    ),
+    workers: int = Option(1, envvar="HCW_WORKERS", help="The number of worker processes; implies --shard."),
 ):
     initialize_logging(level=log_level)
+    options: dict[str, Any] = dict(
+        simulation=simulation,
+        flush_interval=flush_interval,
+        metrics_port=metrics_port,
+        log_path=log_path,
+        log_format=log_format,
+        flush_events=flush_events,
+        fsync=fsync,
+        max_file_size=max_file_size,
+        db_uri=db_uri,
+        queue_size=queue_size,
+        batch_size=batch_size,
+        drop_policy=drop_policy,
+        token=token,
+    )
+    if not (shard or workers > 1):
+        _watch(worker=None, **options)
+        return
+    if db_uri is None or is_sqlite(db_uri) or not token:
+        raise BadParameter("Sharding requires a PostgreSQL --db-uri and at least one --token.")
+    if workers == 1:
+        _watch(worker=f"{gethostname()}-0", **options)
+        return
+    # Run a worker per process, and restart workers that die. Their accounts are taken over by the
+    # others in the meantime.
+    context = get_context("spawn")
+    processes: dict[int, BaseProcess] = {}
+    try:
+        while True:
+            for index in range(workers):
+                if index not in processes or not processes[index].is_alive():
+                    if index in processes:
+                        logger.warning(f"Worker {index} exited with code {processes[index].exitcode}; restarting.")
+                    worker_options = options | dict(
+                        metrics_port=metrics_port + index if metrics_port else None, log_level=log_level
+                    )
+                    processes[index] = context.Process(
+                        target=_watch_process, args=(f"{gethostname()}-{index}",), kwargs=worker_options
+                    )
+                    processes[index].start()
+            sleep(10)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+
+
+def _watch_process(worker: str, log_level: LogLevel, **options) -> None:
+    initialize_logging(level=log_level)
+    _watch(worker=worker, **options)
+
+
+def _watch(
+    worker: str | None,
+    simulation: bool,
+    flush_interval: int,
+    metrics_port: int | None,
+    log_path: str | None,
+    log_format: LogFormat,
+    flush_events: int | None,
+    fsync: bool,
+    max_file_size: int | None,
+    db_uri: str | None,
+    queue_size: int,
+    batch_size: int,
+    drop_policy: DropPolicy,
+    token: list[Path] | None,
+) -> None:
+    """Run a watcher; with a worker name, it only watches the accounts that it leases."""
     metrics = Metrics(port=metrics_port) if metrics_port else None
-    client = (HomeConnectSimulationClient if simulation else HomeConnectClient)(metrics=metrics)
-    exporters: list[BaseExporter] = []
+    client_class = HomeConnectSimulationClient if simulation else HomeConnectClient
+    client: HomeConnectClient | list[HomeConnectClient]
+    if token:
+        client = [
+            client_class(token_cache=path, metrics=metrics.for_account(path.stem) if metrics else None)
+            for path in token
+        ]
+    else:
+        client = client_class(metrics=metrics)
+    exporters: list[BaseExporter | BaseAsyncExporter] = []
     if log_path is not None:
-        exporters.append(FileExporter(path=Path(log_path), flush_interval=timedelta(seconds=flush_interval)))
-    if db_uri is not None:
-        exporters.append(PGExporter(connection_string=db_uri))
-    async_run(loop(client, exporters, metrics=metrics))
+        # Workers write to their own directory, as they cannot share log files.
+        path = Path(log_path) if worker is None else Path(log_path) / worker
+        path.mkdir(parents=True, exist_ok=True)
+        if log_format == LogFormat.JSONL:
+            exporters.append(
+                FileExporter(
+                    path=path,
+                    flush_interval=timedelta(seconds=flush_interval),
+                    flush_events=flush_events,
+                    fsync=fsync,
+                    max_size=max_file_size,
+                )
+            )
+        else:
+            exporter_class = BlockFileExporter if log_format == LogFormat.BLOCKS else ParquetExporter
+            exporters.append(exporter_class(path=path, flush_interval=timedelta(seconds=flush_interval)))
+    coordinator = None
+    if db_uri is not None and is_sqlite(db_uri):
+        exporters.append(SQLiteExporter(connection_string=db_uri))
+    elif db_uri is not None:
+        exporters.append(AsyncPGExporter(connection_string=db_uri))
+        if worker is not None and isinstance(client, list):
+            accounts = [c.token_cache.name for c in client]
+            coordinator = LeaseCoordinator(connection_string=db_uri, worker=worker, accounts=accounts)
+    async_run(
+        loop(
+            client,
+            exporters,
+            metrics=metrics,
+            queue_size=queue_size,
+            batch_size=batch_size,
+            drop_policy=drop_policy,
+            coordinator=coordinator,
+        )
+    )
 
 
 @app.command()
@@ -67,23 +209,148 @@ def load(
     db_uri: Annotated[str, Option(envvar="HCW_DB_URI")],
     log_path: Annotated[str, Option(envvar="HOMECONNECT_PATH")],
     clean: bool = False,
+    batch_size: int = 10_000,
+    processes: Optional[int] = None,
+    connections: int = 2,
+    full: bool = Option(False, help="Reload all files, ignoring what has been loaded before."),
 ):
-    exporter = PGExporter(connection_string=db_uri)
+    """
+    Load the event logs into the database, continuing where the previous load of each file left off.
+
+    A file that has grown is only verified by its first and last 64 KiB before the part that was loaded, so a file
+    that was also changed in between is not reloaded; use --full for that. A changed file that has not grown is
+    reloaded completely, skipping the events that are already in the database.
+    """
+    if is_sqlite(db_uri):
+        _load_sqlite(db_uri, Path(log_path))
+        return
+    client = WatcherDBClient(connection_string=db_uri)
     if clean:
-        with exporter:
-            clean_schema(connection=exporter.connection)
-    with exporter:
-        count_before = exporter.event_count
-        n_events = 0
+        with client:
+            clean_schema(connection=client.connection)
+    with client:
+        count_before = client.event_count
+        loader = BulkLoader(
+            connection_string=db_uri, batch_size=batch_size, processes=processes, connections=connections
+        )
+        report = loader.load(log_files(Path(log_path)), incremental=not full, root=Path(log_path))
+        print(report)
+        added = client.event_count - count_before
+        print(f"Added {added} of {report.n_events} events.")
+        if added:
+            # Loaded events may predate the sessions watermarks, of which the sessions are then recomputed.
+            client.update_sessions(since=report.first_timestamps)
+
+
+def _load_sqlite(db_uri: str, log_path: Path) -> None:
+    """Load the event logs into a SQLite database, a file per transaction; existing events are skipped."""
+    with SQLiteDBClient(connection_string=db_uri) as client:
+        count_before, n_events = client.event_count, 0
+        first_timestamps: dict[str, datetime] = {}
+        for events in read_events(log_path, dedup=True):
+            client.write_events(events)
+            n_events += len(events)
+            for event in events:
+                if event.appliance_id and (
+                    event.appliance_id not in first_timestamps or event.datetime < first_timestamps[event.appliance_id]
+                ):
+                    first_timestamps[event.appliance_id] = event.datetime
+        added = client.event_count - count_before
+        print(f"Added {added} of {n_events} events.")
+        if added:
+            client.update_sessions(since=first_timestamps)
+
+
+@app.command()
+def convert(
+    log_path: Annotated[str, Option(envvar="HOMECONNECT_PATH")],
+    output: Path,
+    row_group_size: int = 100_000,
+):
+    """Convert the jsonl event logs into Parquet datasets of the events and their items, by date and appliance."""
+    n_events, start = 0, monotonic()
+    with ParquetExporter(output, row_group_size=row_group_size, flush_interval=timedelta.max) as exporter:
         for events in read_events(Path(log_path)):
+            # In order of time, so that the files of each date are closed once, rather than reopened.
+            exporter.bulk_export(sorted(events, key=lambda event: event.timestamp))
             n_events += len(events)
-            exporter.bulk_export(events)
-        print(f"Added {exporter.event_count - count_before} of {n_events} events.")
+    duration = monotonic() - start
+    print(
+        f"Converted {n_events} events into {exporter.n_files} files in {duration:.1f}s "
+        f"({n_events / max(duration, 1e-9):.0f} events/s)."
+    )
+
+
+@app.command()
+def sessions(log_path: Annotated[str, Option(envvar="HOMECONNECT_PATH")], columnar: bool = False):
+    """Print the sessions in the event logs, without using a database."""
+    n_events, start = 0, monotonic()
+    if columnar:
+        # Requires numpy, through the analytics extra.
+        from homeconnect_watcher.analytics import EventTable
+        from homeconnect_watcher.analytics import sessions as columnar_sessions
+
+        table = EventTable.from_archive(Path(log_path))
+        n_events = len(table)
+        for session in columnar_sessions(table):
+            _print_session(session)
+    else:
+        sessionizer = Sessionizer()
+        for event in read_archive(Path(log_path)):
+            n_events += 1
+            for record in sessionizer.feed(event):
+                if record.type == RecordType.END:
+                    _print_session(record.session)
+        for record in sessionizer.flush():
+            _print_session(record.session)
+    duration = monotonic() - start
+    print(f"Sessionized {n_events} events in {duration:.1f}s ({n_events / max(duration, 1e-9):.0f} events/s).")
+
+
+def _print_session(session: Session) -> None:
+    print(
+        f"{session.appliance_id}\t{session.start_time.isoformat()}\t{session.end_time.isoformat()}\t"
+        f"{session.program or ''}"
+    )
+
+
+@app.command()
+def gaps(
+    db_uri: Annotated[Optional[str], Option(envvar="HCW_DB_URI")] = None,
+    log_path: Annotated[Optional[str], Option(envvar="HOMECONNECT_PATH")] = None,
+):
+    """Print the gaps in the event stream per appliance, from the database or else from the event logs."""
+    rows: list[tuple[str, datetime, datetime, str]]
+    if db_uri is not None:
+        with connect_db(db_uri, init=False) as client:
+            rows = client.gaps()
+    elif log_path is not None:
+        rows = sorted(
+            (
+                event.appliance_id or "",
+                datetime.fromtimestamp(event.data["start"]).astimezone(),
+                event.datetime,
+                event.data["reason"],
+            )
+            for event in read_archive(Path(log_path), event="GAP")
+            if event.data is not None
+        )
+    else:
+        raise BadParameter("Provide either --db-uri or --log-path.")
+    for appliance_id, start_time, end_time, reason in rows:
+        print(
+            f"{appliance_id}\t{start_time.isoformat()}\t{end_time.isoformat()}\t"
+            f"{(end_time - start_time).total_seconds():.0f}s\t{reason}"
+        )
 
 
 @app.command()
 def views(db_uri: Annotated[str, Option(envvar="HCW_DB_URI")], drop: bool = False):
-    with WatcherDBClient(connection_string=db_uri, init=False) as client:
+    with connect_db(db_uri, init=False) as client:
+        if isinstance(client, SQLiteDBClient):
+            client.create_views()  # Which recreates the views of SQLite in any case.
+            return
+        assert isinstance(client, WatcherDBClient)
         with client.connection.transaction():
             if drop:
                 client.drop_views()
@@ -91,6 +358,17 @@ def views(db_uri: Annotated[str, Option(envvar="HCW_DB_URI")], drop: bool = Fals
 
 
 @app.command()
-def refresh_view(db_uri: Annotated[str, Option(envvar="HCW_DB_URI")]):
+def migrate(db_uri: Annotated[str, Option(envvar="HCW_DB_URI")]):
+    """Partition the events table by month and create indexes for the views."""
+    if is_sqlite(db_uri):
+        raise BadParameter("Only PostgreSQL databases can be partitioned.")
     with WatcherDBClient(connection_string=db_uri) as client:
+        client.partition()
+        print(f"Partitioned the events table, holding {client.event_count} events.")
+
+
+@app.command()
+def refresh_view(db_uri: Annotated[str, Option(envvar="HCW_DB_URI")]):
+    with connect_db(db_uri) as client:
         client.refresh_views()
+        client.update_sessions()
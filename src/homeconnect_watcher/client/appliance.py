@@ -1,3 +1,4 @@
+from asyncio import Lock
 from time import time
 from typing import TYPE_CHECKING
 
@@ -15,6 +16,7 @@ class HomeConnectAppliance:
         self.appliance_type = appliance_type
         self._available_programs: list[str] | None = None
         self._last_update: dict[str, float] = dict()
+        self.lock = Lock()  # Held while handling a trigger.
 
     def __repr__(self) -> str:
         return f"HomeConnect{self.appliance_type}(ha_id={repr(self.appliance_id)})"
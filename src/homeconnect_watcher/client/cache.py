@@ -0,0 +1,108 @@
+from dataclasses import asdict, dataclass
+from json import dump, load
+from logging import getLogger
+from pathlib import Path
+from time import monotonic, time
+from typing import Any, Mapping
+
+# Seconds for which a response is used without making a request, by the end of its path. Responses of other
+# paths (the status, settings and programs, which are logged as events) are only used when a conditional request
+# shows that they have not been modified.
+CACHE_TTLS = {
+    "": 86400,  # The list of appliances.
+    "/programs/available": 7 * 86400,
+}
+
+
+@dataclass
+class CacheEntry:
+    data: dict[str, Any]
+    timestamp: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """The headers for a conditional request."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Cache of the responses of the appliances endpoint, by path, optionally persisted to a file.
+
+    Only responses that are used without a request (see CACHE_TTLS) or that can be validated with a conditional
+    request (those with an ETag or Last-Modified header) are stored. Changes are written to the file at most once
+    every `save_interval` seconds, and by `flush`; marking an entry as fresh does not cause a write by itself.
+    """
+
+    def __init__(self, path: Path | None = None, ttls: Mapping[str, float] = CACHE_TTLS, save_interval: float = 60.0):
+        self.logger = getLogger(self.__class__.__name__)
+        self.path = path
+        self.ttls = ttls
+        self.save_interval = save_interval
+        self._entries: dict[str, CacheEntry] = {}
+        self._dirty = False
+        self._next_save = monotonic()
+        if path is not None and path.is_file():
+            try:
+                with path.open() as cache_file:
+                    self._entries = {key: CacheEntry(**entry) for key, entry in load(cache_file).items()}
+            except (ValueError, TypeError):
+                self.logger.warning(f"Ignoring invalid response cache {path}.")
+
+    def ttl(self, key: str) -> float:
+        if key == "":
+            return self.ttls.get("", 0)
+        for suffix, ttl in self.ttls.items():
+            if suffix and key.endswith(suffix):
+                return ttl
+        return 0
+
+    def get(self, key: str) -> CacheEntry | None:
+        return self._entries.get(key)
+
+    def is_fresh(self, key: str, entry: CacheEntry) -> bool:
+        return time() - entry.timestamp < self.ttl(key)
+
+    def put(self, key: str, data: dict[str, Any], headers: Mapping[str, str]) -> None:
+        entry = CacheEntry(
+            data=data, timestamp=time(), etag=headers.get("ETag"), last_modified=headers.get("Last-Modified")
+        )
+        if self.ttl(key) > 0 or entry.headers:
+            self._entries[key] = entry
+            self._changed()
+
+    def touch(self, key: str) -> None:
+        """Mark an entry as fresh, after a conditional request showed it was not modified."""
+        self._entries[key].timestamp = time()
+        self._dirty = True
+
+    def invalidate(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self._changed()
+
+    def flush(self) -> None:
+        """Write the pending changes to the file."""
+        if self._dirty:
+            self._save()
+
+    def _changed(self) -> None:
+        self._dirty = True
+        if monotonic() >= self._next_save:
+            self._save()
+
+    def _save(self) -> None:
+        self._dirty = False
+        self._next_save = monotonic() + self.save_interval
+        if self.path is None:
+            return
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with temporary.open("w") as cache_file:
+            dump({key: asdict(entry) for key, entry in self._entries.items()}, cache_file)
+        temporary.replace(self.path)
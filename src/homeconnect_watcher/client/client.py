@@ -1,22 +1,24 @@
-from asyncio import sleep
+from asyncio import Lock, Queue, Task, create_task, gather, sleep
 from json import dump, load
 from logging import getLogger
 from os import environ
 from pathlib import Path
 from re import search
-from time import monotonic
+from time import monotonic, time
 from typing import Any, AsyncIterable
 
 from authlib.integrations.httpx_client import AsyncOAuth2Client
 from authlib.oauth2.rfc6749.wrappers import OAuth2Token
-from httpx import ReadTimeout, RemoteProtocolError, StreamError
-from requests import Session
+from httpx import AsyncClient, ReadTimeout, RemoteProtocolError, StreamError
 
 from homeconnect_watcher.client.appliance import HomeConnectAppliance
+from homeconnect_watcher.client.cache import ResponseCache
+from homeconnect_watcher.client.stream import EventStreamParser
+from homeconnect_watcher.dedup import DedupCache
 from homeconnect_watcher.event import HomeConnectEvent
 from homeconnect_watcher.exceptions import HomeConnectConnectionClosed, HomeConnectRequestError, HomeConnectTimeout
-from homeconnect_watcher.trigger import Trigger
-from homeconnect_watcher.utils import Metrics, retry, timeout
+from homeconnect_watcher.trigger import Trigger, TriggerTable
+from homeconnect_watcher.utils import Backoff, Metrics, RateLimiter, retry, timeout
 
 
 class HomeConnectClient:
@@ -39,35 +41,68 @@ class HomeConnectClient:
         )
         self.client.auth = self.client.token_auth  # ty: ignore[invalid-assignment]  # Ensure token auth everywhere.
         self._appliances: list["HomeConnectAppliance"] | None = None
+        self._appliances_lock = Lock()
+        self._refresh_task: Task | None = None
         self._last_event: float | None = None
         self.metrics = metrics
+        self.rate_limiter = RateLimiter()
+        self.response_cache = ResponseCache(self.token_cache.with_name(self.token_cache.name + ".cache.json"))
+        self.trigger_delay = 2.0  # Seconds to wait for more triggers of an appliance, to merge them.
+        self.healthy_after = 60.0  # Seconds after which an event stream is healthy, and the back-off is reset.
+        self._triggers = TriggerTable()
+        self.dedup = DedupCache()  # Of the events of the stream, which may be redelivered after a reconnect.
         if self.metrics:
             self.metrics.set_last_event(lambda: monotonic() - self._last_event if self._last_event else -1)
             self.metrics.set_n_appliances(lambda: len(self._appliances) if self._appliances else 0)
 
     @property
     async def appliances(self) -> list["HomeConnectAppliance"]:
-        if self._appliances is None:
-            self._appliances = await self._get_appliances()
-        return self._appliances
+        async with self._appliances_lock:  # Fetch the appliances only once when they are requested concurrently.
+            if self._appliances is None:
+                entry = self.response_cache.get("")
+                if entry is not None and not self.response_cache.is_fresh("", entry):
+                    # Start with the previous list of appliances, and refresh it in the background.
+                    self._appliances = self._parse_appliances(entry.data)
+                    self._start_refresh()
+                else:
+                    self._appliances = self._parse_appliances(await self._get(""))
+            return self._appliances
 
     async def get_appliance(self, appliance_id: str) -> "HomeConnectAppliance":
-        for appliance in await self.appliances:
-            if appliance.appliance_id == appliance_id:
-                return appliance
+        """Get an appliance; if it is unknown, the list of appliances is refreshed first, as it may be new."""
+        for refresh in (False, True):
+            if refresh:
+                await self.refresh_appliances()
+            for appliance in await self.appliances:
+                if appliance.appliance_id == appliance_id:
+                    return appliance
         raise KeyError(f"No such appliance: {appliance_id}")
 
     async def refresh_appliances(self) -> None:
-        """Refresh the cached list of appliances. Should only be needed if a new appliance is added."""
-        self._appliances = None
-        await self.appliances
-
-    async def _get_appliances(self) -> list["HomeConnectAppliance"]:
+        """Refresh the list of appliances. Should only be needed if an appliance is added or removed."""
+        self.response_cache.invalidate("")
         data = await self._get("")
+        async with self._appliances_lock:
+            self._appliances = self._parse_appliances(data)
+
+    def _start_refresh(self) -> None:
+        """Refresh the list of appliances in the background, unless that is already happening."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = create_task(self.refresh_appliances())
+            self._refresh_task.add_done_callback(self._log_refresh_error)
+
+    def _log_refresh_error(self, task: Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.warning("Failed to refresh the appliances.", exc_info=task.exception())
+
+    def _parse_appliances(self, data: dict[str, Any]) -> list["HomeConnectAppliance"]:
+        """Parse the list of appliances, keeping the objects (and their state) of known appliances."""
         if "error" in data:
             raise HomeConnectRequestError(data["error"])
+        known = {appliance.appliance_id: appliance for appliance in self._appliances or []}
         return [
-            HomeConnectAppliance(
+            known.get(appliance["haId"])
+            or HomeConnectAppliance(
                 client=self,
                 appliance_id=appliance["haId"],
                 appliance_type=appliance["type"],
@@ -85,7 +120,7 @@ class HomeConnectClient:
         await self._save_token(self.client.token)
 
     async def watch(
-        self, appliance_id: str | None = None, reconnect_delay: int = 120
+        self, appliance_id: str | None = None, backoff: Backoff | None = None
     ) -> AsyncIterable[HomeConnectEvent]:
         """
         Watch the status of one or all appliances.
@@ -93,29 +128,110 @@ class HomeConnectClient:
         Listens to the event stream and yield all events. In addition, processes triggers of these events
         to make requests for further details.
 
-        Automatically reconnects when disconnected or on timeout.
+        The event stream is opened right away. The initial requests, and the requests for the triggers of
+        events, are made in the background, concurrently for different appliances and within the rate limits.
+        Triggers of an appliance that arrive within `trigger_delay` seconds are merged. Events that the stream
+        delivers twice, e.g. after a reconnect, are only yielded once (see DedupCache). Events are yielded as
+        they are received or as their requests complete. The list of appliances is refreshed when an appliance
+        is paired or depaired.
+
+        Automatically reconnects when disconnected or on timeout: right away at first, and then with exponential
+        back-off (by default up to 120 seconds) while the connection keeps failing. After a reconnect, the state
+        of the appliances is requested again, as events may have been missed.
         """
-        async for event in self._initial_triggers(appliance_id=appliance_id):
-            yield event
+        # The background tasks put events on the queue, as well as initial triggers and exceptions.
+        queue: Queue[HomeConnectEvent | Trigger | Exception] = Queue()
+        tasks: set[Task] = set()
+
+        def start(items: AsyncIterable[HomeConnectEvent | Trigger] | AsyncIterable[Trigger]) -> None:
+            task = create_task(self._forward(items, queue))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        start(self._reconnecting_event_stream(appliance_id=appliance_id, backoff=backoff or Backoff()))
+        start(self._initial_triggers(appliance_id=appliance_id))
+        try:
+            while True:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, HomeConnectEvent):
+                    if self.dedup.seen(item):
+                        self.logger.debug(f"Skipping duplicate {item.event} event of {item.appliance_id}.")
+                        if self.metrics:
+                            self.metrics.increment_duplicates()
+                        continue
+                    if self.metrics:
+                        self.metrics.increment_event_counter(event=item)
+                    if item.event in ("PAIRED", "DEPAIRED"):
+                        self._start_refresh()
+                    trigger = item.trigger
+                else:
+                    trigger = item
+                if trigger is not None and self._triggers.add(trigger):
+                    start(self._handle_triggers(trigger.appliance_id))
+                if isinstance(item, HomeConnectEvent):
+                    yield item
+        finally:
+            pending = list(tasks)
+            for task in pending:
+                task.cancel()
+            await gather(*pending, return_exceptions=True)
+            self.response_cache.flush()
+
+    @staticmethod
+    async def _forward(
+        items: AsyncIterable[HomeConnectEvent | Trigger] | AsyncIterable[Trigger],
+        queue: Queue[HomeConnectEvent | Trigger | Exception],
+    ) -> None:
+        """Put items on a queue, followed by the exception if one is raised."""
+        try:
+            async for item in items:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(e)
+
+    async def _reconnecting_event_stream(
+        self, appliance_id: str | None, backoff: Backoff
+    ) -> AsyncIterable[HomeConnectEvent | Trigger]:
+        """
+        Yield the events of the event stream, and reconnect when it is closed or times out.
+
+        Reconnects follow the back-off, which is reset once a stream stayed open for `healthy_after` seconds.
+        Once a new stream has connected, i.e. has delivered its first event or keep-alive, a GAP event is yielded
+        for every appliance, recording the window since the last data of the previous stream, followed by triggers
+        to catch up on their state. Failed attempts to reconnect do not end the gap.
+        """
+        gap_start: float | None = None  # When the last data was received before a disconnect, while disconnected.
+        reason = gap_reason = ""
         while True:
+            connected = monotonic()
             try:
-                async for event in self._event_stream(appliance_id=appliance_id):
-                    async for resulting_event in self._handle_event_and_triggers(event=event):
-                        yield resulting_event
+                async for event in self._event_stream(appliance_id=appliance_id, keep_alive=True):
+                    if gap_start is not None:
+                        async for item in self._catch_up(appliance_id, gap_start=gap_start, reason=gap_reason):
+                            yield item
+                        gap_start = None
+                    if event.event != "KEEP-ALIVE":
+                        yield event
+                reason = "closed"
             except HomeConnectConnectionClosed:
-                self.logger.warning(f"Connection closed. Reconnecting in {reconnect_delay} seconds.")
-                if self.metrics:
-                    self.metrics.increment_disconnects(reason="closed")
-                await sleep(reconnect_delay)
-                continue
+                reason = "closed"
             except HomeConnectTimeout:
-                self.logger.warning(f"Connection timed out. Reconnecting in {reconnect_delay} seconds.")
-                if self.metrics:
-                    self.metrics.increment_disconnects(reason="timeout")
-                await sleep(reconnect_delay)
-                continue
+                reason = "timeout"
+            if gap_start is None:
+                gap_start, gap_reason = max(connected, self._last_event or connected), reason
+            if monotonic() - connected >= self.healthy_after:
+                backoff.reset()
+            delay = backoff.next_delay()
+            self.logger.warning(f"Connection {reason}. Reconnecting in {delay:.1f} seconds.")
+            if self.metrics:
+                self.metrics.increment_disconnects(reason=reason)
+            await sleep(delay)
 
-    async def _event_stream(self, appliance_id: str | None = None) -> AsyncIterable[HomeConnectEvent]:
+    async def _event_stream(
+        self, appliance_id: str | None = None, keep_alive: bool = False
+    ) -> AsyncIterable[HomeConnectEvent]:
         """
         Connect to an event stream and yield the events.
 
@@ -127,6 +243,8 @@ class HomeConnectClient:
                 when the connection can not be established or when there is a stream error.
             HomeConnectTimeout:
                 when no events are received in 120 seconds.
+
+        Keep-alive messages are counted in the metrics, and only yielded if `keep_alive` is set.
         """
         url = (
             f"{self._appliances_endpoint}/events"
@@ -138,11 +256,18 @@ class HomeConnectClient:
             if event_stream.status_code != 200:
                 self.logger.warning(f"Failed to connect to events endpoint. Status code: {event_stream.status_code}")
                 raise HomeConnectConnectionClosed()
+            parser = EventStreamParser(keep_alive=keep_alive)
             try:
                 async for entry in timeout(event_stream.aiter_bytes(), duration=120):
                     if entry:
-                        yield HomeConnectEvent.from_stream(entry)
                         self._last_event = monotonic()
+                        n_keep_alive = parser.n_keep_alive
+                        for event in parser.feed(entry):
+                            if self.metrics and event.event == "KEEP-ALIVE":
+                                self.metrics.increment_keep_alives(1)
+                            yield event
+                        if self.metrics and parser.n_keep_alive > n_keep_alive:
+                            self.metrics.increment_keep_alives(parser.n_keep_alive - n_keep_alive)
             except (RemoteProtocolError, StreamError) as e:
                 self.logger.warning("Stream error:", exc_info=e)
                 raise HomeConnectConnectionClosed()
@@ -150,60 +275,71 @@ class HomeConnectClient:
                 self.logger.info("Reached end of events stream.")
                 return
 
-    async def _handle_event_and_triggers(self, event: HomeConnectEvent) -> AsyncIterable[HomeConnectEvent]:
-        """
-        Handle triggers for an event and increase all corresponding counters.
+    async def _initial_triggers(self, appliance_id: str | None) -> AsyncIterable[Trigger]:
         """
-        if self.metrics:
-            self.metrics.increment_event_counter(event=event)
-        yield event
-        async for triggered_event in self._handle_trigger(event.trigger):
-            if self.metrics:
-                self.metrics.increment_event_counter(triggered_event)
-            yield triggered_event
-
-    async def _initial_triggers(self, appliance_id: str | None) -> AsyncIterable[HomeConnectEvent]:
-        """
-        Create and handle initial triggers
+        Create initial triggers
 
         If appliance_id is not None, only create requests for the single appliance. Otherwise do so
         for all known appliances.
         """
         for appliance in await self.appliances:
             if appliance_id == appliance.appliance_id or appliance_id is None:
-                async for triggered_event in self._handle_trigger(
-                    Trigger(
-                        appliance_id=appliance.appliance_id,
-                        status=True,
-                        settings=True,
-                        active_program=True,
-                        selected_program=True,
-                    )
-                ):
-                    yield triggered_event
-                    if self.metrics:
-                        self.metrics.increment_event_counter(triggered_event)
+                yield Trigger(
+                    appliance_id=appliance.appliance_id,
+                    status=True,
+                    settings=True,
+                    active_program=True,
+                    selected_program=True,
+                )
 
-    async def _handle_trigger(self, trigger: Trigger | None) -> AsyncIterable[HomeConnectEvent]:
+    async def _catch_up(
+        self, appliance_id: str | None, gap_start: float, reason: str
+    ) -> AsyncIterable[HomeConnectEvent | Trigger]:
         """
-        Handle a trigger.
+        Record a gap in the event stream, which started at `gap_start` (by the monotonic clock) and ends now,
+        and create triggers for the state that may have changed in it.
         """
-        if trigger is None:
-            return
-        appliance = await self.get_appliance(trigger.appliance_id)
-        if trigger.status:
-            if not trigger.interval or appliance.time_since_update("status") >= 300:
-                yield await appliance.get_status()
-        if trigger.settings:
-            if not trigger.interval or appliance.time_since_update("settings") >= 300:
-                yield await appliance.get_settings()
-        if await appliance.get_available_programs():  # Only if the appliance supports programs.
-            if trigger.active_program:
-                if not trigger.interval or appliance.time_since_update("active_program") >= 300:
-                    yield await appliance.get_active_program()
-            if trigger.selected_program:
-                if not trigger.interval or appliance.time_since_update("selected_program") >= 300:
-                    yield await appliance.get_selected_program()
+        gap = monotonic() - gap_start
+        if self.metrics:
+            self.metrics.observe_gap(gap)
+        now = time()
+        for appliance in await self.appliances:
+            if appliance_id == appliance.appliance_id or appliance_id is None:
+                yield HomeConnectEvent.gap(appliance_id=appliance.appliance_id, start=now - gap, end=now, reason=reason)
+                yield Trigger(
+                    appliance_id=appliance.appliance_id, status=True, active_program=True, selected_program=True
+                )
+
+    async def _handle_triggers(self, appliance_id: str) -> AsyncIterable[HomeConnectEvent]:
+        """
+        Handle the pending triggers of an appliance.
+
+        Waits `trigger_delay` seconds first, so that triggers arriving in the meantime are merged, and each
+        request is made at most once. The requests are made concurrently. Triggers of the same appliance are
+        handled one at a time, so that an interval request sees the update of the previous one.
+        """
+        await sleep(self.trigger_delay)
+        appliance = await self.get_appliance(appliance_id)
+        async with appliance.lock:
+            pending = self._triggers.pop(appliance_id)
+            needed = {
+                request_type
+                for request_type, interval in pending.items()
+                if not interval or appliance.time_since_update(request_type) >= 300
+            }
+            requests = []
+            if "status" in needed:
+                requests.append(appliance.get_status())
+            if "settings" in needed:
+                requests.append(appliance.get_settings())
+            if needed & {"active_program", "selected_program"} and await appliance.get_available_programs():
+                # Only if the appliance supports programs.
+                if "active_program" in needed:
+                    requests.append(appliance.get_active_program())
+                if "selected_program" in needed:
+                    requests.append(appliance.get_selected_program())
+            for event in await gather(*requests):
+                yield event
 
     def _load_token(self) -> OAuth2Token | None:
         """Load the OAuth token from file."""
@@ -224,14 +360,42 @@ class HomeConnectClient:
 
     @retry(n_tries=3, exceptions=(ReadTimeout,))
     async def _get(self, path: str) -> dict[str, Any]:
-        await sleep(delay=1.5)  # Rate limit
-        resp = await self.client.get(f"{self._appliances_endpoint}{path}")
+        entry = self.response_cache.get(path)
+        if entry is not None and self.response_cache.is_fresh(path, entry):
+            if self.metrics:
+                self.metrics.increment_cache(result="hit")
+            return entry.data
+        await self.rate_limiter.acquire()
+        resp = await self.client.get(
+            f"{self._appliances_endpoint}{path}", headers=entry.headers if entry is not None else None
+        )
+        if resp.status_code == 304 and entry is not None:
+            self.response_cache.touch(path)
+            if self.metrics:
+                self.metrics.increment_cache(result="not_modified")
+            return entry.data
+        if self.metrics:
+            self.metrics.increment_cache(result="miss")
+        if resp.status_code == 429:
+            retry_after = _retry_after(resp.headers.get("Retry-After"))
+            self.logger.warning(f"Rate limit exceeded. Pausing requests for {retry_after} seconds.")
+            self.rate_limiter.back_off(retry_after)
         data = resp.json()
         if len(data.keys()) > 1:
             raise KeyError(f"Unexpected keys: {data.keys()}")
+        if resp.status_code == 200:
+            self.response_cache.put(path, data, resp.headers)
         return data
 
 
+def _retry_after(value: str | None, default: float = 60.0) -> float:
+    """Parse the Retry-After header, which Home Connect sends as a number of seconds."""
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+
 class HomeConnectSimulationClient(HomeConnectClient):
     _authorize_endpoint = "https://simulator.home-connect.com/security/oauth/authorize"
     _appliances_endpoint = "https://simulator.home-connect.com/api/homeappliances"
@@ -242,37 +406,38 @@ class HomeConnectSimulationClient(HomeConnectClient):
 
     async def authenticate(self, username: str, password: str):
         """Automatic simulation login. Any username/password goes, except 'wrongPassword'."""
-        session = Session()
-        response = session.post(
-            self.authorization_url.replace("authorize", "login"),
-            data=dict(email=username, password=password),
-        )
-        grant_url = search('(/security/oauth/grant.*)" +method="post"', str(response.content))
-        if grant_url is None:
-            raise ValueError(response.content)
-        response = session.post(
-            "https://simulator.home-connect.com" + grant_url.group(1),
-            data={
-                "submit": "approve",
-                "user": "email",
-                "client_id": environ["HOMECONNECT_CLIENT_ID"],
-                "scope": "CleaningRobot CleaningRobot-Control CleaningRobot-Monitor CleaningRobot-Settings CoffeeMaker "
-                "CoffeeMaker-Control CoffeeMaker-Monitor CoffeeMaker-Settings Control CookProcessor "
-                "CookProcessor-Control CookProcessor-Monitor CookProcessor-Settings Dishwasher "
-                "Dishwasher-Control Dishwasher-Monitor Dishwasher-Settings Dryer Dryer-Control Dryer-Monitor "
-                "Dryer-Settings Freezer Freezer-Control Freezer-Monitor Freezer-Settings "
-                "FridgeFreezer-Control FridgeFreezer-Monitor FridgeFreezer-Settings Hob Hob-Control "
-                "Hob-Monitor Hob-Settings Hood Hood-Control Hood-Monitor Hood-Settings IdentifyAppliance "
-                "Monitor Oven Oven-Control Oven-Monitor Oven-Settings Refrigerator Refrigerator-Control "
-                "Refrigerator-Monitor Refrigerator-Settings Settings Washer Washer-Control Washer-Monitor "
-                "Washer-Settings WasherDryer WasherDryer-Control WasherDryer-Monitor WasherDryer-Settings "
-                "WineCooler WineCooler-Control WineCooler-Monitor WineCooler-Settings",
-                "redirect_uri": environ["HOMECONNECT_REDIRECT_URI"],
-            },
-            # The simulator's grant endpoint rejects requests without a matching Origin header,
-            # returning a 500 instead of the redirect that carries the authorization code.
-            headers={"Origin": "https://simulator.home-connect.com"},
-            allow_redirects=False,
-        )
-        response = session.get(response.headers["Location"], allow_redirects=False)
+        async with AsyncClient() as session:
+            response = await session.post(
+                self.authorization_url.replace("authorize", "login"),
+                data=dict(email=username, password=password),
+                follow_redirects=True,
+            )
+            grant_url = search('(/security/oauth/grant.*)" +method="post"', response.text)
+            if grant_url is None:
+                raise ValueError(response.content)
+            response = await session.post(
+                "https://simulator.home-connect.com" + grant_url.group(1),
+                data={
+                    "submit": "approve",
+                    "user": "email",
+                    "client_id": environ["HOMECONNECT_CLIENT_ID"],
+                    "scope": "CleaningRobot CleaningRobot-Control CleaningRobot-Monitor CleaningRobot-Settings "
+                    "CoffeeMaker CoffeeMaker-Control CoffeeMaker-Monitor CoffeeMaker-Settings Control CookProcessor "
+                    "CookProcessor-Control CookProcessor-Monitor CookProcessor-Settings Dishwasher "
+                    "Dishwasher-Control Dishwasher-Monitor Dishwasher-Settings Dryer Dryer-Control Dryer-Monitor "
+                    "Dryer-Settings Freezer Freezer-Control Freezer-Monitor Freezer-Settings "
+                    "FridgeFreezer-Control FridgeFreezer-Monitor FridgeFreezer-Settings Hob Hob-Control "
+                    "Hob-Monitor Hob-Settings Hood Hood-Control Hood-Monitor Hood-Settings IdentifyAppliance "
+                    "Monitor Oven Oven-Control Oven-Monitor Oven-Settings Refrigerator Refrigerator-Control "
+                    "Refrigerator-Monitor Refrigerator-Settings Settings Washer Washer-Control Washer-Monitor "
+                    "Washer-Settings WasherDryer WasherDryer-Control WasherDryer-Monitor WasherDryer-Settings "
+                    "WineCooler WineCooler-Control WineCooler-Monitor WineCooler-Settings",
+                    "redirect_uri": environ["HOMECONNECT_REDIRECT_URI"],
+                },
+                # The simulator's grant endpoint rejects requests without a matching Origin header,
+                # returning a 500 instead of the redirect that carries the authorization code.
+                headers={"Origin": "https://simulator.home-connect.com"},
+                follow_redirects=False,
+            )
+            response = await session.get(response.headers["Location"], follow_redirects=False)
         await self.authorize(url=response.headers["Location"])
@@ -0,0 +1,70 @@
+from sys import intern
+from time import time
+
+from homeconnect_watcher.event import HomeConnectEvent
+
+KEEP_ALIVE = b"KEEP-ALIVE"
+
+
+class EventStreamParser:
+    """
+    Incremental parser of the server-sent events of an event stream.
+
+    Chunks of the stream are fed as they are received; a message may be split over several chunks, and a chunk
+    may hold several messages. Only an unfinished message is kept in a buffer, which is compacted once per chunk.
+    Messages are copied out of the chunk or buffer as they are parsed; slicing a memoryview would avoid that, but
+    would prevent the buffer from being compacted while a message refers to it. The data of a message may span
+    several `data:` lines, which are joined with newlines. Keep-alive messages are counted in `n_keep_alive` rather
+    than turned into events, unless `keep_alive` is set.
+    """
+
+    def __init__(self, keep_alive: bool = False):
+        self.keep_alive = keep_alive
+        self.n_keep_alive = 0
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> list[HomeConnectEvent]:
+        """Add a chunk of the stream, and return the events of the messages it completed."""
+        buffer: bytes | bytearray = chunk
+        if self._buffer:
+            # A message separator may straddle the chunks.
+            search_from = len(self._buffer) - 1
+            self._buffer += chunk
+            buffer = self._buffer
+        else:
+            search_from = 0
+        events = []
+        offset = 0
+        while (end := buffer.find(b"\n\n", search_from)) >= 0:
+            event = self._parse(buffer[offset:end])
+            if event is not None:
+                events.append(event)
+            offset = search_from = end + 2
+        if buffer is self._buffer:
+            del self._buffer[:offset]
+        elif offset < len(chunk):
+            self._buffer += chunk[offset:]
+        return events
+
+    def _parse(self, message: bytes | bytearray) -> HomeConnectEvent | None:
+        event, appliance_id, data = None, None, []
+        for line in message.split(b"\n"):
+            if line[:5] == b"data:":
+                if len(line) > 5:
+                    data.append(line[5:])
+            elif line[:6] == b"event:":
+                event = line[6:].strip()
+                if event == KEEP_ALIVE and not self.keep_alive:
+                    self.n_keep_alive += 1
+                    return None
+            elif line[:3] == b"id:":
+                appliance_id = intern(line[3:].strip().decode())
+        if event is None:
+            return None  # E.g. a comment.
+        # The data is decoded when it is first used (see HomeConnectEvent).
+        return HomeConnectEvent(
+            event=intern(event.decode()),
+            timestamp=time(),
+            appliance_id=appliance_id,
+            raw=b"\n".join(data) if data else None,
+        )
@@ -1,3 +1,15 @@
+from .async_client import AsyncWatcherDBClient
+from .base import BaseDBClient
 from .client import WatcherDBClient
+from .lease import LeaseCoordinator
+from .sqlite import SQLiteDBClient
+from .utils import connect_db
 
-__all__ = ["WatcherDBClient"]
+__all__ = [
+    "AsyncWatcherDBClient",
+    "BaseDBClient",
+    "LeaseCoordinator",
+    "SQLiteDBClient",
+    "WatcherDBClient",
+    "connect_db",
+]
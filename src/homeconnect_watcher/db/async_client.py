@@ -0,0 +1,124 @@
+from datetime import date, datetime
+from logging import getLogger
+
+from psycopg import AsyncConnection, sql
+from psycopg_pool import AsyncConnectionPool
+
+from ..event import HomeConnectEvent
+from .client import (
+    COPY_EVENTS,
+    CREATE_EVENTS_TABLE,
+    CREATE_STAGING_TABLE,
+    IS_PARTITIONED,
+    LOCK_PARTITIONS,
+    MERGE_EVENTS,
+    RESET_SESSIONS,
+    create_partition_query,
+    event_row,
+    partition_months,
+)
+from .view import load_query, load_views
+
+logger = getLogger(__name__)
+
+
+class AsyncWatcherDBClient:
+    """
+    Asynchronous counterpart of WatcherDBClient, backed by a connection pool.
+
+    Events are written in batches: a batch is copied into a staging table with COPY and merged into the
+    events table with a single INSERT ... SELECT, so that a batch costs one round-trip regardless of its size.
+    """
+
+    # Set in __aenter__; only valid inside the context.
+    pool: AsyncConnectionPool
+    partitioned: bool
+
+    def __init__(self, connection_string: str, init: bool = True, min_size: int = 1, max_size: int = 4):
+        self.connection_string = connection_string
+        self.init = init
+        self.min_size = min_size
+        self.max_size = max_size
+        self._partitions: set[date] = set()  # Partitions known to exist.
+
+    async def __aenter__(self) -> "AsyncWatcherDBClient":
+        logger.info("Opening database connection pool.")
+        if self.init:
+            # The staging table is created LIKE the events table, so the latter must exist first.
+            async with await AsyncConnection.connect(self.connection_string, autocommit=True) as connection:
+                await connection.execute(CREATE_EVENTS_TABLE)
+                await connection.execute(load_query("sessions", "create.sql"))  # ty: ignore[no-matching-overload]
+        self.pool = AsyncConnectionPool(
+            self.connection_string,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            kwargs={"autocommit": True},
+            configure=self._configure,
+            open=False,
+        )
+        await self.pool.open(wait=True)
+        if self.init:
+            await self.create_views()
+        async with self.pool.connection() as connection:
+            cursor = await connection.execute(IS_PARTITIONED)
+            result = await cursor.fetchone()
+        assert result is not None  # EXISTS always returns a row.
+        self.partitioned = result[0]
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.pool.close()
+        del self.pool
+        logger.info("Database connection pool closed.")
+
+    @staticmethod
+    async def _configure(connection: AsyncConnection) -> None:
+        await connection.execute(CREATE_STAGING_TABLE)
+
+    @property
+    async def event_count(self) -> int:
+        async with self.pool.connection() as connection:
+            cursor = await connection.execute("SELECT COUNT(*) AS cnt FROM events")
+            result = await cursor.fetchone()
+        assert result is not None  # COUNT(*) always returns a row.
+        return result[0]
+
+    async def create_views(self) -> None:
+        async with self.pool.connection() as connection, connection.transaction():
+            for view in load_views():
+                await connection.execute(view.query)  # ty: ignore[no-matching-overload]  # trusted packaged SQL
+
+    async def refresh_views(self) -> None:
+        logger.info("Refreshing views.")
+        async with self.pool.connection() as connection, connection.transaction():
+            for view in load_views():
+                if view.materialized:
+                    await connection.execute(sql.SQL("REFRESH MATERIALIZED VIEW {};").format(sql.Identifier(view.name)))
+
+    async def _create_partitions(self, months: set[date]) -> None:
+        if months:
+            async with self.pool.connection() as connection, connection.transaction():
+                await connection.execute(LOCK_PARTITIONS)
+                for month in sorted(months):
+                    await connection.execute(create_partition_query(month))
+            self._partitions |= months
+
+    async def update_sessions(self, full: bool = False, since: dict[str, datetime] | None = None) -> None:
+        """Bring the sessions table up to date with the events table; see WatcherDBClient.update_sessions."""
+        logger.info("Updating sessions.")
+        async with self.pool.connection() as connection, connection.transaction():
+            if full:
+                await connection.execute("TRUNCATE sessions, session_watermarks")
+            elif since:
+                await connection.execute(RESET_SESSIONS, (list(since), list(since.values())))
+            await connection.execute(load_query("sessions", "update.sql"))  # ty: ignore[no-matching-overload]
+
+    async def write_events(self, events: list[HomeConnectEvent]) -> None:
+        rows = [event_row(event) for event in events]
+        if self.partitioned:
+            await self._create_partitions(partition_months(row[2] for row in rows) - self._partitions)
+        async with self.pool.connection() as connection, connection.transaction():
+            async with connection.cursor().copy(COPY_EVENTS) as copy:
+                for row in rows:
+                    await copy.write_row(row)
+            await connection.execute(MERGE_EVENTS)
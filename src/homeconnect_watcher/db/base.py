@@ -0,0 +1,59 @@
+from abc import ABCMeta, abstractmethod
+from datetime import datetime
+
+from ..event import HomeConnectEvent
+
+
+class BaseDBClient(metaclass=ABCMeta):
+    """
+    Storage of the events, with the session views and the sessions table on top of them.
+
+    WatcherDBClient stores them in PostgreSQL, and SQLiteDBClient in a local file. Use `connect_db` to get the
+    client for a connection string. The clients are only usable inside their context.
+    """
+
+    def __init__(self, connection_string: str, init: bool = True):
+        self.connection_string = connection_string
+        self.init = init
+
+    @abstractmethod
+    def __enter__(self) -> "BaseDBClient":
+        pass
+
+    @abstractmethod
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+    @property
+    @abstractmethod
+    def event_count(self) -> int:
+        pass
+
+    @abstractmethod
+    def create_table(self) -> None:
+        pass
+
+    @abstractmethod
+    def create_views(self) -> None:
+        pass
+
+    @abstractmethod
+    def drop_views(self) -> None:
+        pass
+
+    @abstractmethod
+    def refresh_views(self) -> None:
+        pass
+
+    @abstractmethod
+    def update_sessions(self, full: bool = False, since: dict[str, datetime] | None = None) -> None:
+        pass
+
+    @abstractmethod
+    def write_events(self, events: list[HomeConnectEvent]) -> None:
+        pass
+
+    @abstractmethod
+    def gaps(self) -> list[tuple[str, datetime, datetime, str]]:
+        """The gaps in the event stream: their appliance, start time, end time and reason, as in v_gaps."""
+        pass
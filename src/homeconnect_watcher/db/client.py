@@ -1,22 +1,124 @@
+from datetime import date, datetime, timedelta, timezone
 from json import dumps
 from logging import getLogger
+from typing import Iterable, NamedTuple
 
 from psycopg import Connection, Cursor, connect, sql
 
 from ..event import HomeConnectEvent
-from .view import load_views
+from .base import BaseDBClient
+from .view import load_query, load_views
 
 logger = getLogger(__name__)
 
+CREATE_EVENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS events (
+    appliance_id char(31),
+    event varchar(31) NOT NULL,
+    timestamp timestamp with time zone NOT NULL,
+    data jsonb NOT NULL,
+    PRIMARY KEY (appliance_id, event, timestamp)
+);
+"""
+
+# Opt-in alternative to the above, for long histories: see WatcherDBClient.partition.
+CREATE_PARTITIONED_EVENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS events (
+    appliance_id char(31),
+    event varchar(31) NOT NULL,
+    timestamp timestamp with time zone NOT NULL,
+    data jsonb NOT NULL,
+    PRIMARY KEY (appliance_id, event, timestamp)
+) PARTITION BY RANGE (timestamp);
+"""
+
+# Indexes for the filters of the views; on a partitioned table they are created on every partition.
+CREATE_EVENT_INDEXES = """
+CREATE INDEX IF NOT EXISTS events_appliance_id_timestamp_idx ON events (appliance_id, timestamp);
+CREATE INDEX IF NOT EXISTS events_event_timestamp_idx ON events (event, timestamp);
+CREATE INDEX IF NOT EXISTS events_data_idx ON events USING gin (data);
+CREATE INDEX IF NOT EXISTS events_selected_program_idx ON events ((data->>'BSH.Common.Root.SelectedProgram'))
+    WHERE event = 'NOTIFY';
+"""
+
+IS_PARTITIONED = "SELECT EXISTS (SELECT FROM pg_partitioned_table WHERE partrelid = to_regclass('events'))"
+
+# Serializes the creation of partitions by concurrent writers.
+LOCK_PARTITIONS = "SELECT pg_advisory_xact_lock(hashtext('events_partitions'))"
+
+# Tracks how far each log file has been loaded, so that `load` only needs to ingest new data. Files are identified
+# by their path relative to the log directory, as sharded workers write files of the same name.
+CREATE_MANIFEST_TABLE = """
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    file_name text PRIMARY KEY,
+    size bigint NOT NULL,
+    mtime double precision NOT NULL,
+    byte_offset bigint NOT NULL,
+    content_hash char(64) NOT NULL,
+    loaded_at timestamp with time zone NOT NULL DEFAULT now()
+);
+"""
+
+# Batches are copied into a per-connection staging table, from which they are merged into the events table.
+CREATE_STAGING_TABLE = """
+CREATE TEMPORARY TABLE IF NOT EXISTS events_staging (LIKE events INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;
+"""
+COPY_EVENTS = "COPY events_staging (appliance_id, event, timestamp, data) FROM STDIN"
+MERGE_EVENTS = "INSERT INTO events SELECT * FROM events_staging ON CONFLICT DO NOTHING"
+
+# The sessions and watermarks of the appliances of which events were added that are not after their watermark, so
+# that the update recomputes their sessions. The parameters are the appliances and the earliest timestamps.
+RESET_SESSIONS = """
+WITH reset AS (
+    SELECT session_watermarks.appliance_id
+    FROM session_watermarks
+        JOIN unnest(%s::text[], %s::timestamptz[]) AS added(appliance_id, timestamp)
+            ON added.appliance_id = session_watermarks.appliance_id
+    WHERE added.timestamp <= session_watermarks.timestamp
+), deleted AS (
+    DELETE FROM sessions WHERE appliance_id IN (SELECT appliance_id FROM reset)
+)
+DELETE FROM session_watermarks WHERE appliance_id IN (SELECT appliance_id FROM reset)
+"""
+
+
+class ManifestEntry(NamedTuple):
+    file_name: str
+    size: int
+    mtime: float
+    byte_offset: int  # Everything before this offset has been loaded.
+    content_hash: str  # See loader.content_hash.
+
+
+def event_row(event: HomeConnectEvent) -> tuple[str, str, datetime, str]:
+    """Convert an event into a row of the events table."""
+    return event.appliance_id or "", event.event, event.datetime, dumps(event.items)
+
 
-class WatcherDBClient:
+def partition_months(timestamps: Iterable[datetime]) -> set[date]:
+    """The (UTC) months of the partitions that hold the given timestamps."""
+    return {timestamp.astimezone(timezone.utc).date().replace(day=1) for timestamp in timestamps}
+
+
+def create_partition_query(month: date) -> sql.Composed:
+    """Create the partition of the events table for a month, if it does not exist yet."""
+    end = (month + timedelta(days=32)).replace(day=1)
+    return sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF events FOR VALUES FROM ({}) TO ({})").format(
+        sql.Identifier(f"events_{month:%Y_%m}"),
+        sql.Literal(f"{month.isoformat()} 00:00+00"),
+        sql.Literal(f"{end.isoformat()} 00:00+00"),
+    )
+
+
+class WatcherDBClient(BaseDBClient):
     # Set in __enter__; only valid inside the context.
     connection: Connection
     cursor: Cursor
+    partitioned: bool
 
     def __init__(self, connection_string: str, init: bool = True):
-        self.connection_string = connection_string
-        self.init = init
+        super().__init__(connection_string=connection_string, init=init)
+        self._partitions: set[date] = set()  # Partitions known to exist.
 
     def __enter__(self) -> "WatcherDBClient":
         logger.info("Opening database connection.")
@@ -25,6 +127,7 @@ class WatcherDBClient:
         if self.init:
             self.create_table()
             self.create_views()
+        self.partitioned = self._is_partitioned()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
@@ -43,18 +146,55 @@ class WatcherDBClient:
         return result[0]
 
     def create_table(self) -> None:
-        """Create the event table."""
-        self.cursor.execute(
-            """
-CREATE TABLE IF NOT EXISTS events (
-    appliance_id char(31),
-    event varchar(31) NOT NULL,
-    timestamp timestamp with time zone NOT NULL,
-    data jsonb NOT NULL,
-    PRIMARY KEY (appliance_id, event, timestamp)
-);
-"""
-        )
+        """Create the event, ingest manifest and sessions tables."""
+        self.cursor.execute(CREATE_EVENTS_TABLE)
+        self.cursor.execute(CREATE_MANIFEST_TABLE)
+        self.cursor.execute(load_query("sessions", "create.sql"))  # ty: ignore[no-matching-overload]
+
+    def _is_partitioned(self) -> bool:
+        self.cursor.execute(IS_PARTITIONED)
+        result = self.cursor.fetchone()
+        assert result is not None  # EXISTS always returns a row.
+        return result[0]
+
+    def partition(self) -> None:
+        """
+        Convert the events table into one that is partitioned by month, and create indexes for the views.
+
+        Existing events are copied into the new table in a single transaction, during which the views are
+        recreated. Partitions for new months are created when events are written. Calling this on a table that
+        is already partitioned only creates missing indexes.
+        """
+        with self.connection.transaction():
+            if not self._is_partitioned():
+                logger.info("Partitioning events table.")
+                self.drop_views()
+                self.cursor.execute("ALTER TABLE IF EXISTS events RENAME TO events_unpartitioned")
+                self.cursor.execute("ALTER INDEX IF EXISTS events_pkey RENAME TO events_unpartitioned_pkey")
+                self.cursor.execute(CREATE_PARTITIONED_EVENTS_TABLE)
+                self.cursor.execute("SELECT to_regclass('events_unpartitioned') IS NOT NULL")
+                if (result := self.cursor.fetchone()) is not None and result[0]:
+                    self.cursor.execute(
+                        "SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC')::date FROM events_unpartitioned"
+                    )
+                    for (month,) in self.cursor.fetchall():
+                        self.cursor.execute(create_partition_query(month))
+                    self.cursor.execute("INSERT INTO events SELECT * FROM events_unpartitioned")
+                    self.cursor.execute("DROP TABLE events_unpartitioned")
+                self.create_views()
+            logger.info("Creating indexes.")
+            self.cursor.execute(CREATE_EVENT_INDEXES)
+        self.partitioned = True
+
+    def create_partitions(self, timestamps: Iterable[datetime]) -> None:
+        """Create the partitions of the events table for the given timestamps, if they do not exist yet."""
+        months = partition_months(timestamps) - self._partitions
+        if months:
+            with self.connection.transaction():
+                self.cursor.execute(LOCK_PARTITIONS)
+                for month in sorted(months):
+                    self.cursor.execute(create_partition_query(month))
+            self._partitions |= months
 
     def create_views(self) -> None:
         logger.info("Creating events table.")
@@ -75,9 +215,55 @@ CREATE TABLE IF NOT EXISTS events (
                 if view.materialized:
                     self.connection.execute(sql.SQL("REFRESH MATERIALIZED VIEW {};").format(sql.Identifier(view.name)))
 
+    def update_sessions(self, full: bool = False, since: dict[str, datetime] | None = None) -> None:
+        """
+        Bring the sessions table up to date with the events table.
+
+        Only the events after each appliance's watermark are processed. Events that are older than the watermark
+        are only picked up when they are passed as `since`, the earliest timestamp of the added events per
+        appliance: the sessions of those appliances are then recomputed. Use `full` to rebuild the table from
+        scratch.
+        """
+        logger.info("Updating sessions.")
+        with self.connection.transaction():
+            if full:
+                self.cursor.execute("TRUNCATE sessions, session_watermarks")
+            elif since:
+                self.cursor.execute(RESET_SESSIONS, (list(since), list(since.values())))
+            self.cursor.execute(load_query("sessions", "update.sql"))  # ty: ignore[no-matching-overload]
+
     def write_events(self, events: list[HomeConnectEvent]) -> None:
-        data = [(event.appliance_id or "", event.event, event.datetime, dumps(event.items)) for event in events]
-        self.cursor.executemany(
-            "INSERT INTO events(appliance_id, event, timestamp, data) VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING",
-            data,
+        self.write_rows([event_row(event) for event in events])
+
+    def write_rows(self, rows: list[tuple[str, str, datetime, str]]) -> None:
+        """Write rows (see event_row) to the events table with COPY, skipping existing events."""
+        if self.partitioned:
+            self.create_partitions(row[2] for row in rows)
+        with self.connection.transaction():
+            self.cursor.execute(CREATE_STAGING_TABLE)
+            with self.cursor.copy(COPY_EVENTS) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            self.cursor.execute(MERGE_EVENTS)
+
+    def gaps(self) -> list[tuple[str, datetime, datetime, str]]:
+        self.cursor.execute("SELECT appliance_id, start_time, end_time, reason FROM v_gaps")
+        return [(appliance_id.strip(), *row) for appliance_id, *row in self.cursor.fetchall()]
+
+    def read_manifest(self) -> dict[str, ManifestEntry]:
+        self.cursor.execute("SELECT file_name, size, mtime, byte_offset, content_hash FROM ingest_manifest")
+        return {row[0]: ManifestEntry(*row) for row in self.cursor.fetchall()}
+
+    def update_manifest(self, entry: ManifestEntry) -> None:
+        self.cursor.execute(
+            """
+INSERT INTO ingest_manifest (file_name, size, mtime, byte_offset, content_hash) VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (file_name) DO UPDATE SET
+    size = EXCLUDED.size,
+    mtime = EXCLUDED.mtime,
+    byte_offset = EXCLUDED.byte_offset,
+    content_hash = EXCLUDED.content_hash,
+    loaded_at = now()
+""",
+            entry,
         )
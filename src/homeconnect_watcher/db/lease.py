@@ -0,0 +1,100 @@
+from datetime import timedelta
+from logging import getLogger
+from math import ceil
+
+from psycopg import AsyncConnection
+
+logger = getLogger(__name__)
+
+# Workers record a heartbeat, and lease the accounts they watch. A worker of which the heartbeat is older than the
+# time to live is considered dead; its leases expire at the same time, so that other workers can take them over.
+CREATE_LEASE_TABLES = """
+CREATE TABLE IF NOT EXISTS watcher_workers (
+    worker text PRIMARY KEY,
+    heartbeat timestamptz NOT NULL
+);
+CREATE TABLE IF NOT EXISTS account_leases (
+    account text PRIMARY KEY,
+    worker text NOT NULL,
+    expires_at timestamptz NOT NULL
+)
+"""
+# Rebalancing is serialized over all workers, so that they see each other's leases.
+LOCK_LEASES = "SELECT pg_advisory_xact_lock(hashtext('account_leases'))"
+
+
+class LeaseCoordinator:
+    """
+    Spread accounts over the workers that share a database, using a lease table.
+
+    Every worker calls `rebalance` at least once per `ttl / 3`. It renews the leases of the worker, and takes or
+    releases leases until the worker holds its fair share of the accounts: the number of accounts divided by the
+    number of live workers, rounded up. When a worker stops, its leases are released right away; when a worker
+    dies, they expire after `ttl`, after which the other workers take them over.
+    """
+
+    # Set in __aenter__; only valid inside the context.
+    connection: AsyncConnection
+
+    def __init__(
+        self, connection_string: str, worker: str, accounts: list[str], ttl: timedelta = timedelta(seconds=60)
+    ):
+        self.connection_string = connection_string
+        self.worker = worker
+        self.accounts = sorted(accounts)
+        self.ttl = ttl
+
+    @property
+    def renew_interval(self) -> float:
+        return self.ttl.total_seconds() / 3
+
+    async def __aenter__(self) -> "LeaseCoordinator":
+        self.connection = await AsyncConnection.connect(self.connection_string, autocommit=True)
+        async with self.connection.transaction():
+            await self.connection.execute(LOCK_LEASES)
+            await self.connection.execute(CREATE_LEASE_TABLES)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        async with self.connection.transaction():
+            await self.connection.execute("DELETE FROM account_leases WHERE worker = %s", (self.worker,))
+            await self.connection.execute("DELETE FROM watcher_workers WHERE worker = %s", (self.worker,))
+        await self.connection.close()
+        del self.connection
+
+    async def rebalance(self) -> set[str]:
+        """Renew, take and release leases, and return the accounts that this worker should watch."""
+        async with self.connection.transaction():
+            await self.connection.execute(LOCK_LEASES)
+            await self.connection.execute(
+                "INSERT INTO watcher_workers (worker, heartbeat) VALUES (%s, now()) "
+                "ON CONFLICT (worker) DO UPDATE SET heartbeat = EXCLUDED.heartbeat",
+                (self.worker,),
+            )
+            await self.connection.execute("DELETE FROM watcher_workers WHERE heartbeat < now() - %s", (self.ttl,))
+            cursor = await self.connection.execute("SELECT count(*) FROM watcher_workers")
+            (n_workers,) = await cursor.fetchone() or (1,)
+            share = ceil(len(self.accounts) / n_workers)
+
+            cursor = await self.connection.execute(
+                "UPDATE account_leases SET expires_at = now() + %s "
+                "WHERE worker = %s AND account = ANY(%s) RETURNING account",
+                (self.ttl, self.worker, self.accounts),
+            )
+            owned = sorted(account for (account,) in await cursor.fetchall())
+            if len(owned) > share:
+                await self.connection.execute("DELETE FROM account_leases WHERE account = ANY(%s)", (owned[share:],))
+                owned = owned[:share]
+            elif len(owned) < share:
+                cursor = await self.connection.execute(
+                    "INSERT INTO account_leases (account, worker, expires_at) "
+                    "SELECT a.account, %s, now() + %s FROM unnest(%s::text[]) AS a(account) "
+                    "WHERE NOT EXISTS ("
+                    "    SELECT FROM account_leases l WHERE l.account = a.account AND l.expires_at >= now()"
+                    ") ORDER BY a.account LIMIT %s "
+                    "ON CONFLICT (account) DO UPDATE SET worker = EXCLUDED.worker, expires_at = EXCLUDED.expires_at "
+                    "RETURNING account",
+                    (self.worker, self.ttl, self.accounts, share - len(owned)),
+                )
+                owned += [account for (account,) in await cursor.fetchall()]
+        return set(owned)
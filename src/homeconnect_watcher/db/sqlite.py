@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+from datetime import datetime
+from json import dumps
+from logging import getLogger
+from sqlite3 import Connection, Cursor, connect
+from typing import Generator
+
+from ..event import HomeConnectEvent
+from .base import BaseDBClient
+from .view import load_query, load_views
+
+logger = getLogger(__name__)
+
+# Connection strings like sqlite:///var/lib/hcw/events.db, or sqlite:events.db for a relative path.
+SCHEME = "sqlite:"
+
+# Timestamps are stored as seconds since the epoch, and data as JSON text. The index serves the window functions of
+# the views, which order the events of each appliance by timestamp and event.
+CREATE_EVENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS events (
+    appliance_id text,
+    event text NOT NULL,
+    timestamp real NOT NULL,
+    data text NOT NULL,
+    PRIMARY KEY (appliance_id, event, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_appliance_id_timestamp_idx ON events (appliance_id, timestamp, event);
+"""
+
+INSERT_EVENTS = "INSERT OR IGNORE INTO events (appliance_id, event, timestamp, data) VALUES (?, ?, ?, ?)"
+
+# See RESET_SESSIONS of WatcherDBClient; the parameters are an appliance and the earliest timestamp of its events.
+RESET_SESSIONS = """
+DELETE FROM sessions WHERE appliance_id = :appliance_id AND EXISTS (
+    SELECT 1 FROM session_watermarks WHERE appliance_id = :appliance_id AND timestamp >= :timestamp
+)
+"""
+RESET_WATERMARK = "DELETE FROM session_watermarks WHERE appliance_id = :appliance_id AND timestamp >= :timestamp"
+
+# Readers do not block the writer in WAL mode, and a commit does not wait for the disk, though on a power loss
+# the last transactions may be lost. Concurrent writers wait for each other for up to BUSY_TIMEOUT milliseconds.
+BUSY_TIMEOUT = 10_000
+PRAGMAS = ("PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL", f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+
+
+def is_sqlite(connection_string: str) -> bool:
+    return connection_string.startswith(SCHEME)
+
+
+def sqlite_path(connection_string: str) -> str:
+    """The path of the database file of a connection string, e.g. /data/events.db of sqlite:///data/events.db."""
+    return connection_string.removeprefix(SCHEME).removeprefix("//")
+
+
+def statements(script: str) -> list[str]:
+    """Split a script of the sql directory into its statements, which end with a semicolon at the end of a line."""
+    return [statement for statement in script.split(";\n") if statement.strip() and not _is_comment(statement)]
+
+
+def _is_comment(statement: str) -> bool:
+    return all(line.strip().startswith("--") or not line.strip() for line in statement.splitlines())
+
+
+def sqlite_event_row(event: HomeConnectEvent) -> tuple[str, str, float, str]:
+    """Convert an event into a row of the events table; see event_row."""
+    return event.appliance_id or "", event.event, event.timestamp, dumps(event.items)
+
+
+class SQLiteDBClient(BaseDBClient):
+    """
+    Store events and sessions in a local SQLite database file, rather than in PostgreSQL.
+
+    The tables and views are ports of those for PostgreSQL (see the sql/sqlite directory), except that timestamps
+    are seconds since the epoch, data is JSON text and v_sessions is not materialized. The database is opened in
+    WAL mode, and each call of `write_events` writes its events in a single transaction.
+    """
+
+    # Set in __enter__; only valid inside the context.
+    connection: Connection
+    cursor: Cursor
+
+    def __enter__(self) -> "SQLiteDBClient":
+        logger.info("Opening database connection.")
+        # Transactions are managed explicitly, see _transaction.
+        self.connection = connect(sqlite_path(self.connection_string), isolation_level=None)
+        self.cursor = self.connection.cursor()
+        for pragma in PRAGMAS:
+            self.cursor.execute(pragma)
+        if self.init:
+            self.create_table()
+            self.create_views()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.cursor.close()
+        del self.cursor
+        self.connection.close()
+        del self.connection
+        logger.info("Database connection closed.")
+        return
+
+    @contextmanager
+    def _transaction(self) -> Generator[None, None, None]:
+        """A write transaction, which takes the write lock at once, so that it cannot fail to upgrade to one later."""
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.cursor.execute("ROLLBACK")
+            raise
+        self.cursor.execute("COMMIT")
+
+    def _execute_script(self, script: str) -> None:
+        for statement in statements(script):
+            self.cursor.execute(statement)
+
+    @property
+    def event_count(self) -> int:
+        self.cursor.execute("SELECT COUNT(*) AS cnt FROM events")
+        result = self.cursor.fetchone()
+        assert result is not None  # COUNT(*) always returns a row.
+        return result[0]
+
+    def create_table(self) -> None:
+        """Create the event and sessions tables."""
+        with self._transaction():
+            self._execute_script(CREATE_EVENTS_TABLE)
+            self._execute_script(load_query("sqlite", "sessions", "create.sql"))
+
+    def create_views(self) -> None:
+        logger.info("Creating views.")
+        # SQLite cannot replace a view, so they are recreated to pick up changes of their definitions.
+        with self._transaction():
+            for view in reversed(load_views("sqlite")):
+                self.cursor.execute(view.drop_query)
+            for view in load_views("sqlite"):
+                self.cursor.execute(view.query)
+
+    def drop_views(self) -> None:
+        logger.info("Dropping views.")
+        with self._transaction():
+            for view in reversed(load_views("sqlite")):
+                self.cursor.execute(view.drop_query)
+
+    def refresh_views(self) -> None:
+        # None of the views is materialized.
+        return
+
+    def update_sessions(self, full: bool = False, since: dict[str, datetime] | None = None) -> None:
+        """Bring the sessions table up to date with the events table; see WatcherDBClient.update_sessions."""
+        logger.info("Updating sessions.")
+        with self._transaction():
+            if full:
+                self.cursor.execute("DELETE FROM sessions")
+                self.cursor.execute("DELETE FROM session_watermarks")
+            elif since:
+                parameters = [
+                    {"appliance_id": appliance_id, "timestamp": timestamp.timestamp()}
+                    for appliance_id, timestamp in since.items()
+                ]
+                self.cursor.executemany(RESET_SESSIONS, parameters)
+                self.cursor.executemany(RESET_WATERMARK, parameters)
+            self._execute_script(load_query("sqlite", "sessions", "update.sql"))
+
+    def write_events(self, events: list[HomeConnectEvent]) -> None:
+        """Write events to the events table in a single transaction, skipping existing events."""
+        with self._transaction():
+            self.cursor.executemany(INSERT_EVENTS, [sqlite_event_row(event) for event in events])
+
+    def gaps(self) -> list[tuple[str, datetime, datetime, str]]:
+        self.cursor.execute("SELECT appliance_id, start_time, end_time, reason FROM v_gaps")
+        return [
+            (appliance_id, datetime.fromtimestamp(start).astimezone(), datetime.fromtimestamp(end).astimezone(), reason)
+            for appliance_id, start, end, reason in self.cursor.fetchall()
+        ]
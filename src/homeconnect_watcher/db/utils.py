@@ -1,5 +1,16 @@
 from psycopg import Connection, sql
 
+from .base import BaseDBClient
+from .client import WatcherDBClient
+from .sqlite import SQLiteDBClient, is_sqlite
+
+
+def connect_db(connection_string: str, init: bool = True) -> BaseDBClient:
+    """The client of the database of a connection string: SQLite for sqlite: strings, and PostgreSQL otherwise."""
+    if is_sqlite(connection_string):
+        return SQLiteDBClient(connection_string=connection_string, init=init)
+    return WatcherDBClient(connection_string=connection_string, init=init)
+
 
 def clean_schema(connection: Connection) -> None:
     with connection.cursor() as cursor:
@@ -22,8 +22,12 @@ class View:
         return result.group(1)
 
 
-def load_views() -> list[View]:
-    resources = [r for r in (files("homeconnect_watcher") / "sql").iterdir() if r.is_file()]
+def load_views(*path: str) -> list[View]:
+    """Load the packaged views of PostgreSQL, or those in a subdirectory, e.g. load_views("sqlite")."""
+    directory = files("homeconnect_watcher") / "sql"
+    for part in path:
+        directory = directory / part
+    resources = [r for r in directory.iterdir() if r.is_file()]
     return [View(resource.read_text()) for resource in sorted(resources)]
 
 
@@ -32,3 +36,11 @@ def load_view(name: str) -> View:
         if view.name == name:
             return view
     raise KeyError(f"No such view: {name}")
+
+
+def load_query(*path: str) -> str:
+    """Load a packaged SQL file other than a view, e.g. load_query("sessions", "update.sql")."""
+    resource = files("homeconnect_watcher") / "sql"
+    for part in path:
+        resource = resource / part
+    return resource.read_text()
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any
+
+from homeconnect_watcher.event import HomeConnectEvent
+
+
+def has_api_timestamps(data: dict[str, Any]) -> bool:
+    """Whether a payload carries the timestamps of the API, for the payload itself or for each of its items."""
+    if "timestamp" in data:
+        return True
+    items = data.get("items")
+    return bool(items) and all(isinstance(item, dict) and "timestamp" in item for item in items)
+
+
+def event_key(event: HomeConnectEvent) -> bytes:
+    """
+    A digest that identifies an event by its appliance, type and payload.
+
+    The payload is the raw JSON of the data while it has not been decoded, and otherwise the key, value and API
+    timestamp of its items, or of the payload itself.
+    """
+    raw = event.raw_data
+    if raw is not None:
+        payload = raw.encode() if isinstance(raw, str) else raw
+    else:
+        assert event.data is not None
+        items = [event.data] if "timestamp" in event.data else event.data["items"]
+        payload = repr([(item.get("key"), item.get("value"), item.get("timestamp")) for item in items]).encode()
+    digest = blake2b(digest_size=16)
+    for part in ((event.appliance_id or "").encode(), event.event.encode(), payload):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.digest()
+
+
+class DedupCache:
+    """
+    Recognize events that were seen before within a time window, e.g. when the API redelivers them after a reconnect.
+
+    Events are identified by their appliance, type and payload; the timestamp at which they were received is not
+    part of it. Only events of which the payload carries the timestamps of the API are considered: for those,
+    an identical payload means the same observation delivered twice, whereas other events, such as responses to
+    requests, may well repeat as separate observations. The data of events from the stream is not decoded for
+    this: their raw JSON is considered to carry timestamps when it mentions them. The cache holds the events of the
+    last `window` seconds, and at most `max_size` of them.
+    """
+
+    def __init__(self, window: float = 600.0, max_size: int = 100_000):
+        self.window = window
+        self.max_size = max_size
+        self.n_duplicates = 0
+        self._seen: OrderedDict[bytes, float] = OrderedDict()  # Keys of events by their timestamp, in order.
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, event: HomeConnectEvent) -> bool:
+        """Whether the event is a duplicate of one in the window; if not, it is added to the cache."""
+        if event.is_request or not self._has_api_timestamps(event):
+            return False
+        while self._seen and next(iter(self._seen.values())) < event.timestamp - self.window:
+            self._seen.popitem(last=False)
+        key = event_key(event)
+        if key in self._seen:
+            self.n_duplicates += 1
+            return True
+        if len(self._seen) >= self.max_size:
+            self._seen.popitem(last=False)
+        self._seen[key] = event.timestamp
+        return False
+
+    @staticmethod
+    def _has_api_timestamps(event: HomeConnectEvent) -> bool:
+        raw = event.raw_data
+        if raw is not None:
+            return '"timestamp"' in raw if isinstance(raw, str) else b'"timestamp"' in raw
+        return event.data is not None and has_api_timestamps(event.data)
@@ -1,19 +1,83 @@
-from dataclasses import dataclass
 from datetime import datetime
 from json import dumps, loads
+from sys import intern
 from time import time
 from typing import Any
 
 from homeconnect_watcher.trigger import Trigger
 
+try:
+    from orjson import loads as loads_bytes  # ty: ignore[unresolved-import]
+except ImportError:
+    loads_bytes = loads
+
+# The start of a line of a log, and its data and error members; see HomeConnectEvent.from_string.
+LINE_START = '{"appliance_id": '
+DATA_MEMBER = ', "data": '
+ERROR_MEMBER = ', "error": '
+
 
-@dataclass
 class HomeConnectEvent:
-    event: str
-    timestamp: float
-    appliance_id: str | None = None
-    data: dict[str, Any] | None = None
-    error: dict[str, Any] | None = None
+    """
+    An event of the event stream, or the response to a request.
+
+    Events are slotted, as replays may hold millions of them. An event from the stream or from a log may be created
+    from the raw JSON of its data, which is only decoded when `data` is first used. The key/value pairs of `items`
+    are computed once, with their keys interned, as the same few hundred keys recur in every event.
+    """
+
+    __slots__ = ("event", "timestamp", "appliance_id", "error", "_data", "_raw", "_items")
+
+    def __init__(
+        self,
+        event: str,
+        timestamp: float,
+        appliance_id: str | None = None,
+        data: dict[str, Any] | None = None,
+        error: dict[str, Any] | None = None,
+        raw: bytes | str | None = None,
+    ):
+        self.event = event
+        self.timestamp = timestamp
+        self.appliance_id = appliance_id
+        self.error = error
+        self._data = data
+        self._raw = raw  # The JSON of data, until it is decoded.
+        self._items: dict[str, Any] | None = None
+
+    @property
+    def data(self) -> dict[str, Any] | None:
+        if self._raw is not None:
+            self._data, self._raw = loads_bytes(self._raw), None
+        return self._data
+
+    @property
+    def raw_data(self) -> bytes | str | None:
+        """The JSON of data, as long as it has not been decoded."""
+        return self._raw
+
+    @data.setter
+    def data(self, data: dict[str, Any] | None) -> None:
+        self._data, self._raw, self._items = data, None, None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, HomeConnectEvent):
+            return NotImplemented
+        return (self.event, self.timestamp, self.appliance_id, self.data, self.error) == (
+            other.event,
+            other.timestamp,
+            other.appliance_id,
+            other.data,
+            other.error,
+        )
+
+    __hash__ = None  # Events are mutable.
+
+    def __repr__(self) -> str:
+        return (
+            f"HomeConnectEvent(event={self.event!r}, timestamp={self.timestamp!r}, "
+            f"appliance_id={self.appliance_id!r}, data={self.data!r}, error={self.error!r})"
+        )
 
     @property
     def datetime(self) -> datetime:
@@ -35,32 +99,62 @@ class HomeConnectEvent:
             error=error,
         )
 
+    @classmethod
+    def gap(cls, appliance_id: str, start: float, end: float, reason: str) -> "HomeConnectEvent":
+        """
+        A synthetic event recording that the event stream was down between start and end.
+
+        The event is placed at the end of the gap, so that it is ordered between the events before and after it.
+        """
+        return HomeConnectEvent(
+            event="GAP", timestamp=end, appliance_id=appliance_id, data={"start": start, "reason": reason}
+        )
+
     @classmethod
     def from_stream(cls, stream: bytes) -> "HomeConnectEvent":
         data: dict[str, Any] = {"timestamp": time()}
+        lines = []
         for line in stream.decode("utf-8").split("\n"):
             if line.startswith("data:") and len(line) > 5:
-                data["data"] = loads(line[5:])
+                lines.append(line[5:])
             elif line.startswith("event:"):
                 data["event"] = line[6:].strip()
             elif line.startswith("id:"):
                 data["appliance_id"] = line[3:].strip()
+        if lines:
+            data["data"] = loads("\n".join(lines))
         return cls(**data)
 
     @classmethod
     def from_string(cls, string: str) -> "HomeConnectEvent":
-        result = cls(**loads(string))
-        return result
+        """
+        Read an event from a line of a log, as written by __str__.
+
+        The data follows the appliance, event and timestamp and is the last member of those lines, unless there is
+        an error, and is kept as raw JSON. Other lines are decoded at once.
+        """
+        start = string.find(DATA_MEMBER)
+        if start < 0 or not string.startswith(LINE_START) or ERROR_MEMBER in string[start:]:
+            return cls(**loads(string))
+        end = string.rstrip().rfind("}")
+        return cls(**loads(string[:start] + "}"), raw=string[start + len(DATA_MEMBER) : end])
 
     @property
     def is_request(self) -> bool:
         return self.event.endswith("-REQUEST")
 
     @property
-    def items(self) -> dict[str, str | None]:
-        """Extract the payload into key/value pairs."""
+    def items(self) -> dict[str, Any]:
+        """Extract the payload into key/value pairs; computed once, so the result should not be modified."""
+        if self._items is None:
+            self._items = self._parse_items()
+        return self._items
+
+    def _parse_items(self) -> dict[str, Any]:
         if self.event == "KEEP-ALIVE":
             return {}
+        elif self.event == "GAP":  # The start of the gap and the reason, as stored in the database.
+            return dict(self.data or {})
         elif self.error_key is not None and len(self.error_key) == 3:  # Error code like 429, 500
             return {}
         elif self.event == "ACTIVE-PROGRAM-REQUEST":
@@ -71,7 +165,7 @@ class HomeConnectEvent:
                 return {"BSH.Common.Root.ActiveProgram": None}
             else:
                 assert self.data is not None
-                result = {item["key"]: item["value"] for item in self.data["options"]}
+                result = {intern(item["key"]): item["value"] for item in self.data["options"]}
                 result["BSH.Common.Root.ActiveProgram"] = self.data["key"]
                 return result
         elif self.event == "SELECTED-PROGRAM-REQUEST":
@@ -82,25 +176,25 @@ class HomeConnectEvent:
                 return {"BSH.Common.Root.SelectedProgram": None}
             else:
                 assert self.data is not None
-                result = {item["key"]: item["value"] for item in self.data["options"]}
+                result = {intern(item["key"]): item["value"] for item in self.data["options"]}
                 result["BSH.Common.Root.SelectedProgram"] = self.data["key"]
                 return result
         elif self.error is not None:
             return {}
         elif self.event == "STATUS-REQUEST":
             assert self.data is not None
-            return {entry["key"]: entry["value"] for entry in self.data["status"]}
+            return {intern(entry["key"]): entry["value"] for entry in self.data["status"]}
         elif self.event == "SETTINGS-REQUEST":
             assert self.data is not None
-            return {entry["key"]: entry["value"] for entry in self.data["settings"]}
+            return {intern(entry["key"]): entry["value"] for entry in self.data["settings"]}
         elif self.event in ("CONNECTED", "DISCONNECTED"):
             if self.data is not None and "key" in self.data:
-                return {self.data["key"]: self.data["value"]}
+                return {intern(self.data["key"]): self.data["value"]}
             else:
                 return {}
         elif self.data is not None:
             if "items" in self.data:  # For STATUS/EVENT/NOTIFY
-                return {item["key"]: item["value"] for item in self.data["items"]}
+                return {intern(item["key"]): item["value"] for item in self.data["items"]}
         raise ValueError("Malformed Event")
 
     @property
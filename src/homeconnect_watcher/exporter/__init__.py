@@ -1,5 +1,18 @@
-from .base import BaseExporter
-from .file import FileExporter
-from .postgres import PGExporter
+from .base import BaseAsyncExporter, BaseExporter
+from .block import BlockFileExporter
+from .file import FileExporter, LogFormat
+from .parquet import ParquetExporter
+from .postgres import AsyncPGExporter, PGExporter
+from .sqlite import SQLiteExporter
 
-__all__ = ["BaseExporter", "FileExporter", "PGExporter"]
+__all__ = [
+    "AsyncPGExporter",
+    "BaseAsyncExporter",
+    "BaseExporter",
+    "BlockFileExporter",
+    "FileExporter",
+    "LogFormat",
+    "ParquetExporter",
+    "PGExporter",
+    "SQLiteExporter",
+]
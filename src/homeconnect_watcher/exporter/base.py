@@ -21,3 +21,24 @@ class BaseExporter(metaclass=ABCMeta):
     def bulk_export(self, events: list[HomeConnectEvent]) -> None:
         for event in events:
             self.export(event)
+
+
+class BaseAsyncExporter(metaclass=ABCMeta):
+    """Base class for exporters that write without blocking the event loop."""
+
+    def __init__(self):
+        self.logger = getLogger(self.__class__.__name__)
+
+    async def __aenter__(self) -> "BaseAsyncExporter":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        return
+
+    @abstractmethod
+    async def export(self, event: HomeConnectEvent) -> None:
+        pass
+
+    async def bulk_export(self, events: list[HomeConnectEvent]) -> None:
+        for event in events:
+            await self.export(event)
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO
+
+from homeconnect_watcher.blockfile import (
+    FILE_HEADER,
+    SUFFIX,
+    default_codec,
+    encode_block,
+    file_header,
+    iter_blocks,
+    read_file_header,
+)
+from homeconnect_watcher.event import HomeConnectEvent
+
+from .base import BaseExporter
+
+
+class BlockFileExporter(BaseExporter):
+    """
+    Write events to daily block files (see homeconnect_watcher.blockfile) instead of jsonl.
+
+    Events are buffered and written as a block once `block_size` events have been collected, when
+    `flush_interval` has passed, when the day changes or when the exporter is closed.
+    """
+
+    # Set in __enter__; only valid inside the context.
+    _fp: BinaryIO
+    _codec: int  # Of the open file, which may have been created with another codec.
+
+    def __init__(
+        self,
+        path: Path,
+        block_size: int = 1000,
+        flush_interval: timedelta = timedelta(minutes=5),
+        codec: int | None = None,
+    ):
+        super().__init__()
+        self.path = path
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.codec = default_codec() if codec is None else codec
+        self._buffer: list[HomeConnectEvent] = []
+        self._last_flush: datetime = datetime.now()
+
+    def __enter__(self) -> "BlockFileExporter":
+        self._fp = self._open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._write_block()
+        self._fp.close()
+        del self._fp
+        return
+
+    def export(self, event: HomeConnectEvent) -> None:
+        self.bulk_export([event])
+
+    def bulk_export(self, events: list[HomeConnectEvent]) -> None:
+        self._buffer.extend(events)
+        while len(self._buffer) >= self.block_size:
+            self._write_block()
+        self._flush()
+
+    def _write_block(self) -> None:
+        if self._buffer:
+            events, self._buffer = self._buffer[: self.block_size], self._buffer[self.block_size :]
+            self._fp.write(encode_block(events, self._codec))
+            self._fp.flush()
+
+    def _flush(self) -> None:
+        now = datetime.now()
+        if now.date() != self._last_flush.date():
+            while self._buffer:
+                self._write_block()
+            self._fp.close()
+            self._fp = self._open()
+        elif now - self._last_flush > self.flush_interval:
+            self.logger.info("Flushing output file.")
+            self._last_flush = datetime.now()
+            while self._buffer:
+                self._write_block()
+
+    def _open(self) -> BinaryIO:
+        self._last_flush = datetime.now()
+        path = self.path / f"hcw_{self._last_flush.date().strftime('%Y-%m-%d')}{SUFFIX}"
+        self.logger.info(f"Opening output file {str(path)}.")
+        if path.exists() and path.stat().st_size >= FILE_HEADER.size:
+            content = path.read_bytes()
+            self._codec = read_file_header(content)
+            # Cut off a block that was not written completely, e.g. due to a crash.
+            end = FILE_HEADER.size
+            for block in iter_blocks(content):
+                end = block.offset + block.length
+            fp = path.open("r+b")
+            fp.truncate(end)
+            fp.seek(end)
+            return fp
+        self._codec = self.codec
+        fp = path.open("wb")
+        fp.write(file_header(self._codec))
+        return fp
@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta
+from enum import Enum
+from os import fsync
 from pathlib import Path
+from threading import Condition, Thread
 from typing import TextIO
 
 from homeconnect_watcher.event import HomeConnectEvent
@@ -7,41 +10,176 @@ from homeconnect_watcher.event import HomeConnectEvent
 from .base import BaseExporter
 
 
+class LogFormat(str, Enum):
+    JSONL = "jsonl"
+    BLOCKS = "blocks"  # See BlockFileExporter.
+    PARQUET = "parquet"  # See ParquetExporter.
+
+
 class FileExporter(BaseExporter):
+    """
+    Write events to daily jsonl files.
+
+    Events are encoded when they are exported, and buffered in memory. A writer thread writes the buffer to the file
+    in a single write once `write_size` events have been buffered, and otherwise every `write_delay` seconds.
+    The file is flushed every `flush_interval`, or once `flush_events` events have been written since the last
+    flush, and synced to disk at every flush with `fsync`. Files are rolled over at the date change, and once they
+    reach `max_size` bytes into hcw_<date>_001.jsonl, hcw_<date>_002.jsonl, etc.
+
+    Exporting blocks while `max_buffered` events are waiting to be written. An error of the writer thread is raised
+    by the next export, and on exit.
+    """
+
     # Set in __enter__; only valid inside the context.
     _fp: TextIO
 
-    def __init__(self, path: Path, flush_interval: timedelta = timedelta(minutes=30)):
+    def __init__(
+        self,
+        path: Path,
+        flush_interval: timedelta = timedelta(minutes=30),
+        flush_events: int | None = None,
+        fsync: bool = False,
+        write_size: int = 1000,
+        write_delay: float = 1.0,
+        max_size: int | None = None,
+        max_buffered: int = 100_000,
+    ):
         super().__init__()
         self.path = path
         self.flush_interval = flush_interval
+        self.flush_events = flush_events
+        self.fsync = fsync
+        self.write_size = write_size
+        self.write_delay = write_delay
+        self.max_size = max_size
+        self.max_buffered = max_buffered
         self._last_flush: datetime = datetime.now()
+        self._buffer: list[str] = []
+        self._condition = Condition()
+        self._closing = False
+        self._error: BaseException | None = None
+        self._writer: Thread | None = None
+        self._part = 0  # Of the file of the day, see _open.
+        self._size = 0  # Of the open file.
+        self._unflushed = 0  # Events written since the last flush.
 
     def __enter__(self) -> "FileExporter":
         self._fp = self._open()
+        self._closing, self._error = False, None
+        self._writer = Thread(target=self._run, name=f"{self.__class__.__name__}-writer", daemon=True)
+        self._writer.start()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
         self._fp.close()
         del self._fp
+        if self._error is not None and exc_type is None:
+            raise self._error
         return
 
     def export(self, event: HomeConnectEvent) -> None:
-        self._fp.write(str(event))
-        self._flush()
+        self._buffer_lines([str(event)])
+
+    def bulk_export(self, events: list[HomeConnectEvent]) -> None:
+        self._buffer_lines([str(event) for event in events])
+
+    def _buffer_lines(self, lines: list[str]) -> None:
+        """Add encoded events to the buffer, which are encoded outside of the lock."""
+        with self._condition:
+            if len(self._buffer) >= self.max_buffered:
+                self._condition.wait_for(lambda: len(self._buffer) < self.max_buffered or self._error is not None)
+            if self._error is not None:
+                raise self._error
+            self._buffer.extend(lines)
+            if len(self._buffer) >= self.write_size:
+                self._condition.notify_all()
 
-    def _flush(self) -> None:
+    def _run(self) -> None:
+        """Write the buffer to the file, until the exporter is closed."""
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._closing or len(self._buffer) >= self.write_size, timeout=self.write_delay
+                    )
+                    lines, self._buffer, closing = self._buffer, [], self._closing
+                    self._condition.notify_all()  # There is room in the buffer again.
+                if lines:
+                    self._write(lines)
+                self._flush(force=closing)
+                if closing:
+                    return
+        except BaseException as e:
+            self.logger.exception("Failed to write events.")
+            with self._condition:
+                self._error = e
+                self._condition.notify_all()
+
+    def _write(self, lines: list[str]) -> None:
+        while lines:
+            if self.max_size is not None and self._size >= self.max_size:
+                self._roll_over()
+            n = len(lines) if self.max_size is None else self._fitting(lines, self.max_size - self._size)
+            chunk = "".join(lines[:n])
+            self._fp.write(chunk)
+            self._size += len(chunk)  # Events are encoded as ASCII.
+            self._unflushed += n
+            lines = lines[n:]
+
+    @staticmethod
+    def _fitting(lines: list[str], size: int) -> int:
+        """The number of lines to write to reach the size, which is at least one."""
+        total = 0
+        for n, line in enumerate(lines, start=1):
+            total += len(line)
+            if total >= size:
+                return n
+        return len(lines)
+
+    def _roll_over(self) -> None:
+        self._fp.flush()
+        self._sync()
+        self._fp.close()
+        self._part += 1
+        self._fp = self._open()
+
+    def _flush(self, force: bool = False) -> None:
         now = datetime.now()
         if now.date() != self._last_flush.date():
             self._fp.close()
+            self._part = 0
             self._fp = self._open()
-        elif now - self._last_flush > self.flush_interval:
-            self.logger.info("Flushing output file.")
+        elif (
+            force
+            or now - self._last_flush > self.flush_interval
+            or (self.flush_events is not None and self._unflushed >= self.flush_events)
+        ):
+            self.logger.debug("Flushing output file.")
             self._last_flush = datetime.now()
             self._fp.flush()
+            self._sync()
+            self._unflushed = 0
+
+    def _sync(self) -> None:
+        if self.fsync:
+            fsync(self._fp.fileno())
 
     def _open(self) -> TextIO:
         self._last_flush = datetime.now()
-        path = self.path / f"hcw_{self._last_flush.date().strftime('%Y-%m-%d')}.jsonl"
+        day = self._last_flush.date().strftime("%Y-%m-%d")
+        while True:
+            path = self.path / (f"hcw_{day}.jsonl" if self._part == 0 else f"hcw_{day}_{self._part:03d}.jsonl")
+            # After a restart, continue with the last file of the day that is not full.
+            if self.max_size is None or not path.exists() or path.stat().st_size < self.max_size:
+                break
+            self._part += 1
         self.logger.info(f"Opening output file {str(path)}.")
-        return path.open("a")
+        fp = path.open("a")
+        self._size, self._unflushed = fp.tell(), 0
+        return fp
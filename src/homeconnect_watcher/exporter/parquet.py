@@ -0,0 +1,167 @@
+from datetime import date, datetime, timedelta
+from json import dumps
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.session import _text
+
+from .base import BaseExporter
+
+try:
+    import pyarrow as pa  # ty: ignore[unresolved-import]
+    import pyarrow.parquet as pq  # ty: ignore[unresolved-import]
+except ImportError:
+    pa = pq = None
+
+# The events and their items are written as two datasets, in the subdirectories EVENTS and ITEMS of the path. Both
+# are partitioned by the (local) date of the events and their appliance, with hive-style directory names such as
+# `date=2024-01-11/appliance_id=SIEMENS-WM14T6H9NL-AB1234567890`, which analytics engines recognize as columns.
+EVENTS = "events"
+ITEMS = "items"
+# The partition of events without an appliance, as named by Hive and Arrow.
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _schemas() -> dict[str, Any]:
+    assert pa is not None
+    timestamp = pa.timestamp("us", tz="UTC")
+    return {
+        # The data and error are the JSON of the payload, as in the jsonl logs.
+        EVENTS: pa.schema(
+            [("timestamp", timestamp), ("event", pa.string()), ("data", pa.string()), ("error", pa.string())]
+        ),
+        # A row per key/value pair of the items of an event. The value is text like the ->> operator in PostgreSQL,
+        # and numeric values are also held as a number.
+        ITEMS: pa.schema(
+            [
+                ("timestamp", timestamp),
+                ("event", pa.string()),
+                ("key", pa.string()),
+                ("value", pa.string()),
+                ("number", pa.float64()),
+            ]
+        ),
+    }
+
+
+def _number(value: Any) -> float | None:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class ParquetExporter(BaseExporter):
+    """
+    Write events to a Parquet dataset of events and their items, partitioned by date and appliance.
+
+    Events are buffered per partition and written as a row group once `row_group_size` events have been collected,
+    when `flush_interval` has passed or when the exporter is closed. Every partition gets a file of its own per run,
+    as Parquet files cannot be appended to; a file is complete once it has been closed, which happens when the
+    exporter is closed and when the events of a later date arrive.
+    """
+
+    def __init__(self, path: Path, row_group_size: int = 10_000, flush_interval: timedelta = timedelta(minutes=5)):
+        super().__init__()
+        if pa is None or pq is None:
+            raise ImportError(
+                "Unable to write Parquet; please run `pip install pyarrow` or "
+                "`pip install 'homeconnect-watcher[parquet]'`."
+            )
+        self.path = path
+        self.row_group_size = row_group_size
+        self.flush_interval = flush_interval
+        self.n_files = 0
+        self._schemas = _schemas()
+        self._buffers: dict[tuple[date, str], list[HomeConnectEvent]] = {}
+        self._writers: dict[tuple[str, date, str], Any] = {}  # The open ParquetWriter per dataset and partition.
+        self._last_flush: datetime = datetime.now()
+        self._day: date | None = None  # The latest date of the events; the files of earlier dates are closed.
+
+    def __enter__(self) -> "ParquetExporter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+        return
+
+    def export(self, event: HomeConnectEvent) -> None:
+        self.bulk_export([event])
+
+    def bulk_export(self, events: list[HomeConnectEvent]) -> None:
+        for event in events:
+            partition = (date.fromtimestamp(event.timestamp), event.appliance_id or NULL_PARTITION)
+            buffer = self._buffers.setdefault(partition, [])
+            buffer.append(event)
+            if len(buffer) >= self.row_group_size:
+                self._write(partition)
+            if self._day is None or partition[0] > self._day:
+                self._day = partition[0]
+                self._close_before(self._day)
+        if datetime.now() - self._last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered events of every partition as a row group."""
+        self._last_flush = datetime.now()
+        for partition in list(self._buffers):
+            self._write(partition)
+
+    def close(self) -> None:
+        """Write the buffered events and close all files."""
+        self._close_before(None)
+
+    def _write(self, partition: tuple[date, str]) -> None:
+        assert pa is not None
+        events = self._buffers.pop(partition, [])
+        if not events:
+            return
+        events.sort(key=lambda event: event.timestamp)
+        timestamps = [datetime.fromtimestamp(event.timestamp).astimezone() for event in events]
+        columns: dict[str, dict[str, list]] = {
+            EVENTS: {
+                "timestamp": timestamps,
+                "event": [event.event for event in events],
+                "data": [None if event.data is None else dumps(event.data) for event in events],
+                "error": [None if event.error is None else dumps(event.error) for event in events],
+            },
+            ITEMS: {"timestamp": [], "event": [], "key": [], "value": [], "number": []},
+        }
+        items = columns[ITEMS]
+        for timestamp, event in zip(timestamps, events):
+            try:
+                pairs = event.items
+            except ValueError:  # Malformed events are kept in the events, but have no items.
+                continue
+            for key, value in pairs.items():
+                items["timestamp"].append(timestamp)
+                items["event"].append(event.event)
+                items["key"].append(key)
+                items["value"].append(_text(value))
+                items["number"].append(_number(value))
+        for dataset, values in columns.items():
+            table = pa.Table.from_pydict(values, schema=self._schemas[dataset])
+            if table.num_rows:
+                self._writer(dataset, partition).write_table(table)
+
+    def _writer(self, dataset: str, partition: tuple[date, str]) -> Any:
+        assert pq is not None
+        day, appliance_id = partition
+        if (dataset, day, appliance_id) not in self._writers:
+            directory = self.path / dataset / f"date={day.isoformat()}" / f"appliance_id={appliance_id}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{uuid4().hex}.parquet"
+            self.logger.info(f"Opening output file {str(path)}.")
+            self._writers[dataset, day, appliance_id] = pq.ParquetWriter(
+                path, self._schemas[dataset], compression="zstd"
+            )
+            self.n_files += 1
+        return self._writers[dataset, day, appliance_id]
+
+    def _close_before(self, day: date | None) -> None:
+        """Write the buffered events of the partitions before a date, or of all partitions, and close their files."""
+        for partition in list(self._buffers):
+            if day is None or partition[0] < day:
+                self._write(partition)
+        for key in list(self._writers):
+            if day is None or key[1] < day:
+                self._writers.pop(key).close()
@@ -1,16 +1,28 @@
 from datetime import datetime, timedelta
 
-from homeconnect_watcher.db import WatcherDBClient
+from homeconnect_watcher.db import AsyncWatcherDBClient, WatcherDBClient
 from homeconnect_watcher.event import HomeConnectEvent
-from homeconnect_watcher.exporter import BaseExporter
+from homeconnect_watcher.exporter.base import BaseAsyncExporter, BaseExporter
 
 
 class PGExporter(BaseExporter, WatcherDBClient):
-    def __init__(self, connection_string: str, refresh_interval: timedelta = timedelta(hours=6)):
+    """
+    Write events to PostgreSQL. The sessions table is updated every `sessions_interval`, and the materialized
+    views are refreshed every `refresh_interval`.
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        refresh_interval: timedelta = timedelta(hours=6),
+        sessions_interval: timedelta = timedelta(seconds=30),
+    ):
         WatcherDBClient.__init__(self, connection_string=connection_string)
         BaseExporter.__init__(self)
         self.refresh_interval = refresh_interval
+        self.sessions_interval = sessions_interval
         self._next_refresh: datetime = datetime.now() + self.refresh_interval
+        self._next_sessions_update: datetime = datetime.now() + self.sessions_interval
 
     def __enter__(self) -> "PGExporter":
         WatcherDBClient.__enter__(self)
@@ -20,13 +32,49 @@ class PGExporter(BaseExporter, WatcherDBClient):
         WatcherDBClient.__exit__(self, exc_type, exc_val, exc_tb)
 
     def export(self, event: HomeConnectEvent) -> None:
-        self.write_events([event])
-        if datetime.now() > self._next_refresh:
-            self.refresh_views()
-            self._next_refresh: datetime = datetime.now() + self.refresh_interval
+        self.bulk_export([event])
 
     def bulk_export(self, events: list[HomeConnectEvent]) -> None:
         self.write_events(events)
+        if datetime.now() > self._next_sessions_update:
+            self.update_sessions()
+            self._next_sessions_update = datetime.now() + self.sessions_interval
         if datetime.now() > self._next_refresh:
             self.refresh_views()
-            self._next_refresh: datetime = datetime.now() + self.refresh_interval
+            self._next_refresh = datetime.now() + self.refresh_interval
+
+
+class AsyncPGExporter(BaseAsyncExporter, AsyncWatcherDBClient):
+    """Asynchronous counterpart of PGExporter."""
+
+    def __init__(
+        self,
+        connection_string: str,
+        refresh_interval: timedelta = timedelta(hours=6),
+        sessions_interval: timedelta = timedelta(seconds=30),
+    ):
+        AsyncWatcherDBClient.__init__(self, connection_string=connection_string)
+        BaseAsyncExporter.__init__(self)
+        self.refresh_interval = refresh_interval
+        self.sessions_interval = sessions_interval
+        self._next_refresh: datetime = datetime.now() + self.refresh_interval
+        self._next_sessions_update: datetime = datetime.now() + self.sessions_interval
+
+    async def __aenter__(self) -> "AsyncPGExporter":
+        await AsyncWatcherDBClient.__aenter__(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await AsyncWatcherDBClient.__aexit__(self, exc_type, exc_val, exc_tb)
+
+    async def export(self, event: HomeConnectEvent) -> None:
+        await self.bulk_export([event])
+
+    async def bulk_export(self, events: list[HomeConnectEvent]) -> None:
+        await self.write_events(events)
+        if datetime.now() > self._next_sessions_update:
+            await self.update_sessions()
+            self._next_sessions_update = datetime.now() + self.sessions_interval
+        if datetime.now() > self._next_refresh:
+            await self.refresh_views()
+            self._next_refresh = datetime.now() + self.refresh_interval
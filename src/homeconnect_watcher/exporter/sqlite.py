@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from homeconnect_watcher.db import SQLiteDBClient
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.exporter.base import BaseExporter
+
+
+class SQLiteExporter(BaseExporter, SQLiteDBClient):
+    """
+    Write events to a local SQLite database, and update the sessions table every `refresh_interval`.
+
+    Each batch of events is written in a single transaction.
+    """
+
+    def __init__(self, connection_string: str, refresh_interval: timedelta = timedelta(seconds=30)):
+        SQLiteDBClient.__init__(self, connection_string=connection_string)
+        BaseExporter.__init__(self)
+        self.refresh_interval = refresh_interval
+        self._next_refresh: datetime = datetime.now() + self.refresh_interval
+
+    def __enter__(self) -> "SQLiteExporter":
+        SQLiteDBClient.__enter__(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        SQLiteDBClient.__exit__(self, exc_type, exc_val, exc_tb)
+
+    def export(self, event: HomeConnectEvent) -> None:
+        self.bulk_export([event])
+
+    def bulk_export(self, events: list[HomeConnectEvent]) -> None:
+        self.write_events(events)
+        if datetime.now() > self._next_refresh:
+            self.update_sessions()
+            self._next_refresh = datetime.now() + self.refresh_interval
@@ -0,0 +1,256 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from hashlib import sha256
+from logging import getLogger
+from multiprocessing import get_context
+from os import cpu_count
+from pathlib import Path
+from queue import Queue
+from threading import Lock, Thread
+from time import monotonic
+
+from tqdm import tqdm
+
+from homeconnect_watcher.db.client import ManifestEntry, WatcherDBClient, event_row
+from homeconnect_watcher.dedup import DedupCache
+from homeconnect_watcher.event import HomeConnectEvent
+
+logger = getLogger(__name__)
+
+Row = tuple[str, str, datetime, str]
+
+
+HASH_WINDOW = 64 * 1024
+
+
+def content_hash(path: Path, offset: int) -> str:
+    """
+    Fingerprint the first `offset` bytes of a file.
+
+    Only the first and last HASH_WINDOW bytes before the offset are hashed, so that verifying a large file
+    that has since been appended to costs constant time.
+    """
+    digest = sha256(str(offset).encode())
+    with path.open("rb") as fp:
+        digest.update(fp.read(min(offset, HASH_WINDOW)))
+        if offset > HASH_WINDOW:
+            fp.seek(max(offset - HASH_WINDOW, HASH_WINDOW))
+            digest.update(fp.read(offset - fp.tell()))
+    return digest.hexdigest()
+
+
+@dataclass
+class ParsedFile:
+    path: Path
+    rows: list[Row]
+    n_bytes: int
+    manifest: ManifestEntry
+
+
+def manifest_name(path: Path, root: Path | None = None) -> str:
+    """The name of a file in the ingest manifest: its path relative to the log directory `root`, if given."""
+    return path.name if root is None else path.relative_to(root).as_posix()
+
+
+def parse_file(path: Path, offset: int = 0, name: str | None = None) -> ParsedFile:
+    """
+    Parse a jsonl file line by line, starting at `offset`, into rows for the events table.
+
+    A trailing line without newline is left for the next run, as it may still be being written. Duplicate events
+    within the part that is parsed are skipped, so that they do not need to be merged into the events table.
+    The manifest entry is for `name`, by default the name of the file. Runs in a worker process.
+    """
+    stat = path.stat()
+    rows = []
+    cache = DedupCache()
+    end = offset
+    with path.open("rb") as fp:
+        fp.seek(offset)
+        for line in fp:
+            if not line.endswith(b"\n"):
+                break
+            end += len(line)
+            if len(line.strip()) == 0:
+                continue  # Skip empty lines
+            event = HomeConnectEvent.from_string(line.decode("utf-8"))
+            if event.timestamp is None:
+                continue  # Skip events that have no timestamp
+            if cache.seen(event):
+                continue  # Skip events that the stream delivered twice
+            rows.append(event_row(event))
+    manifest = ManifestEntry(
+        file_name=name or path.name,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        byte_offset=end,
+        content_hash=content_hash(path, end),
+    )
+    return ParsedFile(path=path, rows=rows, n_bytes=end - offset, manifest=manifest)
+
+
+def resume_offset(path: Path, entry: ManifestEntry | None) -> int | None:
+    """
+    Determine where to continue loading a file, given its manifest entry.
+
+    Returns None if the file has been loaded completely, 0 if it is new or has changed, and otherwise the
+    offset of the appended tail. A file that has been modified without growing is considered changed, as the
+    content hash does not cover its middle; a file that has grown is assumed to have only been appended to.
+    """
+    if entry is None:
+        return 0
+    stat = path.stat()
+    if stat.st_mtime == entry.mtime and stat.st_size == entry.size:
+        return None
+    if stat.st_size <= entry.size or content_hash(path, entry.byte_offset) != entry.content_hash:
+        return 0
+    return entry.byte_offset
+
+
+class _PendingFile:
+    """Counts down the batches of a file, so that its manifest is updated once all of them are written."""
+
+    def __init__(self, manifest: ManifestEntry, n_batches: int):
+        self.manifest = manifest
+        self._remaining = n_batches
+        self._lock = Lock()
+
+    def batch_done(self) -> bool:
+        with self._lock:
+            self._remaining -= 1
+            return self._remaining == 0
+
+
+@dataclass
+class LoadReport:
+    n_files: int = 0
+    n_skipped: int = 0
+    n_events: int = 0
+    n_bytes: int = 0
+    # The earliest timestamp of the loaded events per appliance, to update the sessions from.
+    first_timestamps: dict[str, datetime] = field(default_factory=dict)
+    start_time: float = field(default_factory=monotonic)
+    end_time: float | None = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time or monotonic()) - self.start_time
+
+    @property
+    def events_per_second(self) -> float:
+        return self.n_events / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.n_bytes / 1e6 / self.duration if self.duration > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Loaded {self.n_events} events ({self.n_bytes / 1e6:.1f} MB) from {self.n_files} files "
+            f"(skipped {self.n_skipped} unchanged files) "
+            f"in {self.duration:.1f}s: {self.events_per_second:.0f} events/s, {self.mb_per_second:.2f} MB/s."
+        )
+
+
+class BulkLoader:
+    """
+    Load jsonl event logs into the database.
+
+    Files are parsed in a process pool; the resulting rows are written in batches of `batch_size` by
+    `connections` writer threads, each with their own database connection. At most a few parsed files and
+    batches are held in memory at any time.
+
+    Unless `incremental` is False, the ingest manifest is used to skip files that were loaded before and to
+    only load what has been appended to a file since. A file is recorded in the manifest once all its rows
+    have been written, so an interrupted load resumes where it left off.
+    """
+
+    def __init__(
+        self, connection_string: str, batch_size: int = 10_000, processes: int | None = None, connections: int = 2
+    ):
+        self.connection_string = connection_string
+        self.batch_size = batch_size
+        self.processes = processes
+        self.connections = connections
+
+    def load(self, paths: list[Path], incremental: bool = True, root: Path | None = None) -> LoadReport:
+        """Load files, which are recorded in the manifest by their path relative to `root` (see manifest_name)."""
+        report = LoadReport()
+        names = {path: manifest_name(path, root) for path in paths}
+        offsets = self._offsets(names) if incremental else dict.fromkeys(paths, 0)
+        todo = {path: offset for path, offset in offsets.items() if offset is not None}
+        report.n_skipped = len(offsets) - len(todo)
+        batches: Queue[tuple[list[Row], _PendingFile] | None] = Queue(maxsize=2 * self.connections)
+        errors: list[Exception] = []
+        writers = [Thread(target=self._write, args=(batches, errors), daemon=True) for _ in range(self.connections)]
+        for writer in writers:
+            writer.start()
+        max_pending = 2 * (self.processes or cpu_count() or 1)
+        try:
+            # Spawn rather than fork the workers, as forking a process with running threads can deadlock them.
+            executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=get_context("spawn"))
+            with executor, tqdm(total=len(todo)) as progress:
+                pending: deque[Future[ParsedFile]] = deque()
+                for path, offset in todo.items():
+                    pending.append(executor.submit(parse_file, path, offset, names[path]))
+                    if len(pending) >= max_pending:
+                        self._enqueue(pending.popleft().result(), batches, errors, report, progress)
+                while pending:
+                    self._enqueue(pending.popleft().result(), batches, errors, report, progress)
+        finally:
+            for _ in writers:
+                batches.put(None)
+            for writer in writers:
+                writer.join()
+        if errors:
+            raise errors[0]
+        report.end_time = monotonic()
+        return report
+
+    def _offsets(self, names: dict[Path, str]) -> dict[Path, int | None]:
+        with WatcherDBClient(connection_string=self.connection_string, init=False) as client:
+            manifest = client.read_manifest()
+        return {path: resume_offset(path, manifest.get(name)) for path, name in names.items()}
+
+    def _enqueue(
+        self,
+        parsed: ParsedFile,
+        batches: "Queue[tuple[list[Row], _PendingFile] | None]",
+        errors: list[Exception],
+        report: LoadReport,
+        progress: tqdm,
+    ) -> None:
+        # A file without new rows still passes through a writer, as an empty batch, to record its manifest.
+        starts = range(0, len(parsed.rows), self.batch_size) or [0]
+        pending_file = _PendingFile(parsed.manifest, n_batches=len(starts))
+        for i in starts:
+            if errors:
+                raise errors[0]
+            batches.put((parsed.rows[i : i + self.batch_size], pending_file))
+        report.n_files += 1
+        report.n_events += len(parsed.rows)
+        report.n_bytes += parsed.n_bytes
+        first_timestamps = report.first_timestamps
+        for appliance_id, _, timestamp, _ in parsed.rows:
+            if appliance_id and (appliance_id not in first_timestamps or timestamp < first_timestamps[appliance_id]):
+                first_timestamps[appliance_id] = timestamp
+        progress.set_postfix(events_s=f"{report.events_per_second:.0f}", mb_s=f"{report.mb_per_second:.2f}")
+        progress.update()
+
+    def _write(self, batches: "Queue[tuple[list[Row], _PendingFile] | None]", errors: list[Exception]) -> None:
+        try:
+            with WatcherDBClient(connection_string=self.connection_string, init=False) as client:
+                while (item := batches.get()) is not None:
+                    if errors:
+                        continue
+                    rows, pending_file = item
+                    if rows:
+                        client.write_rows(rows)
+                    if pending_file.batch_done():
+                        client.update_manifest(pending_file.manifest)
+        except Exception as e:
+            logger.exception("Failed to write events.")
+            errors.append(e)
+            while batches.get() is not None:
+                pass  # Keep draining, so that the producer does not block.
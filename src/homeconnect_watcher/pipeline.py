@@ -0,0 +1,143 @@
+from asyncio import (
+    FIRST_COMPLETED,
+    Queue,
+    Task,
+    TimeoutError,
+    create_task,
+    get_running_loop,
+    to_thread,
+    wait,
+    wait_for,
+)
+from enum import Enum
+from logging import getLogger
+
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.exporter.base import BaseAsyncExporter, BaseExporter
+from homeconnect_watcher.utils import Metrics
+
+
+class DropPolicy(str, Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+
+
+class ExportPipeline:
+    """
+    Fan events out to exporters through a bounded queue per exporter.
+
+    Each exporter is drained by its own consumer task, which collects up to `batch_size` events, or as many as
+    arrive within `batch_delay` seconds, and hands them to `bulk_export` (in a worker thread, unless the exporter
+    is asynchronous). A slow exporter
+    thus only fills up its own queue. When a queue is full, the drop policy decides whether `put` waits for
+    room (block), discards the oldest queued event (drop-oldest) or discards the new event (drop-newest).
+
+    Use as an async context manager; on exit all queued events are exported before the consumers stop.
+    """
+
+    def __init__(
+        self,
+        exporters: list[BaseExporter | BaseAsyncExporter],
+        max_size: int = 10_000,
+        batch_size: int = 500,
+        batch_delay: float = 1.0,
+        drop_policy: DropPolicy = DropPolicy.BLOCK,
+        metrics: Metrics | None = None,
+    ):
+        self.logger = getLogger(self.__class__.__name__)
+        self.exporters = exporters
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.drop_policy = drop_policy
+        self.metrics = metrics
+        self._queues: list[Queue[HomeConnectEvent | None]] = []
+        self._consumers: list[Task] = []
+
+    async def __aenter__(self) -> "ExportPipeline":
+        for exporter in self.exporters:
+            queue: Queue[HomeConnectEvent | None] = Queue(maxsize=self.max_size)
+            self._queues.append(queue)
+            self._consumers.append(create_task(self._consume(exporter, queue)))
+            if self.metrics:
+                self.metrics.set_queue_depth(exporter=_name(exporter), function=queue.qsize)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        for queue, consumer in zip(self._queues, self._consumers):
+            if not consumer.done():
+                await self._put_blocking(queue, consumer, None)  # Sentinel: flush and stop.
+        for consumer in self._consumers:
+            try:
+                await consumer
+            except Exception as e:
+                if exc_type is None:
+                    raise e
+        self._queues, self._consumers = [], []
+
+    async def put(self, event: HomeConnectEvent) -> None:
+        """
+        Queue an event for all exporters.
+
+        Raises the exception of a failed consumer, so that export errors are not silently swallowed.
+        """
+        for exporter, queue, consumer in zip(self.exporters, self._queues, self._consumers):
+            if consumer.done():
+                consumer.result()
+            if not queue.full():
+                queue.put_nowait(event)
+            elif self.drop_policy == DropPolicy.BLOCK:
+                await self._put_blocking(queue, consumer, event)
+            else:
+                if self.drop_policy == DropPolicy.DROP_OLDEST:
+                    queue.get_nowait()
+                    queue.put_nowait(event)
+                self.logger.warning(f"Queue for {_name(exporter)} is full; dropped an event.")
+                if self.metrics:
+                    self.metrics.increment_dropped_events(exporter=_name(exporter))
+
+    @staticmethod
+    async def _put_blocking(queue: Queue, consumer: Task, item: HomeConnectEvent | None) -> None:
+        """Wait for room in the queue, but stop waiting if the consumer dies."""
+        put = create_task(queue.put(item))
+        await wait({put, consumer}, return_when=FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            consumer.result()
+
+    async def _consume(self, exporter: BaseExporter | BaseAsyncExporter, queue: Queue[HomeConnectEvent | None]) -> None:
+        loop = get_running_loop()
+        while True:
+            event = await queue.get()
+            if event is None:
+                return
+            batch = [event]
+            deadline = loop.time() + self.batch_delay
+            closing = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if queue.empty() and remaining <= 0:
+                    break
+                try:
+                    event = queue.get_nowait() if not queue.empty() else await wait_for(queue.get(), remaining)
+                except TimeoutError:
+                    break
+                if event is None:
+                    closing = True
+                    break
+                batch.append(event)
+            try:
+                if isinstance(exporter, BaseAsyncExporter):
+                    await exporter.bulk_export(batch)
+                else:
+                    await to_thread(exporter.bulk_export, batch)
+            except Exception:
+                self.logger.exception(f"Export to {_name(exporter)} failed.")
+                raise
+            if closing:
+                return
+
+
+def _name(exporter: BaseExporter | BaseAsyncExporter) -> str:
+    return exporter.__class__.__name__
@@ -1,22 +1,201 @@
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from heapq import heappop, heappush
+from json import dumps, loads
 from pathlib import Path
-from typing import Iterable
+from re import fullmatch
+from typing import Iterable, Iterator
 
 from tqdm import tqdm
 
+from homeconnect_watcher.blockfile import SUFFIX, read_block_file
+from homeconnect_watcher.dedup import DedupCache
 from homeconnect_watcher.event import HomeConnectEvent
 
+# Every jsonl file gets a sidecar index, with an entry per INDEX_CHUNK_SIZE lines holding their byte range,
+# time range, appliances and event types. The index records up to which size the file was indexed, so that
+# a growing file only needs its new lines to be indexed.
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+INDEX_CHUNK_SIZE = 1000
+# A daily file holds the events received on that (local) day, but it is only rotated on the first event of the
+# next day, and events may be written a while after they were received. So a file is only skipped by its name
+# when its day is more than DAY_MARGIN seconds away from the requested range.
+DAY_MARGIN = 86400
 
-def read_events(path: Path) -> Iterable[list[HomeConnectEvent]]:
-    for f in tqdm(list(path.glob("*.jsonl"))):
-        contents = f.read_text()
+
+def log_files(path: Path, suffix: str = ".jsonl") -> list[Path]:
+    """
+    The log files in a directory, and in its subdirectories into which sharded workers write (see `watch --workers`),
+    in order of name.
+    """
+    return sorted([*path.glob(f"*{suffix}"), *path.glob(f"*/*{suffix}")], key=lambda f: (f.name, f.parent.name))
+
+
+def read_events(path: Path, dedup: bool = False) -> Iterable[list[HomeConnectEvent]]:
+    """Read the events from the jsonl files in a directory, per file; with `dedup`, duplicates are skipped."""
+    cache = DedupCache()
+    for f in tqdm(log_files(path)):
         data = []
-        for line in contents.split("\n"):
-            if len(line) == 0:
-                # Skip empty lines
+        with f.open() as fp:
+            for line in fp:
+                if len(line.strip()) == 0:
+                    # Skip empty lines
+                    continue
+                event = HomeConnectEvent.from_string(line)
+                if event.timestamp is None:
+                    # Skip events that have no timestamp
+                    continue
+                if dedup and cache.seen(event):
+                    continue
+                data.append(event)
+        yield data
+
+
+def read_block_events(path: Path, start: float | None = None, end: float | None = None) -> Iterator[HomeConnectEvent]:
+    """Read the events from the block files in a directory, optionally only those within [start, end)."""
+    for f in log_files(path, suffix=SUFFIX):
+        yield from read_block_file(f, start=start, end=end)
+
+
+@dataclass
+class Chunk:
+    offset: int
+    length: int
+    first_timestamp: float
+    last_timestamp: float
+    appliance_ids: list[str] = field(default_factory=list)
+    events: list[str] = field(default_factory=list)
+
+    def matches(self, start: float | None, end: float | None, appliance_id: str | None, event: str | None) -> bool:
+        return (
+            (start is None or self.last_timestamp >= start)
+            and (end is None or self.first_timestamp < end)
+            and (appliance_id is None or appliance_id in self.appliance_ids)
+            and (event is None or event in self.events)
+        )
+
+
+def _scan(path: Path, offset: int, chunk_size: int) -> tuple[list[Chunk], int]:
+    """Index the complete lines of a file from offset; return the chunks and the offset up to which it was read."""
+    chunks: list[Chunk] = []
+    chunk: Chunk | None = None
+    n_lines = 0
+    with path.open("rb") as fp:
+        fp.seek(offset)
+        for line in fp:
+            if not line.endswith(b"\n"):
+                break  # A line that is still being written.
+            line_offset, offset = offset, offset + len(line)
+            if len(line.strip()) == 0:
                 continue
-            event = HomeConnectEvent.from_string(line)
+            event = HomeConnectEvent.from_string(line.decode())
             if event.timestamp is None:
-                # Skip events that have no timestamp
                 continue
-            data.append(event)
-        yield data
+            if chunk is None or n_lines == chunk_size:
+                chunk = Chunk(line_offset, 0, event.timestamp, event.timestamp)
+                chunks.append(chunk)
+                n_lines = 0
+            n_lines += 1
+            chunk.length = offset - chunk.offset
+            chunk.first_timestamp = min(chunk.first_timestamp, event.timestamp)
+            chunk.last_timestamp = max(chunk.last_timestamp, event.timestamp)
+            if event.appliance_id is not None and event.appliance_id not in chunk.appliance_ids:
+                chunk.appliance_ids.append(event.appliance_id)
+            if event.event not in chunk.events:
+                chunk.events.append(event.event)
+    return chunks, offset
+
+
+def index_file(path: Path, chunk_size: int = INDEX_CHUNK_SIZE) -> list[Chunk]:
+    """Return the index of a jsonl file, creating or extending its sidecar index when needed."""
+    index_path = path.with_name(path.name + INDEX_SUFFIX)
+    size = path.stat().st_size
+    chunks: list[Chunk] = []
+    indexed = 0
+    if index_path.exists():
+        try:
+            index = loads(index_path.read_text())
+            if index["version"] == INDEX_VERSION and index["size"] <= size:
+                chunks, indexed = [Chunk(**chunk) for chunk in index["chunks"]], index["size"]
+        except (ValueError, KeyError, TypeError):
+            pass  # Rebuild an index that cannot be read.
+    if indexed < size:
+        new_chunks, new_indexed = _scan(path, indexed, chunk_size)
+        if new_indexed > indexed:
+            chunks, indexed = chunks + new_chunks, new_indexed
+            index = dict(version=INDEX_VERSION, size=indexed, chunks=[asdict(chunk) for chunk in chunks])
+            try:
+                index_path.write_text(dumps(index, separators=(",", ":")))
+            except OSError:
+                pass  # E.g. a read-only archive; the index is then built on every read.
+    return chunks
+
+
+def _archive_files(path: Path, start: float | None, end: float | None) -> list[Path]:
+    files = []
+    for f in log_files(path):
+        # Also the files into which a day is rolled over by size, e.g. hcw_2024-01-11_001.jsonl.
+        match = fullmatch(r"hcw_(\d{4}-\d{2}-\d{2})(?:_\d+)?\.jsonl", f.name)
+        if match is not None:
+            day = datetime.strptime(match[1], "%Y-%m-%d").timestamp()
+            if (end is not None and day - DAY_MARGIN >= end) or (
+                start is not None and day + 86400 + DAY_MARGIN <= start
+            ):
+                continue
+        files.append(f)
+    return files
+
+
+def _read_chunk(path: Path, chunk: Chunk) -> Iterator[HomeConnectEvent]:
+    with path.open("rb") as fp:
+        fp.seek(chunk.offset)
+        for line in fp.read(chunk.length).splitlines():
+            if len(line.strip()) == 0:
+                continue
+            event = HomeConnectEvent.from_string(line.decode())
+            if event.timestamp is not None:
+                yield event
+
+
+def read_archive(
+    path: Path,
+    start: float | None = None,
+    end: float | None = None,
+    appliance_id: str | None = None,
+    event: str | None = None,
+) -> Iterator[HomeConnectEvent]:
+    """
+    Read the events from the jsonl files in a directory, in order of timestamp and event name.
+
+    Only the events within [start, end), of the given appliance and of the given event type are yielded. Files
+    and parts of files that hold no such events are skipped using their name and their sidecar index, which is
+    created on first use. Events are yielded lazily, and only the parts of files that overlap in time are held in
+    memory at once.
+    """
+    chunks = sorted(
+        (
+            (chunk.first_timestamp, f, chunk)
+            for f in _archive_files(path, start, end)
+            for chunk in index_file(f)
+            if chunk.matches(start, end, appliance_id, event)
+        ),
+        key=lambda item: item[0],
+    )
+    heap: list[tuple[float, str, int, HomeConnectEvent]] = []
+    n_read = 0
+    for first_timestamp, f, chunk in chunks:
+        # No later chunk holds events before its first timestamp, so those can be yielded.
+        while heap and heap[0][0] < first_timestamp:
+            yield heappop(heap)[-1]
+        for e in _read_chunk(f, chunk):
+            if (
+                (start is None or e.timestamp >= start)
+                and (end is None or e.timestamp < end)
+                and (appliance_id is None or e.appliance_id == appliance_id)
+                and (event is None or e.event == event)
+            ):
+                heappush(heap, (e.timestamp, e.event, n_read, e))
+                n_read += 1
+    while heap:
+        yield heappop(heap)[-1]
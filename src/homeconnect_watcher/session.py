@@ -0,0 +1,195 @@
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from enum import Enum
+from json import dumps
+from typing import Any, NamedTuple
+
+from homeconnect_watcher.event import HomeConnectEvent
+
+ACTIVE_PROGRAM = "BSH.Common.Root.ActiveProgram"
+OPERATION_STATE = "BSH.Common.Status.OperationState"
+PROGRAM_FINISHED = "BSH.Common.Event.ProgramFinished"
+REMAINING_PROGRAM_TIME = "BSH.Common.Option.RemainingProgramTime"
+ACTIVE_OPERATION_STATES = (
+    "BSH.Common.EnumType.OperationState.Run",
+    "BSH.Common.EnumType.OperationState.Pause",
+    "BSH.Common.EnumType.OperationState.Aborting",
+    "BSH.Common.EnumType.OperationState.DelayedStart",
+)
+SESSION_TIMEOUT = 5400  # Seconds of silence after which an active event starts a new session.
+
+
+class RecordType(str, Enum):
+    START = "start"
+    END = "end"
+
+
+@dataclass
+class Session:
+    appliance_id: str
+    session_id: int | None  # As in v_sessions, where it is NULL until the first session start.
+    trigger_time: datetime
+    start_time: datetime
+    end_time: datetime
+    program: str | None
+    details: dict[str, Any] = field(default_factory=dict)
+
+
+class SessionRecord(NamedTuple):
+    type: RecordType
+    session: Session
+
+
+def _text(value: Any) -> str | None:
+    """The value as text, as returned by the ->> operator in PostgreSQL."""
+    if value is None or isinstance(value, str):
+        return value
+    return dumps(value)
+
+
+def _and(*values: bool | None) -> bool | None:
+    """Three-valued AND, like in SQL."""
+    if False in values:
+        return False
+    return None if None in values else True
+
+
+def _or(*values: bool | None) -> bool | None:
+    """Three-valued OR, like in SQL."""
+    if True in values:
+        return True
+    return None if None in values else False
+
+
+def active_label(event: str, items: dict[str, Any]) -> bool | None:
+    """Whether an event shows that the appliance is running a program; see sql/2_raw_events_active.sql."""
+    if event in ("CONNECTED", "DISCONNECTED", "GAP"):
+        return False
+    if _text(items.get(PROGRAM_FINISHED)) == "BSH.Common.EnumType.EventPresentState.Present":
+        return False
+    if _text(items.get(ACTIVE_PROGRAM)) is not None and (
+        REMAINING_PROGRAM_TIME not in items
+        # In SQL, '<>' with NULL is NULL, so a null remaining time is not active.
+        or (items[REMAINING_PROGRAM_TIME] is not None and _text(items[REMAINING_PROGRAM_TIME]) != "0")
+    ):
+        return True
+    operation_state = _text(items.get(OPERATION_STATE))
+    if operation_state is None:
+        return None
+    return operation_state in ACTIVE_OPERATION_STATES
+
+
+@dataclass
+class _ApplianceState:
+    """What the window functions of the session views look back at, for a single appliance."""
+
+    last_label: bool | None = None  # The last explicit active label, for forward filling.
+    is_active: bool | None = None  # Of the previous event; None if there was none.
+    timestamp: float | None = None
+    basic_session_id: int | None = None
+    program: str | None = None  # Forward filled within the basic session.
+    session_id: int | None = None
+    session: Session | None = None  # The session with session_id, once it has an active event with data.
+    run_timestamp: float | None = None
+
+
+class Sessionizer:
+    """
+    Group events into sessions, one event at a time.
+
+    This is an online equivalent of the v_sessions view: events are labelled active or inactive, labels are
+    forward filled, and a new session starts on an active event after an inactive one, on a change of active
+    program, or after SESSION_TIMEOUT seconds of silence. Each event costs a constant amount of work.
+
+    `feed` returns a START record when a session receives its first active event, and an END record once the
+    next session of the appliance starts. `flush` ends all open sessions. The output is identical to v_sessions
+    as long as the events of each appliance are fed in order of timestamp and event name, except that the details
+    of a session hold the latest value of each key, where the view holds an arbitrary one.
+    """
+
+    def __init__(self):
+        self._states: dict[str, _ApplianceState] = {}
+
+    def feed(self, event: HomeConnectEvent) -> list[SessionRecord]:
+        state = self._states.setdefault(event.appliance_id or "", _ApplianceState())
+        items = event.items
+        records = []
+
+        label = active_label(event.event, items)
+        if label is not None:
+            state.last_label = label
+        is_active = label if label is not None else bool(state.last_label)
+        has_previous = state.timestamp is not None
+
+        # The basic session id only serves to forward fill the active program, within a basic session.
+        basic_start = _and(is_active, state.is_active is False if has_previous else None)
+        basic_session_id = state.basic_session_id
+        if basic_start is not None:
+            basic_session_id = (basic_session_id or 0) + basic_start
+        own_program = _text(items.get(ACTIVE_PROGRAM))
+        previous_program = state.program
+        if own_program is not None:
+            state.program = own_program
+        elif basic_session_id != state.basic_session_id:
+            state.program = None
+        state.basic_session_id = basic_session_id
+
+        start = None  # Like the first row in the views, of which all lags are NULL.
+        if has_previous:
+            assert state.timestamp is not None
+            start = _or(
+                _and(is_active, state.is_active is False, state.timestamp < event.timestamp),
+                None if state.program is None or previous_program is None else state.program != previous_program,
+                _and(is_active, event.timestamp - state.timestamp > SESSION_TIMEOUT),
+            )
+        if start is not None:
+            session_id = (state.session_id or 0) + start
+            if session_id != state.session_id:
+                if state.session is not None:
+                    records.append(SessionRecord(RecordType.END, state.session))
+                state.session, state.run_timestamp = None, None
+            state.session_id = session_id
+
+        if is_active and items:
+            records.extend(self._add(state, event, items))
+        state.is_active, state.timestamp = is_active, event.timestamp
+        return records
+
+    def flush(self) -> list[SessionRecord]:
+        """End all open sessions."""
+        records = []
+        for state in self._states.values():
+            if state.session is not None:
+                records.append(SessionRecord(RecordType.END, state.session))
+            state.session, state.run_timestamp = None, None
+        return records
+
+    @staticmethod
+    def _add(state: _ApplianceState, event: HomeConnectEvent, items: dict[str, Any]) -> list[SessionRecord]:
+        """Add an active event to the current session; see sql/4_sessions.sql."""
+        records = []
+        program = _text(items.get(ACTIVE_PROGRAM))
+        if program is not None:
+            program = program.rsplit(".", 1)[-1]
+        if _text(items.get(OPERATION_STATE)) == "BSH.Common.EnumType.OperationState.Run":
+            if state.run_timestamp is None:
+                state.run_timestamp = event.timestamp
+        if state.session is None:
+            state.session = Session(
+                appliance_id=event.appliance_id or "",
+                session_id=state.session_id,
+                trigger_time=event.datetime,
+                start_time=event.datetime,
+                end_time=event.datetime,
+                program=program,
+            )
+            state.session.details.update(items)
+            records.append(SessionRecord(RecordType.START, replace(state.session, details=dict(items))))
+        else:
+            state.session.end_time = event.datetime
+            if program is not None and (state.session.program is None or program < state.session.program):
+                state.session.program = program
+            state.session.details.update(items)
+        if state.run_timestamp is not None:
+            state.session.start_time = datetime.fromtimestamp(state.run_timestamp).astimezone()
+        return records
@@ -21,7 +21,7 @@ unique_events AS (
     FROM expanded_events
 ),
 
--- Create fake events with present=false of every known type at a disconnect.
+-- Create fake events with present=false of every known type at a disconnect, or a gap in the event stream.
 disconnects AS (
     SELECT
         "timestamp",
@@ -30,7 +30,7 @@ disconnects AS (
         false AS present
     FROM events
         LEFT JOIN unique_events ON events.appliance_id = unique_events.appliance_id
-    WHERE events.event = 'DISCONNECTED'
+    WHERE events.event IN ('DISCONNECTED', 'GAP')
 ),
 
 expanded_events_with_start AS (
@@ -9,8 +9,8 @@ WITH events_with_active_label AS (
     SELECT
         *,
         CASE
-            -- Assume an appliance is inactive when just connected.
-            WHEN event in ('CONNECTED', 'DISCONNECTED') THEN false
+            -- Assume an appliance is inactive when just connected, and after a gap in the event stream.
+            WHEN event in ('CONNECTED', 'DISCONNECTED', 'GAP') THEN false
             WHEN data->>'BSH.Common.Event.ProgramFinished' = 'BSH.Common.EnumType.EventPresentState.Present' THEN false
             WHEN (
                 data->>'BSH.Common.Root.ActiveProgram' IS NOT NULL
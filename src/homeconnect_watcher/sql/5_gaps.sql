@@ -0,0 +1,14 @@
+CREATE OR REPLACE VIEW v_gaps AS
+
+-- The windows in which the event stream of the watcher was down, so that events may have been missed.
+-- The watcher records these as GAP events, at the end of the gap.
+
+SELECT
+    appliance_id,
+    to_timestamp((data->>'start')::double precision) AS start_time,
+    timestamp AS end_time,
+    extract(EPOCH FROM timestamp) - (data->>'start')::double precision AS duration,
+    data->>'reason' AS reason
+FROM events
+WHERE event = 'GAP'
+ORDER BY appliance_id, timestamp
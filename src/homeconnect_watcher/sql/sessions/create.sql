@@ -0,0 +1,21 @@
+-- Sessions, maintained incrementally by update.sql.
+CREATE TABLE IF NOT EXISTS sessions (
+    appliance_id char(31) NOT NULL,
+    session_id bigint NOT NULL,
+    trigger_time timestamp with time zone NOT NULL,
+    start_time timestamp with time zone NOT NULL,
+    end_time timestamp with time zone NOT NULL,
+    program text,
+    session_details jsonb NOT NULL,
+    PRIMARY KEY (appliance_id, session_id)
+);
+
+-- Per appliance, the last event up to which all sessions are final, the number of sessions before it,
+-- and its (forward filled) active program, which is carried into the next update.
+CREATE TABLE IF NOT EXISTS session_watermarks (
+    appliance_id char(31) PRIMARY KEY,
+    timestamp timestamp with time zone NOT NULL,
+    event varchar(31) NOT NULL,
+    session_id bigint NOT NULL,
+    active_program text
+);
@@ -0,0 +1,220 @@
+-- Incrementally update the sessions table.
+--
+-- The session logic of v_raw_events_active, v_raw_events_session_id and v_sessions is applied to only the events
+-- from each appliance's watermark onwards. The watermark is the last inactive event that is followed by an event
+-- with a later timestamp, and after which the next active event starts a new session: no session can span it,
+-- so the sessions before it are final. Events are assumed to arrive in timestamp order; the sessions of an
+-- appliance of which older events are added are reset beforehand (see WatcherDBClient.update_sessions).
+-- The active program of the watermark is carried over, so that program changes right after it are detected as
+-- they are in the views.
+-- Sessions are numbered consecutively per appliance, starting at 1.
+
+-- Serialize concurrent updates, e.g. from multiple exporters.
+LOCK TABLE session_watermarks IN EXCLUSIVE MODE;
+
+CREATE TEMPORARY TABLE session_events ON COMMIT DROP AS
+WITH new_events AS (
+    SELECT events.*, session_watermarks.active_program AS watermark_program
+    FROM events
+        LEFT JOIN session_watermarks ON session_watermarks.appliance_id = events.appliance_id
+    WHERE events.appliance_id IS NOT NULL
+        AND (
+            session_watermarks.appliance_id IS NULL
+            OR (events.timestamp, events.event) >= (session_watermarks.timestamp, session_watermarks.event)
+        )
+),
+
+events_with_active_label AS (
+    SELECT
+        *,
+        CASE
+            WHEN event in ('CONNECTED', 'DISCONNECTED', 'GAP') THEN false
+            WHEN data->>'BSH.Common.Event.ProgramFinished' = 'BSH.Common.EnumType.EventPresentState.Present' THEN false
+            WHEN (
+                data->>'BSH.Common.Root.ActiveProgram' IS NOT NULL
+                AND (
+                    data->>'BSH.Common.Option.RemainingProgramTime' <> '0'
+                    OR NOT data ? 'BSH.Common.Option.RemainingProgramTime'
+                )
+            ) THEN true
+            WHEN data->>'BSH.Common.Status.OperationState' IS NULL THEN NULL
+            WHEN data->>'BSH.Common.Status.OperationState' IN (
+              'BSH.Common.EnumType.OperationState.Run',
+              'BSH.Common.EnumType.OperationState.Pause',
+              'BSH.Common.EnumType.OperationState.Aborting',
+              'BSH.Common.EnumType.OperationState.DelayedStart'
+            ) THEN true
+            ELSE false
+        END AS is_active
+    FROM new_events
+),
+
+events_active AS (
+    SELECT
+        appliance_id,
+        event,
+        timestamp,
+        data,
+        watermark_program,
+        COALESCE(is_active, FIRST_VALUE(is_active) OVER (PARTITION BY appliance_id, grp ORDER BY timestamp, event), FALSE) AS is_active
+    FROM (
+        SELECT
+            *,
+            COUNT(is_active) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) as grp
+        FROM events_with_active_label
+    ) AS subquery
+),
+
+with_session_start AS (
+    SELECT
+        *,
+        (is_active AND (lag(is_active) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) = false)) AS session_start
+    FROM events_active
+),
+
+basic_session_id AS (
+    SELECT
+        appliance_id,
+        event,
+        timestamp,
+        data,
+        watermark_program,
+        is_active,
+        sum(session_start::int) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) as session_id
+    FROM with_session_start
+),
+
+session_id_with_program AS (
+  SELECT
+    *,
+    COALESCE(
+        data->>'BSH.Common.Root.ActiveProgram',
+        FIRST_VALUE(data->>'BSH.Common.Root.ActiveProgram') OVER (PARTITION BY appliance_id, session_id, grp ORDER BY timestamp, event),
+        CASE WHEN session_id = 0 AND grp = 0 THEN watermark_program END
+    ) AS active_program
+  FROM (
+     SELECT
+       *,
+       COUNT(data->>'BSH.Common.Root.ActiveProgram') OVER (PARTITION BY appliance_id, session_id ORDER BY timestamp, event) as grp
+     FROM basic_session_id
+  ) AS subquery
+),
+
+with_improved_session_start AS (
+    SELECT
+        *,
+        (
+            (
+                is_active
+                AND (lag(is_active) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) = false)
+                AND (lag(timestamp) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) < timestamp)
+            )
+            OR
+            (active_program != (lag(active_program) OVER (PARTITION BY appliance_id ORDER BY timestamp, event)))
+            OR
+            (
+                is_active AND extract(EPOCH FROM
+                    (timestamp - lag(timestamp) OVER (PARTITION BY appliance_id ORDER BY timestamp, event))
+                ) > 5400
+            )
+        ) AS session_start
+    FROM session_id_with_program
+)
+
+SELECT
+    *,
+    lead(timestamp) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) AS next_timestamp,
+    -- Before the first session start the views have a NULL session_id, which is ordered before all others.
+    min(CASE WHEN is_active THEN COALESCE(session_id, -1) END) OVER following AS next_active_session_id,
+    min(CASE WHEN is_active THEN timestamp END) OVER following AS next_active_timestamp,
+    max(timestamp) OVER (PARTITION BY appliance_id) AS last_timestamp
+FROM (
+    SELECT
+        appliance_id,
+        event,
+        timestamp,
+        data,
+        is_active,
+        active_program,
+        sum(session_start::int) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) as session_id
+    FROM with_improved_session_start
+) AS subquery
+WINDOW following AS (
+    PARTITION BY appliance_id ORDER BY timestamp, event ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING
+);
+
+-- Sessions after the watermark are recomputed entirely.
+DELETE FROM sessions
+WHERE appliance_id IN (SELECT DISTINCT appliance_id FROM session_events)
+    AND session_id > COALESCE(
+        (SELECT session_id FROM session_watermarks WHERE session_watermarks.appliance_id = sessions.appliance_id), 0
+    );
+
+INSERT INTO sessions (appliance_id, session_id, trigger_time, start_time, end_time, program, session_details)
+SELECT
+    new_sessions.appliance_id,
+    COALESCE(session_watermarks.session_id, 0)
+        + row_number() OVER (PARTITION BY new_sessions.appliance_id ORDER BY new_sessions.session_id NULLS FIRST),
+    trigger_time,
+    start_time,
+    end_time,
+    program,
+    session_details
+FROM (
+    SELECT
+      appliance_id,
+      session_id,
+      min(timestamp) AS trigger_time,
+      coalesce(min(run_timestamp), min(timestamp)) AS start_time,
+      max(timestamp) AS end_time,
+      min(program) AS program,
+      jsonb_object_agg(xkey, xvalue) AS session_details
+    FROM (
+      SELECT
+        appliance_id,
+        session_id,
+        timestamp,
+        CASE
+          WHEN
+            data->>'BSH.Common.Status.OperationState' = 'BSH.Common.EnumType.OperationState.Run'
+          THEN timestamp
+        END AS run_timestamp,
+        reverse(split_part(reverse(data->>'BSH.Common.Root.ActiveProgram'), '.', 1)) AS program,
+        jsonb_each.key AS xkey,
+        jsonb_each.value AS xvalue
+      FROM session_events, jsonb_each(data)
+      WHERE is_active
+      ORDER BY timestamp ASC
+    ) AS subquery
+    GROUP BY appliance_id, session_id
+) AS new_sessions
+    LEFT JOIN session_watermarks ON session_watermarks.appliance_id = new_sessions.appliance_id;
+
+-- Advance the watermarks.
+INSERT INTO session_watermarks (appliance_id, timestamp, event, session_id, active_program)
+SELECT
+    appliance_id,
+    timestamp,
+    event,
+    (
+        SELECT COALESCE(max(session_id), 0)
+        FROM sessions
+        WHERE sessions.appliance_id = watermarks.appliance_id AND sessions.trigger_time <= watermarks.timestamp
+    ),
+    active_program
+FROM (
+    SELECT DISTINCT ON (appliance_id) appliance_id, timestamp, event, active_program
+    FROM session_events
+    WHERE NOT is_active
+        AND next_timestamp > timestamp
+        AND next_active_session_id > COALESCE(session_id, -1)
+        -- Events arrive in timestamp order, but not necessarily in event order within the same timestamp:
+        -- the start of the next session must be older than the latest event, so that it is final.
+        AND next_active_timestamp < last_timestamp
+    ORDER BY appliance_id, timestamp DESC, event DESC
+) AS watermarks
+ON CONFLICT (appliance_id) DO UPDATE SET
+    timestamp = EXCLUDED.timestamp,
+    event = EXCLUDED.event,
+    session_id = EXCLUDED.session_id,
+    active_program = EXCLUDED.active_program;
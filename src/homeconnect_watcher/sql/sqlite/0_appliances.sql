@@ -0,0 +1,17 @@
+CREATE VIEW IF NOT EXISTS v_appliances AS
+
+-- See sql/0_appliances.sql. The appliance type is the second part of the program:
+-- <Appliance Group>.<Appliance Type>.Program.[<Program Group>.]<Program Name>
+
+SELECT DISTINCT
+    appliance_id,
+    substr(program, 1, instr(program, '.') - 1) AS appliance_type
+FROM (
+    SELECT
+        appliance_id,
+        substr(data->>'$."BSH.Common.Root.SelectedProgram"', instr(data->>'$."BSH.Common.Root.SelectedProgram"', '.') + 1) AS program
+    FROM events
+    WHERE event = 'NOTIFY'
+        AND data->>'$."BSH.Common.Root.SelectedProgram"' IS NOT NULL
+) AS subquery
+ORDER BY appliance_id ASC
@@ -0,0 +1,63 @@
+CREATE VIEW IF NOT EXISTS v_events AS
+
+-- Deduplicate EVENTs and find their respective end dates; see sql/1_events.sql.
+
+WITH expanded_events AS (
+    SELECT
+        "timestamp",
+        appliance_id,
+        json_each.key AS event,
+        json_each.value = 'BSH.Common.EnumType.EventPresentState.Present' AS present
+    FROM events, json_each(events.data)
+    WHERE event = 'EVENT'
+        AND json_each.key LIKE '%.Event.%'
+),
+
+unique_events AS (
+    SELECT DISTINCT
+        appliance_id,
+        event
+    FROM expanded_events
+),
+
+-- Create fake events with present=false of every known type at a disconnect, or a gap in the event stream.
+disconnects AS (
+    SELECT
+        "timestamp",
+        events.appliance_id,
+        unique_events.event,
+        false AS present
+    FROM events
+        LEFT JOIN unique_events ON events.appliance_id = unique_events.appliance_id
+    WHERE events.event IN ('DISCONNECTED', 'GAP')
+),
+
+expanded_events_with_start AS (
+    SELECT
+        "timestamp",
+        appliance_id,
+        event,
+        present,
+        present AND lag(present, 1, false) OVER (PARTITION BY appliance_id, event ORDER BY "timestamp") = false AS event_start
+    FROM (SELECT * FROM expanded_events UNION ALL SELECT * FROM disconnects) AS total
+),
+
+expanded_events_with_id AS (
+    SELECT
+        "timestamp",
+        appliance_id,
+        event,
+        present,
+        sum(CAST(event_start AS integer)) OVER (PARTITION BY appliance_id, event ORDER BY "timestamp") AS event_id
+    FROM expanded_events_with_start
+)
+
+SELECT
+    appliance_id,
+    -- The last part of the key, e.g. ProgramFinished.
+    replace(event, rtrim(event, replace(event, '.', '')), '') AS event,
+    min("timestamp") AS start_time,
+    min("timestamp") FILTER (WHERE present = false) AS end_time
+FROM expanded_events_with_id
+GROUP BY appliance_id, event, event_id
+ORDER BY min("timestamp")
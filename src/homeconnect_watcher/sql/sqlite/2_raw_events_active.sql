@@ -0,0 +1,46 @@
+CREATE VIEW IF NOT EXISTS v_raw_events_active AS
+
+-- Add an is_active label to each raw event; see sql/2_raw_events_active.sql.
+-- Values are cast to text, to compare them like the ->> operator of PostgreSQL does.
+
+WITH events_with_active_label AS (
+    SELECT
+        *,
+        CASE
+            -- Assume an appliance is inactive when just connected, and after a gap in the event stream.
+            WHEN event in ('CONNECTED', 'DISCONNECTED', 'GAP') THEN false
+            WHEN data->>'$."BSH.Common.Event.ProgramFinished"' = 'BSH.Common.EnumType.EventPresentState.Present' THEN false
+            WHEN (
+                data->>'$."BSH.Common.Root.ActiveProgram"' IS NOT NULL
+                AND (
+                    CAST(data->>'$."BSH.Common.Option.RemainingProgramTime"' AS text) <> '0'
+                    OR json_type(data, '$."BSH.Common.Option.RemainingProgramTime"') IS NULL
+                )
+            ) THEN true
+            -- If the OperationState is unknown, then we do not know
+            WHEN data->>'$."BSH.Common.Status.OperationState"' IS NULL THEN NULL
+            WHEN data->>'$."BSH.Common.Status.OperationState"' IN (
+              'BSH.Common.EnumType.OperationState.Run',
+              'BSH.Common.EnumType.OperationState.Pause',
+              'BSH.Common.EnumType.OperationState.Aborting',
+              'BSH.Common.EnumType.OperationState.DelayedStart'
+            ) THEN true
+            ELSE false
+        END AS is_active
+    FROM events
+    WHERE appliance_id IS NOT NULL
+)
+
+-- Forward fill is_active
+SELECT
+    appliance_id,
+    event,
+    timestamp,
+    data,
+    COALESCE(is_active, FIRST_VALUE(is_active) OVER (PARTITION BY appliance_id, grp ORDER BY timestamp, event), false) AS is_active
+FROM (
+    SELECT
+        *,
+        COUNT(is_active) OVER (PARTITION BY appliance_id ORDER BY timestamp, event) as grp
+    FROM events_with_active_label
+) AS subquery
@@ -0,0 +1,37 @@
+CREATE VIEW IF NOT EXISTS v_sessions AS
+
+-- See sql/4_sessions.sql; SQLite has no materialized views, so this view is computed when it is queried.
+-- Use the sessions table, which is updated incrementally, for frequent queries.
+
+SELECT
+  appliance_id,
+  session_id,
+  min(timestamp) AS trigger_time,
+  coalesce(min(run_timestamp), min(timestamp)) AS start_time,
+  max(timestamp) AS end_time,
+  min(program) AS program,
+  json_group_object(xkey, xvalue) FILTER (WHERE key_rank = 1) AS session_details
+FROM (
+  SELECT
+    appliance_id,
+    session_id,
+    timestamp,
+    CASE
+      WHEN
+        data->>'$."BSH.Common.Status.OperationState"' = 'BSH.Common.EnumType.OperationState.Run'
+      THEN timestamp
+    END AS run_timestamp,
+    replace(
+        data->>'$."BSH.Common.Root.ActiveProgram"',
+        rtrim(data->>'$."BSH.Common.Root.ActiveProgram"', replace(data->>'$."BSH.Common.Root.ActiveProgram"', '.', '')),
+        ''
+    ) AS program,
+    json_each.key AS xkey,
+    json_each.value AS xvalue,
+    -- Unlike jsonb_object_agg, json_group_object keeps duplicate keys, so only the latest value of each key is kept.
+    row_number() OVER (PARTITION BY appliance_id, session_id, json_each.key ORDER BY timestamp DESC, event DESC) AS key_rank
+  FROM v_raw_events_session_id, json_each(data)
+  WHERE is_active
+  ORDER BY timestamp ASC
+) AS subquery
+GROUP BY appliance_id, session_id
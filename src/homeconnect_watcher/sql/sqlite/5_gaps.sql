@@ -0,0 +1,13 @@
+CREATE VIEW IF NOT EXISTS v_gaps AS
+
+-- See sql/5_gaps.sql. Timestamps are in seconds since the epoch.
+
+SELECT
+    appliance_id,
+    data->>'$.start' AS start_time,
+    timestamp AS end_time,
+    timestamp - (data->>'$.start') AS duration,
+    data->>'$.reason' AS reason
+FROM events
+WHERE event = 'GAP'
+ORDER BY appliance_id, timestamp
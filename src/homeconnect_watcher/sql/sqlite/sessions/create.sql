@@ -0,0 +1,20 @@
+-- Sessions, maintained incrementally by update.sql; see sql/sessions/create.sql.
+-- Timestamps are in seconds since the epoch.
+CREATE TABLE IF NOT EXISTS sessions (
+    appliance_id text NOT NULL,
+    session_id integer NOT NULL,
+    trigger_time real NOT NULL,
+    start_time real NOT NULL,
+    end_time real NOT NULL,
+    program text,
+    session_details text NOT NULL,
+    PRIMARY KEY (appliance_id, session_id)
+);
+
+CREATE TABLE IF NOT EXISTS session_watermarks (
+    appliance_id text PRIMARY KEY,
+    timestamp real NOT NULL,
+    event text NOT NULL,
+    session_id integer NOT NULL,
+    active_program text
+);
@@ -9,3 +9,36 @@ class Trigger:
     active_program: bool = False
     selected_program: bool = False
     interval: bool = False
+
+
+# The requests a trigger can ask for; these are the names of the flags of Trigger.
+REQUEST_TYPES = ("status", "settings", "active_program", "selected_program")
+
+
+class TriggerTable:
+    """
+    The pending triggers per appliance, merged until they are handled.
+
+    For each appliance, the table holds the requests to make, and for each request whether it is only needed once
+    the previous one is older than the interval. If any of the merged triggers asked for a request without
+    interval=True, the request is made regardless of the previous one.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, dict[str, bool]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, trigger: Trigger) -> bool:
+        """Merge a trigger into the table, and return whether its appliance had no pending triggers yet."""
+        new = trigger.appliance_id not in self._pending
+        requests = self._pending.setdefault(trigger.appliance_id, {})
+        for request_type in REQUEST_TYPES:
+            if getattr(trigger, request_type):
+                requests[request_type] = requests.get(request_type, True) and trigger.interval
+        return new
+
+    def pop(self, appliance_id: str) -> dict[str, bool]:
+        """Remove the pending requests of an appliance, and return whether each of them is an interval request."""
+        return self._pending.pop(appliance_id, {})
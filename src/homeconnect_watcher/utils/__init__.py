@@ -1,6 +1,8 @@
+from .backoff import Backoff
 from .logging import LogLevel, initialize_logging
 from .metrics import Metrics
+from .rate_limit import RateLimiter
 from .retry import retry
 from .timeout import timeout
 
-__all__ = ["LogLevel", "Metrics", "initialize_logging", "retry", "timeout"]
+__all__ = ["Backoff", "LogLevel", "Metrics", "RateLimiter", "initialize_logging", "retry", "timeout"]
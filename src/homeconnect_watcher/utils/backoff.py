@@ -0,0 +1,33 @@
+from random import Random
+
+
+class Backoff:
+    """
+    Exponential back-off with full jitter, for reconnecting.
+
+    The first retry is immediate. Retry n > 1 waits a random number of seconds between zero and
+    `initial * factor ** (n - 2)`, capped at `maximum`, so that many clients that lost their connection at once
+    do not reconnect at the same time. `reset` starts over, once a connection has proven to be healthy.
+    """
+
+    def __init__(self, initial: float = 1.0, factor: float = 2.0, maximum: float = 120.0, seed: int | None = None):
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.attempts = 0
+        self._random = Random(seed)
+
+    def next_delay(self) -> float:
+        """The number of seconds to wait before the next attempt."""
+        self.attempts += 1
+        if self.attempts == 1:
+            return 0.0
+        return self._random.uniform(0, self.cap(self.attempts))
+
+    def cap(self, attempt: int) -> float:
+        """The maximum delay before the given attempt."""
+        # Limit the exponent, as the delay is capped long before it would overflow.
+        return min(self.maximum, self.initial * self.factor ** min(attempt - 2, 64))
+
+    def reset(self) -> None:
+        self.attempts = 0
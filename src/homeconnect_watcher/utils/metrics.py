@@ -1,3 +1,4 @@
+from copy import copy
 from logging import getLogger
 from time import monotonic
 from typing import Callable
@@ -13,6 +14,7 @@ class Metrics:
         "DEPAIRED",
         "DISCONNECTED",
         "EVENT",
+        "GAP",
         "NOTIFY",
         "PAIRED",
         "SELECTED-PROGRAM-REQUEST",
@@ -23,8 +25,15 @@ class Metrics:
 
     def __init__(self, port: int):
         self.logger = getLogger(self.__class__.__name__)
+        self.account = ""  # Label of the metrics of a client; see for_account.
         try:
-            from prometheus_client import Counter, Gauge, Info, start_http_server  # ty: ignore[unresolved-import]
+            from prometheus_client import (  # ty: ignore[unresolved-import]
+                Counter,
+                Gauge,
+                Histogram,
+                Info,
+                start_http_server,
+            )
         except ImportError:
             self.logger.error("Unable to expose prometheus metrics; prometheus_client is not installed.")
             self.logger.error(
@@ -32,33 +41,77 @@ class Metrics:
             )
             return
         self._start_time = monotonic()
-        self._disconnects = Counter("disconnects", "The number of time the connection failed.", ["reason"])
-        self._disconnects.labels(reason="timeout")
-        self._disconnects.labels(reason="closed")
+        self._cache = Counter("response_cache", "Requests by their use of the response cache.", ["account", "result"])
+        self._disconnects = Counter("disconnects", "The number of time the connection failed.", ["account", "reason"])
+        self._dropped_events = Counter("dropped_events", "Number of events dropped by a full queue.", ["exporter"])
+        self._duplicates = Counter("duplicate_events", "Number of events skipped as duplicates.", ["account"])
         self._events = Counter("events", "Number of events.", ["appliance_id", "event"])
         self._events.labels(appliance_id=None, event="KEEP-ALIVE")
+        self._gap = Histogram(
+            "event_stream_gap",
+            "Seconds between the last data of an event stream and its reconnect.",
+            ["account"],
+            buckets=(1, 5, 15, 60, 120, 300, 900, 3600),
+        )
         self._info = Info("version", "Version info.")
         self._info.info({"version": __version__})
-        self._last_event = Gauge("last_event", "Time since last event.")
+        self._last_event = Gauge("last_event", "Time since last event.", ["account"])
         self._metric_uptime = Gauge("uptime", "Watcher uptime.")
         self._metric_uptime.set_function(lambda: monotonic() - self._start_time)
-        self._n_appliances = Gauge("n_appliances", "The number of known appliances.")
-        self._token_refresh = Counter("token_refresh", "The number of times the token was refreshed.")
+        self._n_appliances = Gauge("n_appliances", "The number of known appliances.", ["account"])
+        self._queue_depth = Gauge("queue_depth", "Number of events waiting to be exported.", ["exporter"])
+        self._token_refresh = Counter("token_refresh", "The number of times the token was refreshed.", ["account"])
+        self._init_account_labels()
         self.logger.info(f"Exposing prometheus metrics on port {port}.")
         start_http_server(port)
 
+    def for_account(self, account: str) -> "Metrics":
+        """
+        Get the metrics for a client of one of several accounts.
+
+        The result shares the metrics of this object, but labels the metrics of the client with the account.
+        """
+        result = copy(self)
+        result.account = account
+        if hasattr(self, "_start_time"):  # I.e. if prometheus_client is installed.
+            result._init_account_labels()
+        return result
+
+    def _init_account_labels(self) -> None:
+        for result in ("hit", "miss", "not_modified"):
+            self._cache.labels(account=self.account, result=result)
+        self._disconnects.labels(account=self.account, reason="timeout")
+        self._disconnects.labels(account=self.account, reason="closed")
+        self._duplicates.labels(account=self.account)
+        self._token_refresh.labels(account=self.account)
+
     def init_labels(self, appliance_id: str) -> None:
         for event_type in self._event_types:
             self._events.labels(appliance_id=appliance_id, event=event_type)
 
+    def increment_cache(self, result: str) -> None:
+        self._cache.labels(account=self.account, result=result).inc()
+
     def increment_disconnects(self, reason: str) -> None:
-        self._disconnects.labels(reason=reason).inc()
+        self._disconnects.labels(account=self.account, reason=reason).inc()
+
+    def increment_dropped_events(self, exporter: str) -> None:
+        self._dropped_events.labels(exporter=exporter).inc()
+
+    def increment_duplicates(self) -> None:
+        self._duplicates.labels(account=self.account).inc()
 
     def increment_event_counter(self, event: HomeConnectEvent) -> None:
         self._events.labels(appliance_id=event.appliance_id, event=event.event).inc()
 
+    def increment_keep_alives(self, n: int) -> None:
+        self._events.labels(appliance_id=None, event="KEEP-ALIVE").inc(n)
+
     def increment_token_refresh(self) -> None:
-        self._token_refresh.inc()
+        self._token_refresh.labels(account=self.account).inc()
+
+    def observe_gap(self, seconds: float) -> None:
+        self._gap.labels(account=self.account).observe(seconds)
 
     def set_last_event(self, function: Callable[[], float]) -> None:
         """
@@ -67,7 +120,7 @@ class Metrics:
         This should be a function that returns the time since the last event in seconds, e.g.
             lambda: monotonic() - last_event
         """
-        self._last_event.set_function(function)
+        self._last_event.labels(account=self.account).set_function(function)
 
     def set_n_appliances(self, function: Callable[[], int]) -> None:
         """
@@ -76,4 +129,13 @@ class Metrics:
         This should be a function that returns the number of appliances., e.g.
             lambda: len(appliances)
         """
-        self._n_appliances.set_function(function)
+        self._n_appliances.labels(account=self.account).set_function(function)
+
+    def set_queue_depth(self, exporter: str, function: Callable[[], int]) -> None:
+        """
+        Set the function for the queue_depth metric of an exporter.
+
+        This should be a function that returns the number of queued events, e.g.
+            queue.qsize
+        """
+        self._queue_depth.labels(exporter=exporter).set_function(function)
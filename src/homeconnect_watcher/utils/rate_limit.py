@@ -0,0 +1,52 @@
+from asyncio import Lock, sleep
+from time import monotonic
+
+# The request limits of the Home Connect API: 50 requests per minute and 1000 requests per day.
+HOME_CONNECT_LIMITS = ((50, 60.0), (1000, 86400.0))
+
+
+class TokenBucket:
+    """A bucket of `capacity` tokens that refills at `capacity` tokens per `period` seconds."""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self._updated = monotonic()
+
+    def delay(self, now: float) -> float:
+        """The number of seconds until a token is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """
+    Limit the rate of requests to several token buckets at once.
+
+    Requests wait for their turn in `acquire`, in order of arrival, but once acquired they run concurrently.
+    After a response with status 429, `back_off` pauses all requests for the given number of seconds.
+    """
+
+    def __init__(self, limits: tuple[tuple[int, float], ...] = HOME_CONNECT_LIMITS):
+        self.buckets = [TokenBucket(capacity, period) for capacity, period in limits]
+        self._blocked_until = 0.0
+        self._lock = Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = monotonic()
+                delay = max([bucket.delay(now) for bucket in self.buckets] + [self._blocked_until - now])
+                if delay <= 0:
+                    break
+                await sleep(delay)
+            for bucket in self.buckets:
+                bucket.take()
+
+    def back_off(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, monotonic() + seconds)
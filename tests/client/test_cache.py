@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from homeconnect_watcher.client.cache import ResponseCache
+
+PROGRAMS = {"data": {"programs": [{"key": "LaundryCare.Washer.Program.Cotton"}]}}
+STATUS = {"data": {"status": []}}
+
+
+def test_ttl():
+    cache = ResponseCache()
+    assert cache.ttl("") > 0
+    assert cache.ttl("/SIEMENS-WM14T6H9NL-AB1234567890/programs/available") > cache.ttl("")
+    assert cache.ttl("/SIEMENS-WM14T6H9NL-AB1234567890/status") == 0
+
+
+def test_put(tmp_path: Path):
+    cache = ResponseCache()
+    cache.put("/a/programs/available", PROGRAMS, {})
+    entry = cache.get("/a/programs/available")
+    assert entry is not None and entry.data == PROGRAMS
+    assert cache.is_fresh("/a/programs/available", entry)
+    # Responses that can neither be used without a request nor validated are not stored.
+    cache.put("/a/status", STATUS, {})
+    assert cache.get("/a/status") is None
+    cache.put("/a/status", STATUS, {"ETag": '"1"'})
+    entry = cache.get("/a/status")
+    assert entry is not None and not cache.is_fresh("/a/status", entry)
+    assert entry.headers == {"If-None-Match": '"1"'}
+
+
+def test_persistence(tmp_path: Path):
+    path = tmp_path / "token.cache.json"
+    cache = ResponseCache(path)
+    cache.put("/a/programs/available", PROGRAMS, {})
+    cache.put("", {"data": {"homeappliances": []}}, {})
+    cache.invalidate("")
+    cache.flush()
+    cache = ResponseCache(path)
+    entry = cache.get("/a/programs/available")
+    assert entry is not None and entry.data == PROGRAMS
+    assert cache.get("") is None
+
+
+def test_invalid_file(tmp_path: Path):
+    path = tmp_path / "token.cache.json"
+    path.write_text("{")
+    assert ResponseCache(path).get("") is None
+
+
+def test_save_interval(tmp_path: Path):
+    path = tmp_path / "token.cache.json"
+    cache = ResponseCache(path, save_interval=3600)
+    cache.put("/a/programs/available", PROGRAMS, {})  # The first change is written at once.
+    written = path.read_text()
+    cache.put("/a/status", STATUS, {"ETag": '"1"'})
+    cache.touch("/a/programs/available")
+    assert path.read_text() == written
+    cache.flush()
+    assert ResponseCache(path).get("/a/status") is not None
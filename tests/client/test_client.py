@@ -1,7 +1,18 @@
+from asyncio import Event, sleep
+from pathlib import Path
+from time import monotonic, time
+from typing import AsyncIterable
+from unittest.mock import AsyncMock
+
 from authlib.oauth2.rfc6749 import OAuth2Token
-from pytest import mark
+from httpx import Response
+from pytest import fixture, mark, raises
 
 from homeconnect_watcher.client import HomeConnectAppliance, HomeConnectClient
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.exceptions import HomeConnectConnectionClosed
+
+RUN = "BSH.Common.EnumType.OperationState.Run"
 
 
 class TestClientToken:
@@ -36,3 +47,245 @@ class TestAppliances:
         assert len(await client.appliances) == 0
         await client.refresh_appliances()
         assert len(await client.appliances) >= 0
+
+
+@fixture
+def offline_client(monkeypatch, tmp_path: Path, mocker) -> HomeConnectClient:
+    """A client of which requests take 0.1 second, and of which the event stream yields `stream_events`."""
+    monkeypatch.setenv("HOMECONNECT_CLIENT_ID", "client_id")
+    monkeypatch.setenv("HOMECONNECT_CLIENT_SECRET", "client_secret")
+    monkeypatch.setenv("HOMECONNECT_REDIRECT_URI", "http://localhost:8000/code/")
+    client = HomeConnectClient(token_cache=tmp_path / "token")
+    client.trigger_delay = 0.05
+    client.n_requests, client.max_concurrent, client.concurrent = 0, 0, 0
+    client.stream_delay = 0.0
+    client.appliance_ids = [f"appliance-{i}" for i in range(3)]
+    client.stream_events = [HomeConnectEvent(event="DISCONNECTED", timestamp=time(), appliance_id="appliance-0")]
+
+    async def get(path: str) -> dict:
+        client.n_requests += 1
+        client.concurrent += 1
+        client.max_concurrent = max(client.max_concurrent, client.concurrent)
+        await sleep(0.1)
+        client.concurrent -= 1
+        if path == "":
+            return {"data": {"homeappliances": [{"haId": haid, "type": "Washer"} for haid in client.appliance_ids]}}
+        if path.endswith("/programs/available"):
+            return {"data": {"programs": [{"key": "LaundryCare.Washer.Program.Cotton"}]}}
+        return {"data": {"key": "LaundryCare.Washer.Program.Cotton", "options": [], "status": [], "settings": []}}
+
+    async def event_stream(
+        appliance_id: str | None = None, keep_alive: bool = False
+    ) -> AsyncIterable[HomeConnectEvent]:
+        await sleep(client.stream_delay)
+        for event in client.stream_events:
+            yield event
+        await Event().wait()
+
+    mocker.patch.object(client, "_get", get)
+    mocker.patch.object(client, "_event_stream", event_stream)
+    return client
+
+
+class TestWatch:
+    @mark.asyncio
+    async def test_stream_first(self, offline_client: HomeConnectClient):
+        """The event stream does not wait for the initial requests."""
+        events = offline_client.watch()
+        event = await anext(events)
+        assert event.event == "DISCONNECTED"
+        await events.aclose()
+
+    @mark.asyncio
+    async def test_concurrent(self, offline_client: HomeConnectClient):
+        events = offline_client.watch()
+        requests = [await anext(events) for _ in range(13)][1:]
+        await events.aclose()
+        assert sorted({event.event for event in requests}) == [
+            "ACTIVE-PROGRAM-REQUEST",
+            "SELECTED-PROGRAM-REQUEST",
+            "SETTINGS-REQUEST",
+            "STATUS-REQUEST",
+        ]
+        assert offline_client.max_concurrent > 3
+
+    @mark.asyncio
+    async def test_merge_triggers(self, offline_client: HomeConnectClient):
+        """A burst of triggers is merged, and each of its requests is made once."""
+        offline_client.stream_delay = 0.5  # After the initial requests.
+        offline_client.stream_events = [
+            HomeConnectEvent(
+                event="STATUS",
+                timestamp=time(),
+                appliance_id="appliance-0",
+                # Separate observations, so with their own timestamps; they are not duplicates.
+                data={"items": [{"key": "BSH.Common.Status.OperationState", "value": RUN, "timestamp": 1000 + i}]},
+            )
+            for i in range(10)
+        ]
+        events = offline_client.watch()
+        received = [await anext(events) for _ in range(24)]
+        await sleep(0.3)  # Give any further requests the time to complete.
+        await events.aclose()
+        assert [event.event for event in received[12:22]] == ["STATUS"] * 10
+        assert sorted(event.event for event in received[22:]) == ["ACTIVE-PROGRAM-REQUEST", "SETTINGS-REQUEST"]
+        assert offline_client.n_requests == 1 + 3 + 12 + 2  # Appliances, available programs, requests.
+
+    @mark.asyncio
+    async def test_reconnect(self, offline_client: HomeConnectClient, mocker):
+        """The first reconnect is immediate, and records the gap and catches up on the state of the appliances."""
+        n_streams = 0
+
+        async def event_stream(
+            appliance_id: str | None = None, keep_alive: bool = False
+        ) -> AsyncIterable[HomeConnectEvent]:
+            nonlocal n_streams
+            n_streams += 1
+            await sleep(0.5)  # After the initial requests.
+            yield HomeConnectEvent(event="DISCONNECTED", timestamp=time(), appliance_id="appliance-0")
+            if n_streams == 1:
+                raise HomeConnectConnectionClosed()
+            await Event().wait()
+
+        mocker.patch.object(offline_client, "_event_stream", event_stream)
+        events = offline_client.watch()
+        received = [await anext(events) for _ in range(12 + 2 + 3 + 9)]
+        await events.aclose()
+        assert [event.event for event in received[:12]].count("DISCONNECTED") == 0
+        assert [event.event for event in received[12:]].count("DISCONNECTED") == 2
+        gaps = [event for event in received[12:] if event.event == "GAP"]
+        assert {event.appliance_id for event in gaps} == set(offline_client.appliance_ids)
+        catch_up = [event for event in received[12:] if event.event not in ("DISCONNECTED", "GAP")]
+        assert sorted({event.event for event in catch_up}) == [
+            "ACTIVE-PROGRAM-REQUEST",
+            "SELECTED-PROGRAM-REQUEST",
+            "STATUS-REQUEST",
+        ]
+        assert {event.appliance_id for event in catch_up} == set(offline_client.appliance_ids)
+
+    @mark.asyncio
+    async def test_reconnect_fails(self, offline_client: HomeConnectClient, mocker):
+        """Failed reconnects do not record gaps or catch up; that is done once, when the stream is open again."""
+        offline_client.healthy_after = 0.0
+        n_streams, connected = 0, 0.0
+
+        async def event_stream(
+            appliance_id: str | None = None, keep_alive: bool = False
+        ) -> AsyncIterable[HomeConnectEvent]:
+            nonlocal n_streams, connected
+            n_streams += 1
+            if n_streams == 1:
+                await sleep(0.5)  # After the initial requests.
+                yield HomeConnectEvent(event="DISCONNECTED", timestamp=time(), appliance_id="appliance-0")
+            if n_streams <= 4:
+                raise HomeConnectConnectionClosed()
+            connected = time()
+            yield HomeConnectEvent(event="KEEP-ALIVE", timestamp=time())
+            await Event().wait()
+
+        mocker.patch.object(offline_client, "_event_stream", event_stream)
+        events = offline_client.watch()
+        received = [await anext(events) for _ in range(12 + 1 + 3 + 9)]
+        await sleep(0.3)  # Give any further requests the time to complete.
+        await events.aclose()
+        assert n_streams == 5
+        gaps = [event for event in received if event.event == "GAP"]
+        assert sorted(event.appliance_id for event in gaps) == offline_client.appliance_ids
+        assert all(event.timestamp >= connected for event in gaps)  # The gap ends once the stream is open again.
+        assert "KEEP-ALIVE" not in [event.event for event in received]
+        assert offline_client.n_requests == 1 + 3 + 12 + 9
+
+    @mark.asyncio
+    async def test_duplicates(self, offline_client: HomeConnectClient):
+        """Events that the stream delivers twice are only yielded once."""
+        offline_client.stream_delay = 0.5  # After the initial requests.
+        offline_client.stream_events = [
+            HomeConnectEvent(
+                event="NOTIFY",
+                timestamp=time(),
+                appliance_id="appliance-0",
+                data={"items": [{"key": "BSH.Common.Option.ProgramProgress", "value": value, "timestamp": 1000}]},
+            )
+            for value in (10, 10, 20)
+        ]
+        events = offline_client.watch()
+        received = [await anext(events) for _ in range(14)]
+        await events.aclose()
+        assert [event.items for event in received[12:]] == [
+            {"BSH.Common.Option.ProgramProgress": 10},
+            {"BSH.Common.Option.ProgramProgress": 20},
+        ]
+        assert offline_client.dedup.n_duplicates == 1
+
+
+class TestRegistry:
+    @mark.asyncio
+    async def test_stale(self, offline_client: HomeConnectClient):
+        """A stale list of appliances is used right away, and refreshed in the background."""
+        offline_client.response_cache.put("", {"data": {"homeappliances": [{"haId": "old", "type": "Dryer"}]}}, {})
+        offline_client.response_cache.get("").timestamp -= 2 * 86400
+        offline_client.appliance_ids = ["old", "new"]
+        [old] = await offline_client.appliances
+        assert offline_client.n_requests == 0
+        await sleep(0.2)
+        assert await offline_client.appliances == [old, await offline_client.get_appliance("new")]
+        assert offline_client.n_requests == 1
+
+    @mark.asyncio
+    async def test_paired(self, offline_client: HomeConnectClient):
+        offline_client.stream_delay = 0.5  # After the initial requests.
+        offline_client.stream_events = [HomeConnectEvent(event="PAIRED", timestamp=time(), appliance_id="appliance-3")]
+        events = offline_client.watch()
+        for _ in range(12):  # The initial requests.
+            await anext(events)
+        offline_client.appliance_ids.append("appliance-3")
+        assert (await anext(events)).event == "PAIRED"
+        received = [await anext(events) for _ in range(4)]
+        await events.aclose()
+        assert {event.appliance_id for event in received} == {"appliance-3"}
+        assert len(await offline_client.appliances) == 4
+
+    @mark.asyncio
+    async def test_unknown(self, offline_client: HomeConnectClient):
+        await offline_client.appliances
+        offline_client.appliance_ids.append("appliance-3")
+        assert (await offline_client.get_appliance("appliance-3")).appliance_id == "appliance-3"
+        with raises(KeyError):
+            await offline_client.get_appliance("appliance-4")
+
+
+class TestGet:
+    @mark.asyncio
+    async def test_response_cache(self, offline_client: HomeConnectClient, mocker):
+        programs = {"data": {"programs": []}}
+        get = mocker.patch.object(offline_client.client, "get", AsyncMock(return_value=Response(200, json=programs)))
+        for _ in range(2):
+            assert await HomeConnectClient._get(offline_client, "/appliance-0/programs/available") == programs
+        assert get.call_count == 1
+        # The cache is persisted, so it also saves the request after a restart.
+        restarted = HomeConnectClient(token_cache=offline_client.token_cache)
+        mocker.patch.object(restarted.client, "get", get)
+        assert await restarted._get("/appliance-0/programs/available") == programs
+        assert get.call_count == 1
+
+    @mark.asyncio
+    async def test_conditional_request(self, offline_client: HomeConnectClient, mocker):
+        status = {"data": {"status": []}}
+        get = mocker.patch.object(
+            offline_client.client,
+            "get",
+            AsyncMock(side_effect=[Response(200, headers={"ETag": '"1"'}, json=status), Response(304)]),
+        )
+        for _ in range(2):
+            assert await HomeConnectClient._get(offline_client, "/appliance-0/status") == status
+        assert get.call_args.kwargs["headers"] == {"If-None-Match": '"1"'}
+
+    @mark.asyncio
+    async def test_rate_limit(self, offline_client: HomeConnectClient, mocker):
+        mocker.patch.object(
+            offline_client.client,
+            "get",
+            AsyncMock(return_value=Response(429, headers={"Retry-After": "30"}, json={"error": {"key": "429"}})),
+        )
+        assert await HomeConnectClient._get(offline_client, "/appliance-0/status") == {"error": {"key": "429"}}
+        assert offline_client.rate_limiter._blocked_until > monotonic() + 29
@@ -0,0 +1,42 @@
+from conftest import STREAM_EVENTS
+from pytest import mark
+
+from homeconnect_watcher.client.stream import EventStreamParser
+from homeconnect_watcher.event import HomeConnectEvent
+
+
+def fields(event: HomeConnectEvent) -> tuple:
+    return event.event, event.appliance_id, event.data
+
+
+@mark.parametrize("chunk_size", [1, 7, 100, 100000])
+def test_chunks(chunk_size: int):
+    """Messages split over chunks or coalesced in a chunk are parsed like single messages."""
+    stream = b"".join(STREAM_EVENTS)
+    parser = EventStreamParser(keep_alive=True)
+    events = [event for i in range(0, len(stream), chunk_size) for event in parser.feed(stream[i : i + chunk_size])]
+    assert [fields(event) for event in events] == [
+        fields(HomeConnectEvent.from_stream(message)) for message in STREAM_EVENTS
+    ]
+
+
+def test_keep_alive():
+    parser = EventStreamParser()
+    events = [event for message in STREAM_EVENTS for event in parser.feed(message)]
+    assert all(event.event != "KEEP-ALIVE" for event in events)
+    assert len(events) + parser.n_keep_alive == len(STREAM_EVENTS)
+
+
+def test_incomplete():
+    parser = EventStreamParser()
+    assert parser.feed(STREAM_EVENTS[0][:-1]) == []
+    [event] = parser.feed(b"\n")
+    assert event.event == "EVENT"
+
+
+def test_data_lines():
+    """The data of a message may span several lines."""
+    message = b'event: STATUS\ndata: {"items":\ndata: [{"key": "a", "value": 1}]}\nid: appliance\n\n'
+    [event] = EventStreamParser().feed(message)
+    assert event.data == {"items": [{"key": "a", "value": 1}]}
+    assert fields(event) == fields(HomeConnectEvent.from_stream(message))
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from dotenv import load_dotenv
 from pytest import fixture
 from pytest_asyncio import fixture as async_fixture
@@ -97,6 +99,17 @@ def event(request) -> HomeConnectEvent:
     return HomeConnectEvent.from_string(request.param)
 
 
+@fixture(scope="function")
+def log_path(tmp_path) -> Path:
+    """A directory with the JSON events spread over two daily log files."""
+    path = tmp_path / "logs"
+    path.mkdir()
+    half = len(JSON_EVENTS) // 2
+    (path / "hcw_2023-03-01.jsonl").write_text("\n".join(JSON_EVENTS[:half]) + "\n")
+    (path / "hcw_2023-03-02.jsonl").write_text("\n".join(JSON_EVENTS[half:]) + "\n")
+    return path
+
+
 @fixture(scope="function")
 def db_client(postgresql) -> WatcherDBClient:
     client = WatcherDBClient(
@@ -16,3 +16,46 @@ class TestDBClient:
 
     def test_refresh_views(self, db_client: WatcherDBClient):
         db_client.refresh_views()
+
+
+class TestPartitioned:
+    EVENTS = [
+        HomeConnectEvent(appliance_id="SIEMENS-WM14T6H9NL-AB1234567890", event="CONNECTED", timestamp=timestamp)
+        for timestamp in (1704972036.0, 1707382868.0, 1707382869.0)  # January and February 2024
+    ]
+
+    @staticmethod
+    def partitions(db_client: WatcherDBClient) -> list[str]:
+        db_client.cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'events'::regclass ORDER BY 1"
+        )
+        return [row[0] for row in db_client.cursor.fetchall()]
+
+    def test_partition(self, db_client: WatcherDBClient):
+        db_client.write_events(self.EVENTS)
+        assert not db_client.partitioned
+        db_client.partition()
+        assert db_client.partitioned
+        assert self.partitions(db_client) == ["events_2024_01", "events_2024_02"]
+        assert db_client.event_count == 3
+        db_client.cursor.execute("SELECT COUNT(*) FROM v_raw_events_active")
+        assert db_client.cursor.fetchone() == (3,)
+
+    def test_partition_twice(self, db_client: WatcherDBClient):
+        db_client.partition()
+        db_client.partition()
+        assert db_client.partitioned
+
+    def test_write_creates_partitions(self, db_client: WatcherDBClient):
+        db_client.partition()
+        db_client.write_events(self.EVENTS)
+        db_client.write_events(self.EVENTS)
+        assert self.partitions(db_client) == ["events_2024_01", "events_2024_02"]
+        assert db_client.event_count == 3
+
+    def test_detect_partitioned(self, db_client: WatcherDBClient):
+        db_client.partition()
+        with WatcherDBClient(connection_string=db_client.connection_string) as client:
+            assert client.partitioned
+            client.write_events(self.EVENTS)
+            assert client.event_count == 3
@@ -0,0 +1,52 @@
+from pytest import fixture, mark
+
+from homeconnect_watcher.db import LeaseCoordinator
+
+ACCOUNTS = ["alice", "bob", "carol", "dave", "erin"]
+
+
+@fixture(scope="function")
+def connection_string(postgresql) -> str:
+    return (
+        f"postgresql://{postgresql.info.user}:@{postgresql.info.host}:{postgresql.info.port}/{postgresql.info.dbname}"
+    )
+
+
+@mark.asyncio
+async def test_single_worker(connection_string: str):
+    async with LeaseCoordinator(connection_string, "worker-0", ACCOUNTS) as coordinator:
+        assert await coordinator.rebalance() == set(ACCOUNTS)
+        assert await coordinator.rebalance() == set(ACCOUNTS)
+
+
+@mark.asyncio
+async def test_rebalance(connection_string: str):
+    async with LeaseCoordinator(connection_string, "worker-0", ACCOUNTS) as first:
+        assert await first.rebalance() == set(ACCOUNTS)
+        async with LeaseCoordinator(connection_string, "worker-1", ACCOUNTS) as second:
+            # The second worker only gets accounts once the first has released them.
+            assert await second.rebalance() == set()
+            owned_first = await first.rebalance()
+            owned_second = await second.rebalance()
+            assert len(owned_first) == 3 and len(owned_second) == 2
+            assert owned_first | owned_second == set(ACCOUNTS)
+        # Leases are released on exit, and taken over by the remaining worker.
+        assert await first.rebalance() == set(ACCOUNTS)
+
+
+@mark.asyncio
+async def test_dead_worker(connection_string: str):
+    async with LeaseCoordinator(connection_string, "worker-0", ACCOUNTS) as first:
+        async with LeaseCoordinator(connection_string, "worker-1", ACCOUNTS) as second:
+            await first.rebalance()
+            await second.rebalance()
+            owned_first = await first.rebalance()
+            assert len(owned_first) == 3
+            # Let the second worker die: its heartbeat and leases are as old as if it stopped a while ago.
+            await first.connection.execute(
+                "UPDATE watcher_workers SET heartbeat = now() - interval '5 minutes' WHERE worker = 'worker-1'"
+            )
+            await first.connection.execute(
+                "UPDATE account_leases SET expires_at = now() - interval '4 minutes' WHERE worker = 'worker-1'"
+            )
+            assert await first.rebalance() == set(ACCOUNTS)
@@ -0,0 +1,141 @@
+from pytest import fixture
+
+from homeconnect_watcher.db import WatcherDBClient
+from homeconnect_watcher.event import HomeConnectEvent
+
+APPLIANCE_ID = "SIEMENS-WM14T6H9NL-AB1234567890"
+RUN = "BSH.Common.EnumType.OperationState.Run"
+FINISHED = "BSH.Common.EnumType.OperationState.Finished"
+READY = "BSH.Common.EnumType.OperationState.Ready"
+COTTON = "LaundryCare.Washer.Program.Cotton"
+MIX = "LaundryCare.Washer.Program.Mix"
+
+
+def status(timestamp: float, operation_state: str) -> HomeConnectEvent:
+    return HomeConnectEvent(
+        appliance_id=APPLIANCE_ID,
+        event="STATUS",
+        timestamp=timestamp,
+        data={"items": [{"key": "BSH.Common.Status.OperationState", "value": operation_state}]},
+    )
+
+
+def notify(timestamp: float, program: str | None = None, remaining: int = 600) -> HomeConnectEvent:
+    items = [{"key": "BSH.Common.Option.RemainingProgramTime", "value": remaining}]
+    if program is not None:
+        items.append({"key": "BSH.Common.Root.ActiveProgram", "value": program})
+    return HomeConnectEvent(appliance_id=APPLIANCE_ID, event="NOTIFY", timestamp=timestamp, data={"items": items})
+
+
+@fixture
+def events() -> list[HomeConnectEvent]:
+    return [
+        status(1000, READY),
+        status(1010, RUN),
+        notify(1010, COTTON),
+        notify(1100),
+        notify(1200, remaining=0),
+        status(1201, FINISHED),
+        status(1300, READY),
+        # A second session, of which the program changes halfway.
+        notify(5000, MIX),
+        status(5001, RUN),
+        notify(5100, COTTON),
+        status(5200, FINISHED),
+        # A third session, after a long silence without an inactive event in between.
+        status(20000, RUN),
+        notify(20100, remaining=0),
+        status(20101, READY),
+    ]
+
+
+def sessions(client: WatcherDBClient, table: str) -> list[tuple]:
+    client.cursor.execute(
+        f"SELECT trigger_time, start_time, end_time, program, session_details FROM {table} ORDER BY trigger_time"
+    )
+    return client.cursor.fetchall()
+
+
+class TestSessions:
+    def test_full(self, db_client: WatcherDBClient, events: list[HomeConnectEvent]):
+        db_client.write_events(events)
+        db_client.update_sessions()
+        db_client.refresh_views()
+        assert len(sessions(db_client, "sessions")) == 4
+        assert sessions(db_client, "sessions") == sessions(db_client, "v_sessions")
+
+    def test_incremental(self, db_client: WatcherDBClient, events: list[HomeConnectEvent]):
+        for event in events:
+            db_client.write_events([event])
+            db_client.update_sessions()
+        db_client.refresh_views()
+        assert sessions(db_client, "sessions") == sessions(db_client, "v_sessions")
+        db_client.cursor.execute("SELECT session_id FROM sessions ORDER BY trigger_time")
+        assert [row[0] for row in db_client.cursor.fetchall()] == [1, 2, 3, 4]
+
+    def test_incremental_same_timestamp(self, db_client: WatcherDBClient):
+        # The views continue a session when an active event has the same timestamp as the inactive event before it.
+        events = [
+            status(1000, RUN),
+            notify(1000, COTTON),
+            status(1100, READY),
+            notify(1200, remaining=0),
+            status(1200, RUN),
+            notify(1300, MIX),
+            status(1400, READY),
+            status(1500, READY),
+            notify(1500, remaining=0),
+            status(1600, RUN),
+        ]
+        for event in events:
+            db_client.write_events([event])
+            db_client.update_sessions()
+        db_client.refresh_views()
+        assert sessions(db_client, "sessions") == sessions(db_client, "v_sessions")
+
+    def test_gap(self, db_client: WatcherDBClient):
+        # A session that is split by a gap in the event stream.
+        events = [
+            status(1000, READY),
+            notify(1010, MIX),
+            HomeConnectEvent.gap(APPLIANCE_ID, start=1050, end=1100, reason="closed"),
+            notify(1200, MIX),
+            status(1300, FINISHED),
+        ]
+        for event in events:
+            db_client.write_events([event])
+            db_client.update_sessions()
+        db_client.refresh_views()
+        assert len(sessions(db_client, "sessions")) == 2
+        assert sessions(db_client, "sessions") == sessions(db_client, "v_sessions")
+
+    def test_watermark(self, db_client: WatcherDBClient, events: list[HomeConnectEvent]):
+        db_client.write_events(events)
+        db_client.update_sessions()
+        db_client.cursor.execute(
+            "SELECT event, extract(EPOCH FROM timestamp), session_id, active_program FROM session_watermarks"
+        )
+        # The last event cannot be a watermark, as an event with the same timestamp may follow.
+        assert db_client.cursor.fetchall() == [("STATUS", 5200, 3, COTTON)]
+
+    def test_rebuild(self, db_client: WatcherDBClient, events: list[HomeConnectEvent]):
+        db_client.write_events(events[7:])
+        db_client.update_sessions()
+        db_client.write_events(events[:7])  # Older than the watermark, so only picked up by a full update.
+        db_client.update_sessions(full=True)
+        db_client.refresh_views()
+        assert sessions(db_client, "sessions") == sessions(db_client, "v_sessions")
+
+    def test_reset(self, db_client: WatcherDBClient, events: list[HomeConnectEvent]):
+        other = HomeConnectEvent(
+            appliance_id="BOSCH-SMV68TX06E-AB1234567890", event="STATUS", timestamp=1000, data={"items": []}
+        )
+        db_client.write_events([other, *events[7:]])
+        db_client.update_sessions()
+        db_client.write_events(events[:7])
+        db_client.update_sessions(since={APPLIANCE_ID: events[0].datetime})
+        db_client.refresh_views()
+        assert sessions(db_client, "sessions") == sessions(db_client, "v_sessions")
+        # Only the watermarks of appliances with older events are reset.
+        db_client.cursor.execute("SELECT count(*) FROM session_watermarks")
+        assert db_client.cursor.fetchone() == (1,)
@@ -0,0 +1,139 @@
+from json import loads
+from pathlib import Path
+from random import Random
+
+from pytest import fixture, mark
+from test_session import random_events, sessionize
+
+from homeconnect_watcher.db import SQLiteDBClient, WatcherDBClient, connect_db
+from homeconnect_watcher.event import HomeConnectEvent
+
+APPLIANCE_ID = "SIEMENS-WM14T6H9NL-AB1234567890"
+
+
+@fixture
+def sqlite_client(tmp_path: Path) -> SQLiteDBClient:
+    with SQLiteDBClient(connection_string=f"sqlite://{tmp_path}/events.db") as client:
+        yield client
+
+
+def test_connect_db(tmp_path: Path):
+    assert isinstance(connect_db(f"sqlite://{tmp_path}/events.db"), SQLiteDBClient)
+    assert isinstance(connect_db("postgresql://localhost/hcw"), WatcherDBClient)
+
+
+class TestSQLiteDBClient:
+    def test_event_count(self, sqlite_client: SQLiteDBClient):
+        assert sqlite_client.event_count == 0
+        event = HomeConnectEvent(timestamp=1674291950, event="KEEP-ALIVE")
+        sqlite_client.write_events([event])
+        sqlite_client.write_events([event])  # Existing events are skipped.
+        assert sqlite_client.event_count == 1
+
+    def test_wal(self, sqlite_client: SQLiteDBClient):
+        sqlite_client.cursor.execute("PRAGMA journal_mode")
+        assert sqlite_client.cursor.fetchone() == ("wal",)
+
+    def test_reopen(self, sqlite_client: SQLiteDBClient):
+        sqlite_client.write_events([HomeConnectEvent(timestamp=1674291950, event="KEEP-ALIVE")])
+        with SQLiteDBClient(connection_string=sqlite_client.connection_string) as client:
+            assert client.event_count == 1
+
+    def test_drop_views(self, sqlite_client: SQLiteDBClient):
+        sqlite_client.drop_views()
+        sqlite_client.create_views()
+        sqlite_client.cursor.execute("SELECT COUNT(*) FROM v_sessions")
+        assert sqlite_client.cursor.fetchone() == (0,)
+
+    def test_rollback(self, sqlite_client: SQLiteDBClient):
+        event = HomeConnectEvent(appliance_id=APPLIANCE_ID, event="NOTIFY", timestamp=1704972036.0, data={})
+        try:
+            sqlite_client.write_events([HomeConnectEvent(timestamp=1674291950, event="KEEP-ALIVE"), event])
+        except ValueError:  # The items of the event are malformed.
+            pass
+        assert sqlite_client.event_count == 0
+
+
+class TestViews:
+    def test_appliances(self, sqlite_client: SQLiteDBClient):
+        program = "ConsumerProducts.CoffeeMaker.Program.Beverage.Coffee"
+        sqlite_client.write_events(
+            [
+                HomeConnectEvent(
+                    appliance_id=APPLIANCE_ID,
+                    event="NOTIFY",
+                    timestamp=timestamp,
+                    data={"items": [{"key": "BSH.Common.Root.SelectedProgram", "value": value}]},
+                )
+                for timestamp, value in [(1708587519.0, None), (1708587520.0, program)]
+            ]
+        )
+        sqlite_client.cursor.execute("SELECT * FROM v_appliances")
+        assert sqlite_client.cursor.fetchall() == [(APPLIANCE_ID, "CoffeeMaker")]
+
+    def test_events(self, sqlite_client: SQLiteDBClient):
+        def event(timestamp: float, state: str) -> HomeConnectEvent:
+            return HomeConnectEvent(
+                appliance_id=APPLIANCE_ID,
+                event="EVENT",
+                timestamp=timestamp,
+                data={"items": [{"key": "BSH.Common.Event.ProgramFinished", "value": state}]},
+            )
+
+        sqlite_client.write_events(
+            [
+                event(1703406303.0, "BSH.Common.EnumType.EventPresentState.Present"),
+                event(1703406363.0, "BSH.Common.EnumType.EventPresentState.Off"),
+            ]
+        )
+        sqlite_client.cursor.execute("SELECT * FROM v_events")
+        assert sqlite_client.cursor.fetchall() == [(APPLIANCE_ID, "ProgramFinished", 1703406303.0, 1703406363.0)]
+
+    def test_gaps(self, sqlite_client: SQLiteDBClient):
+        sqlite_client.write_events(
+            [HomeConnectEvent.gap(APPLIANCE_ID, start=1704972036.0, end=1704972156.0, reason="timeout")]
+        )
+        sqlite_client.cursor.execute("SELECT duration FROM v_gaps")
+        assert sqlite_client.cursor.fetchall() == [(120.0,)]
+        [(appliance_id, start_time, end_time, reason)] = sqlite_client.gaps()
+        assert (appliance_id, start_time.timestamp(), end_time.timestamp(), reason) == (
+            APPLIANCE_ID,
+            1704972036.0,
+            1704972156.0,
+            "timeout",
+        )
+
+
+def sessions(client: SQLiteDBClient, table: str) -> list[tuple]:
+    client.cursor.execute(
+        f"SELECT trigger_time, start_time, end_time, program, session_details FROM {table} ORDER BY trigger_time"
+    )
+    return [(*row[:-1], loads(row[-1])) for row in client.cursor.fetchall()]
+
+
+@mark.parametrize("seed", range(25))
+def test_identical_to_sessionizer(sqlite_client: SQLiteDBClient, seed: int):
+    events = random_events(Random(seed))
+    for event in events:
+        sqlite_client.write_events([event])
+        sqlite_client.update_sessions()
+    expected = [
+        (s.trigger_time.timestamp(), s.start_time.timestamp(), s.end_time.timestamp(), s.program, s.details)
+        for s in sessionize(sorted(events, key=lambda event: (event.timestamp, event.event)))
+    ]
+    assert sessions(sqlite_client, "v_sessions") == expected
+    assert sessions(sqlite_client, "sessions") == expected
+    sqlite_client.cursor.execute("SELECT session_id FROM sessions ORDER BY trigger_time")
+    assert [row[0] for row in sqlite_client.cursor.fetchall()] == list(range(1, len(expected) + 1))
+
+
+def test_update_sessions_since(sqlite_client: SQLiteDBClient):
+    events = sorted(random_events(Random(0)), key=lambda event: (event.timestamp, event.event))
+    half = len(events) // 2
+    sqlite_client.write_events(events[half:])
+    sqlite_client.update_sessions()
+    sqlite_client.cursor.execute("SELECT count(*) FROM session_watermarks")
+    assert sqlite_client.cursor.fetchone() == (1,)
+    sqlite_client.write_events(events[:half])  # Older than the watermark.
+    sqlite_client.update_sessions(since={APPLIANCE_ID: events[0].datetime})
+    assert sessions(sqlite_client, "sessions") == sessions(sqlite_client, "v_sessions")
@@ -0,0 +1,19 @@
+from pytest import mark
+
+from homeconnect_watcher.db import WatcherDBClient
+
+
+@mark.events(
+    """
+{"appliance_id": "SIEMENS-WM14T6H9NL-AB1234567890", "event": "GAP", "timestamp": 1704972156.0, "data": {"start": 1704972036.0, "reason": "timeout"}}
+{"appliance_id": "SIEMENS-WM14T6H9NL-AB1234567890", "event": "DISCONNECTED", "timestamp": 1704993381.0, "data": {"haId": "SIEMENS-WM14T6H9NL-AB1234567890", "handling": "none", "key": "BSH.Common.Appliance.Disconnected", "level": "hint", "timestamp": 1704993381.0, "value": true}}
+"""
+)
+def test_gaps(db_with_events: WatcherDBClient):
+    db_with_events.cursor.execute("SELECT appliance_id, start_time, end_time, duration, reason FROM v_gaps")
+    [(appliance_id, start_time, end_time, duration, reason)] = db_with_events.cursor.fetchall()
+    assert appliance_id == "SIEMENS-WM14T6H9NL-AB1234567890"
+    assert start_time.timestamp() == 1704972036.0
+    assert end_time.timestamp() == 1704972156.0
+    assert duration == 120
+    assert reason == "timeout"
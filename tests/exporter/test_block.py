@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from homeconnect_watcher.blockfile import CODEC_ZLIB
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.exporter.block import BlockFileExporter
+from homeconnect_watcher.read import read_block_events
+
+
+def make_events(n: int) -> list[HomeConnectEvent]:
+    return [
+        HomeConnectEvent(
+            appliance_id="SIEMENS-WM14T6H9NL-AB1234567890",
+            event="NOTIFY",
+            timestamp=1704972036.0 + i,
+            data={"items": [{"key": "BSH.Common.Option.RemainingProgramTime", "value": 8000 - i}]},
+        )
+        for i in range(n)
+    ]
+
+
+class TestBlockFileExporter:
+    def test_file_opened(self, tmp_path: Path):
+        with BlockFileExporter(tmp_path):
+            assert len(list(tmp_path.glob("hcw*.hcwb"))) == 1
+
+    def test_blocks_written(self, tmp_path: Path):
+        events = make_events(25)
+        with BlockFileExporter(tmp_path, block_size=10) as exporter:
+            exporter.bulk_export(events)
+            assert list(read_block_events(tmp_path)) == events[:20]  # The last five are still buffered.
+        assert list(read_block_events(tmp_path)) == events
+
+    def test_flushed(self, tmp_path: Path):
+        events = make_events(3)
+        with BlockFileExporter(tmp_path) as exporter:
+            exporter._last_flush = datetime.now() - timedelta(minutes=10)
+            exporter.bulk_export(events)
+            assert list(read_block_events(tmp_path)) == events
+
+    def test_append(self, tmp_path: Path):
+        events = make_events(10)
+        with BlockFileExporter(tmp_path, codec=CODEC_ZLIB) as exporter:
+            exporter.bulk_export(events[:5])
+        [path] = tmp_path.glob("hcw*.hcwb")
+        with path.open("ab") as fp:
+            fp.write(b"\x10\x00\x00")  # An incomplete block header, as if the process crashed.
+        with BlockFileExporter(tmp_path) as exporter:
+            exporter.bulk_export(events[5:])
+        assert list(read_block_events(tmp_path)) == events
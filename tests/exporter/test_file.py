@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
 from pathlib import Path
+from time import time
 
-from pytest import fixture
+from pytest import fixture, raises
 from pytest_mock.plugin import MockerFixture
+from test_block import make_events
 
 from homeconnect_watcher.exporter.file import FileExporter
+from homeconnect_watcher.read import read_archive
 
 
 class TestFileExporter:
@@ -38,3 +41,64 @@ class TestFileExporter:
         exporter._flush()
         exporter._flush()
         mock.flush.assert_called_once()
+
+    def test_events_written(self, tmp_path: Path):
+        with FileExporter(tmp_path, write_delay=0.01) as exporter:
+            exporter.bulk_export(make_events(5))
+            exporter.export(make_events(1)[0])
+        (path,) = tmp_path.glob("hcw*.jsonl")
+        assert len(path.read_text().splitlines()) == 6
+
+    def test_flush_events(self, exporter: FileExporter, mocker: MockerFixture):
+        mock = mocker.Mock()
+        exporter._fp = mock
+        exporter.flush_events = 10
+        exporter._unflushed = 9
+        exporter._flush()
+        mock.flush.assert_not_called()
+        exporter._unflushed = 10
+        exporter._flush()
+        mock.flush.assert_called_once()
+        assert exporter._unflushed == 0
+
+    def test_fsync(self, tmp_path: Path, mocker: MockerFixture):
+        fsync = mocker.patch("homeconnect_watcher.exporter.file.fsync")
+        with FileExporter(tmp_path, fsync=True) as exporter:
+            exporter.bulk_export(make_events(2))
+        fsync.assert_called()
+
+    def test_max_size(self, tmp_path: Path):
+        events = make_events(10)
+        with FileExporter(tmp_path, write_size=1, write_delay=0.01, max_size=len(str(events[0])) * 3) as exporter:
+            for event in events:
+                exporter.export(event)
+        paths = sorted(tmp_path.glob("hcw*.jsonl"))
+        assert [path.name[-10:] for path in paths[1:]] == ["_001.jsonl", "_002.jsonl", "_003.jsonl"]
+        assert sum(len(path.read_text().splitlines()) for path in paths) == 10
+
+    def test_max_size_restart(self, tmp_path: Path):
+        events = make_events(4)
+        size = len(str(events[0])) * 2
+        for event in events:
+            with FileExporter(tmp_path, max_size=size) as exporter:
+                exporter.export(event)
+        # Every restart continues with the last file, until it is full.
+        assert [len(path.read_text().splitlines()) for path in sorted(tmp_path.glob("hcw*.jsonl"))] == [2, 2]
+
+    def test_archive_files(self, tmp_path: Path):
+        with FileExporter(tmp_path, write_size=1, write_delay=0.01, max_size=1) as exporter:
+            exporter.bulk_export(make_events(3))
+        assert len(list(tmp_path.glob("hcw*.jsonl"))) == 3
+        assert [event.timestamp for event in read_archive(tmp_path)] == [event.timestamp for event in make_events(3)]
+        # The date in the names of the rolled over files is recognized, so they are skipped.
+        assert list(read_archive(tmp_path, start=time() + 3 * 86400)) == []
+
+    def test_writer_error(self, tmp_path: Path, mocker: MockerFixture):
+        exporter = FileExporter(tmp_path, write_size=1, write_delay=0.01)
+        mocker.patch.object(exporter, "_write", side_effect=OSError("No space left on device"))
+        with raises(OSError):
+            with exporter:
+                exporter.export(make_events(1)[0])
+                assert exporter._writer is not None
+                exporter._writer.join()
+                exporter.export(make_events(1)[0])
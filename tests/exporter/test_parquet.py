@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pyarrow.dataset import dataset
+from pyarrow.parquet import ParquetFile
+from test_block import make_events
+
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.exporter.parquet import EVENTS, ITEMS, ParquetExporter
+
+
+def read(path: Path) -> list[dict]:
+    return dataset(path, format="parquet", partitioning="hive").to_table().sort_by("timestamp").to_pylist()
+
+
+class TestParquetExporter:
+    def test_written(self, tmp_path: Path):
+        events = make_events(25)
+        with ParquetExporter(tmp_path, row_group_size=10) as exporter:
+            exporter.bulk_export(events)
+            assert exporter.n_files == 2  # The events and the items of the appliance.
+        rows = read(tmp_path / EVENTS)
+        assert [row["timestamp"].timestamp() for row in rows] == [event.timestamp for event in events]
+        assert rows[0]["appliance_id"] == "SIEMENS-WM14T6H9NL-AB1234567890"
+        assert rows[0]["date"] == datetime.fromtimestamp(events[0].timestamp).date().isoformat()
+        assert rows[0]["event"] == "NOTIFY" and rows[0]["error"] is None
+        items = read(tmp_path / ITEMS)
+        assert [(row["key"], row["value"], row["number"]) for row in items[:2]] == [
+            ("BSH.Common.Option.RemainingProgramTime", "8000", 8000.0),
+            ("BSH.Common.Option.RemainingProgramTime", "7999", 7999.0),
+        ]
+
+    def test_row_groups(self, tmp_path: Path):
+        with ParquetExporter(tmp_path, row_group_size=10) as exporter:
+            exporter.bulk_export(make_events(25))
+            # Two row groups have been written; the last five events are still buffered.
+            assert sum(len(buffer) for buffer in exporter._buffers.values()) == 5
+            exporter._last_flush = datetime.now() - timedelta(minutes=10)
+            exporter.bulk_export([])
+            assert not exporter._buffers
+        [path] = (tmp_path / EVENTS).rglob("*.parquet")
+        metadata = ParquetFile(path).metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [10, 10, 5]
+
+    def test_partitions(self, tmp_path: Path):
+        day = 86400.0
+        events = make_events(3) + [
+            HomeConnectEvent(event="KEEP-ALIVE", timestamp=1704972036.0),
+            HomeConnectEvent(event="CONNECTED", timestamp=1704972036.0 + day, appliance_id="OTHER"),
+        ]
+        with ParquetExporter(tmp_path) as exporter:
+            exporter.bulk_export(events)
+            # The files of the first day are closed once the events of the next day arrive.
+            assert all(day == max(day for _, day, _ in exporter._writers) for _, day, _ in exporter._writers)
+        rows = read(tmp_path / EVENTS)
+        assert len(rows) == 5
+        assert {(row["date"], row["appliance_id"]) for row in rows} == {
+            (datetime.fromtimestamp(1704972036.0).date().isoformat(), "SIEMENS-WM14T6H9NL-AB1234567890"),
+            (datetime.fromtimestamp(1704972036.0).date().isoformat(), None),
+            (datetime.fromtimestamp(1704972036.0 + day).date().isoformat(), "OTHER"),
+        }
+        assert len(read(tmp_path / ITEMS)) == 3  # Neither KEEP-ALIVE nor CONNECTED have items.
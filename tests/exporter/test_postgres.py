@@ -1,7 +1,10 @@
-from pytest import fixture
+from datetime import timedelta
 
+from pytest import fixture, mark
+
+from homeconnect_watcher.db import WatcherDBClient
 from homeconnect_watcher.event import HomeConnectEvent
-from homeconnect_watcher.exporter.postgres import PGExporter
+from homeconnect_watcher.exporter.postgres import AsyncPGExporter, PGExporter
 
 
 class TestPGExporter:
@@ -41,3 +44,57 @@ class TestPGExporter:
         with exporter:
             exporter.cursor.execute("SELECT COUNT(*) FROM events")
             assert exporter.cursor.fetchone() == (1,)
+
+
+class TestAsyncPGExporter:
+    @fixture(scope="function")
+    def exporter(self, postgresql):
+        return AsyncPGExporter(
+            connection_string=f"postgresql://{postgresql.info.user}:@{postgresql.info.host}:{postgresql.info.port}/{postgresql.info.dbname}"
+        )
+
+    @fixture(scope="class")
+    def events(self) -> list[HomeConnectEvent]:
+        return [
+            HomeConnectEvent(
+                appliance_id="SIEMENS-EX877LVV5E-AB1234567890",
+                event="NOTIFY",
+                timestamp=1641970292.0 + i,
+                data={"items": [{"key": "BSH.Common.Option.ProgramProgress", "value": i}]},
+            )
+            for i in range(100)
+        ]
+
+    @mark.asyncio
+    async def test_events_written(self, exporter: AsyncPGExporter, events: list[HomeConnectEvent]):
+        async with exporter:
+            await exporter.bulk_export(events)
+            assert await exporter.event_count == len(events)
+
+    @mark.asyncio
+    async def test_no_duplicates(self, exporter: AsyncPGExporter, events: list[HomeConnectEvent]):
+        async with exporter:
+            await exporter.bulk_export(events[:60])
+            await exporter.bulk_export(events[40:] + events[40:])
+            assert await exporter.event_count == len(events)
+
+    @mark.asyncio
+    async def test_partitioned(self, exporter: AsyncPGExporter, events: list[HomeConnectEvent]):
+        with WatcherDBClient(connection_string=exporter.connection_string) as client:
+            client.partition()
+        async with exporter:
+            assert exporter.partitioned
+            await exporter.bulk_export(events)
+            assert await exporter.event_count == len(events)
+
+    @mark.asyncio
+    async def test_sessions_and_views(self, exporter: AsyncPGExporter, events: list[HomeConnectEvent]):
+        exporter.refresh_interval = exporter.sessions_interval = timedelta(0)
+        async with exporter:
+            await exporter.bulk_export(events[50:])
+            await exporter.bulk_export(events[:50])  # Older than the watermark, so reset by `since`.
+            await exporter.update_sessions(since={events[0].appliance_id: events[0].datetime})
+            async with exporter.pool.connection() as connection:
+                sessions = await (await connection.execute("SELECT count(*) FROM sessions")).fetchone()
+                views = await (await connection.execute("SELECT count(*) FROM v_sessions")).fetchone()
+            assert sessions == views
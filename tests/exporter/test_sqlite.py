@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from test_block import make_events
+
+from homeconnect_watcher.exporter.sqlite import SQLiteExporter
+
+
+class TestSQLiteExporter:
+    def test_export(self, tmp_path: Path):
+        with SQLiteExporter(connection_string=f"sqlite://{tmp_path}/events.db") as exporter:
+            exporter.bulk_export(make_events(10))
+            exporter.export(make_events(11)[-1])
+            assert exporter.event_count == 11
+
+    def test_update_sessions(self, tmp_path: Path, mocker):
+        with SQLiteExporter(connection_string=f"sqlite://{tmp_path}/events.db") as exporter:
+            update_sessions = mocker.spy(exporter, "update_sessions")
+            exporter.bulk_export(make_events(1))
+            update_sessions.assert_not_called()
+            exporter._next_refresh = datetime.now() - timedelta(seconds=1)
+            exporter.bulk_export(make_events(2))
+            update_sessions.assert_called_once()
@@ -0,0 +1,47 @@
+from dataclasses import replace
+from math import isnan
+from random import Random
+
+from pytest import mark
+from test_session import APPLIANCE_ID, notify, random_events, sessionize, status
+
+from homeconnect_watcher.analytics import EventTable, sessions
+from homeconnect_watcher.event import HomeConnectEvent
+
+
+def test_event_table():
+    events = [
+        notify(1704972100.0, "LaundryCare.Washer.Program.Cotton", 600),
+        status(1704972000.0, "BSH.Common.EnumType.OperationState.Run"),
+        HomeConnectEvent(appliance_id="OTHER", event="CONNECTED", timestamp=1704971000.0),
+    ]
+    table = EventTable.from_events(events)
+    assert len(table) == 3
+    assert table.appliances == sorted([APPLIANCE_ID, "OTHER"])
+    # The events are sorted by appliance and timestamp.
+    assert list(table.timestamp) == [1704971000.0, 1704972000.0, 1704972100.0]
+    remaining = table.numbers("BSH.Common.Option.RemainingProgramTime")
+    assert isnan(remaining[0]) and isnan(remaining[1]) and remaining[2] == 600
+    assert list(table.active_labels()) == [0, 1, 1]
+
+
+@mark.parametrize("seed", range(200))
+def test_sessions(seed: int):
+    random = Random(seed)
+    events = random_events(random)
+    if random.random() < 0.5:
+        # A second appliance, of which the events are interleaved with those of the first.
+        events += [replace_appliance(event, "OTHER") for event in random_events(random)]
+        random.shuffle(events)
+    expected = sessionize(sorted(events, key=lambda event: (event.appliance_id, event.timestamp, event.event)))
+    # The Sessionizer ends the sessions of the appliances interleaved, whereas they are sorted by appliance here.
+    expected.sort(key=lambda session: (session.appliance_id, session.trigger_time))
+    assert sessions(EventTable.from_events(events)) == [replace(session, details={}) for session in expected]
+
+
+def test_empty():
+    assert sessions(EventTable.from_events([])) == []
+
+
+def replace_appliance(event: HomeConnectEvent, appliance_id: str) -> HomeConnectEvent:
+    return HomeConnectEvent(appliance_id=appliance_id, event=event.event, timestamp=event.timestamp, data=event.data)
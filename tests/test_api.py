@@ -0,0 +1,119 @@
+from asyncio import Event, sleep
+from pathlib import Path
+from typing import AsyncIterable
+
+from pytest import mark, raises
+from test_pipeline import CollectingExporter, FailingExporter
+
+from homeconnect_watcher.api import loop
+from homeconnect_watcher.event import HomeConnectEvent
+
+
+class FakeClient:
+    """A client of an account, of which the first `n_failures` watches fail after the first event."""
+
+    def __init__(self, name: str, n_events: int, n_failures: int = 0):
+        self.token_cache = Path(name)
+        self.n_events = n_events
+        self.n_failures = n_failures
+
+    async def watch(self) -> AsyncIterable[HomeConnectEvent]:
+        for i in range(self.n_events):
+            yield HomeConnectEvent(event="STATUS", timestamp=float(i), appliance_id=self.token_cache.name)
+            if self.n_failures:
+                self.n_failures -= 1
+                raise ConnectionError()
+
+
+@mark.asyncio
+async def test_accounts():
+    exporter = CollectingExporter()
+    clients = [FakeClient("a", n_events=3), FakeClient("b", n_events=2, n_failures=1)]
+    await loop(clients, [exporter], restart_delay=0)
+    # The failing client is restarted, without stopping the other one.
+    assert sorted((event.appliance_id, event.timestamp) for event in exporter.events) == [
+        ("a", 0.0),
+        ("a", 1.0),
+        ("a", 2.0),
+        ("b", 0.0),
+        ("b", 0.0),
+        ("b", 1.0),
+    ]
+
+
+@mark.asyncio
+async def test_export_failure():
+    with raises(ValueError):
+        await loop([FakeClient("a", n_events=3)], [FailingExporter()], restart_delay=0)
+
+
+class FakeCoordinator:
+    """A coordinator that leases the given sets of accounts, one per rebalance, and then stops."""
+
+    renew_interval = 0.01
+
+    def __init__(self, leases: list[set[str]]):
+        self.leases = leases
+
+    async def __aenter__(self) -> "FakeCoordinator":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        return
+
+    async def rebalance(self) -> set[str]:
+        if not self.leases:
+            raise RuntimeError("Stopped.")
+        return self.leases.pop(0)
+
+
+@mark.asyncio
+async def test_coordinator():
+    exporter = CollectingExporter()
+    clients = [FakeClient("a", n_events=3), FakeClient("b", n_events=2), FakeClient("c", n_events=1)]
+    with raises(RuntimeError):
+        await loop(clients, [exporter], restart_delay=0, coordinator=FakeCoordinator([{"a"}, {"a", "c"}]))
+    # Only the leased accounts are watched.
+    assert sorted({event.appliance_id for event in exporter.events}) == ["a", "c"]
+
+
+class BlockingClient(FakeClient):
+    """A client that yields one event and then waits, and records when its watch is closed, which takes a while."""
+
+    def __init__(self, name: str):
+        super().__init__(name, n_events=1)
+        self.closed = False
+
+    async def watch(self) -> AsyncIterable[HomeConnectEvent]:
+        try:
+            yield HomeConnectEvent(event="STATUS", timestamp=0.0, appliance_id=self.token_cache.name)
+            await Event().wait()
+        finally:
+            await sleep(0.05)
+            self.closed = True
+
+
+class RecordingCoordinator(FakeCoordinator):
+    """Records which clients are closed at every rebalance, and when it is closed."""
+
+    def __init__(self, leases: list[set[str]], clients: list[BlockingClient]):
+        super().__init__(leases)
+        self.clients = clients
+        self.closed: list[set[str]] = []
+
+    async def rebalance(self) -> set[str]:
+        self.closed.append({client.token_cache.name for client in self.clients if client.closed})
+        return await super().rebalance()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.closed.append({client.token_cache.name for client in self.clients if client.closed})
+
+
+@mark.asyncio
+async def test_coordinator_closes_clients():
+    clients = [BlockingClient("a"), BlockingClient("b")]
+    coordinator = RecordingCoordinator([{"a", "b"}, {"b"}, {"b"}], clients)
+    with raises(RuntimeError):
+        await loop(clients, [CollectingExporter()], restart_delay=0, coordinator=coordinator)
+    # A released account is no longer watched by the next rebalance, and all are closed before the coordinator.
+    assert coordinator.closed == [set(), set(), {"a"}, {"a"}, {"a", "b"}]
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from pytest import mark, raises
+
+from homeconnect_watcher.blockfile import (
+    CODEC_ZLIB,
+    CODEC_ZSTD,
+    decode_block,
+    encode_block,
+    file_header,
+    iter_blocks,
+    read_block_file,
+)
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.read import read_events
+
+
+def events(log_path: Path) -> list[HomeConnectEvent]:
+    return [event for batch in read_events(log_path) for event in batch]
+
+
+@mark.parametrize("codec", [CODEC_ZLIB, CODEC_ZSTD])
+def test_round_trip(log_path: Path, codec: int):
+    original = events(log_path)
+    buffer = file_header(codec) + encode_block(original, codec)
+    [block] = iter_blocks(buffer)
+    assert block.n_events == len(original)
+    assert block.first_timestamp == min(event.timestamp for event in original)
+    assert decode_block(buffer[block.offset : block.offset + block.length], codec) == original
+
+
+def test_smaller_than_jsonl(log_path: Path, tmp_path: Path):
+    original = events(log_path) * 20
+    jsonl_size = sum(len(str(event)) for event in original)
+    block_size = len(encode_block(original, CODEC_ZLIB))
+    assert block_size * 4 < jsonl_size
+
+
+def test_read_time_range(log_path: Path, tmp_path: Path):
+    original = sorted(events(log_path), key=lambda event: event.timestamp)
+    path = tmp_path / "hcw_2023-03-01.hcwb"
+    path.write_bytes(
+        file_header(CODEC_ZLIB)
+        + b"".join(encode_block(original[i : i + 3], CODEC_ZLIB) for i in range(0, len(original), 3))
+    )
+    assert list(read_block_file(path)) == original
+    start, end = original[4].timestamp, original[10].timestamp
+    assert list(read_block_file(path, start=start, end=end)) == [
+        event for event in original if start <= event.timestamp < end
+    ]
+
+
+def test_incomplete_block_ignored(log_path: Path, tmp_path: Path):
+    original = events(log_path)
+    path = tmp_path / "hcw_2023-03-01.hcwb"
+    path.write_bytes(
+        file_header(CODEC_ZLIB) + encode_block(original, CODEC_ZLIB) + encode_block(original, CODEC_ZLIB)[:-5]
+    )
+    assert list(read_block_file(path)) == original
+
+
+def test_not_a_block_file(tmp_path: Path):
+    path = tmp_path / "hcw_2023-03-01.hcwb"
+    path.write_bytes(b"{}\n{}\n")
+    with raises(ValueError):
+        list(read_block_file(path))
@@ -0,0 +1,78 @@
+from pathlib import Path
+
+from homeconnect_watcher.dedup import DedupCache, event_key
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.read import read_events
+
+APPLIANCE_ID = "SIEMENS-WM14T6H9NL-AB1234567890"
+
+
+def notify(timestamp: float, api_timestamp: float | None = 1000.0, value: int = 600) -> HomeConnectEvent:
+    item = {"key": "BSH.Common.Option.RemainingProgramTime", "value": value}
+    if api_timestamp is not None:
+        item["timestamp"] = api_timestamp
+    return HomeConnectEvent(appliance_id=APPLIANCE_ID, event="NOTIFY", timestamp=timestamp, data={"items": [item]})
+
+
+def test_duplicates():
+    cache = DedupCache()
+    assert not cache.seen(notify(1000))
+    assert cache.seen(notify(1001))  # Redelivered, so received later.
+    assert not cache.seen(notify(1002, value=500))
+    assert not cache.seen(notify(1003, api_timestamp=1003))
+    assert cache.n_duplicates == 1
+
+
+def test_without_api_timestamps():
+    """Events without timestamps of the API may repeat, and are never duplicates."""
+    cache = DedupCache()
+    assert not any(cache.seen(notify(1000 + i, api_timestamp=None)) for i in range(3))
+    request = HomeConnectEvent(appliance_id=APPLIANCE_ID, event="STATUS-REQUEST", timestamp=1000, data={"status": []})
+    assert not any(cache.seen(request) for _ in range(3))
+    assert not any(cache.seen(HomeConnectEvent(event="PAIRED", timestamp=1000)) for _ in range(3))
+    assert len(cache) == 0
+
+
+def test_window():
+    cache = DedupCache(window=60)
+    assert not cache.seen(notify(1000))
+    assert not cache.seen(notify(1100))  # The first one has expired.
+    assert len(cache) == 1
+
+
+def test_max_size():
+    cache = DedupCache(max_size=2)
+    for api_timestamp in (1, 2, 3):
+        assert not cache.seen(notify(1000, api_timestamp=api_timestamp))
+    assert len(cache) == 2
+    assert not cache.seen(notify(1000, api_timestamp=1))  # Evicted.
+    assert cache.seen(notify(1000, api_timestamp=3))
+
+
+def test_read_events(tmp_path: Path):
+    (tmp_path / "hcw_2024-01-11.jsonl").write_text("".join(str(notify(1000 + i)) for i in range(3)))
+    assert sum(len(batch) for batch in read_events(tmp_path)) == 3
+    assert sum(len(batch) for batch in read_events(tmp_path, dedup=True)) == 1
+
+
+def test_raw():
+    """The data of events from the stream is not decoded to recognize duplicates."""
+    cache = DedupCache()
+    raw = b'{"items":[{"key":"BSH.Common.Option.ProgramProgress","value":10,"timestamp":1000}]}'
+    for timestamp in (1000, 1001):
+        event = HomeConnectEvent(appliance_id=APPLIANCE_ID, event="NOTIFY", timestamp=timestamp, raw=raw)
+        cache.seen(event)
+        assert event.raw_data is not None
+    assert cache.n_duplicates == 1
+    without = b'{"items":[{"key":"BSH.Common.Option.ProgramProgress","value":10}]}'
+    assert not any(
+        cache.seen(HomeConnectEvent(appliance_id=APPLIANCE_ID, event="NOTIFY", timestamp=1002, raw=without))
+        for _ in range(2)
+    )
+
+
+def test_event_key():
+    assert event_key(notify(1000)) == event_key(notify(1001))
+    assert event_key(notify(1000)) != event_key(notify(1000, value=500))
+    assert event_key(notify(1000)) != event_key(HomeConnectEvent.from_string(str(notify(1000, value=500))))
+    assert len(event_key(notify(1000))) == 16
@@ -1,3 +1,6 @@
+from json import loads
+from sys import intern
+
 from pytest import mark, skip
 
 from homeconnect_watcher.client import HomeConnectAppliance
@@ -105,3 +108,47 @@ class TestEvent:
             assert event.event in ("DISCONNECTED", "STATUS", "KEEP-ALIVE") or event.is_request
         else:
             assert isinstance(trigger, Trigger)
+
+
+def test_gap():
+    event = HomeConnectEvent.from_string(str(HomeConnectEvent.gap("appliance", start=1000, end=1060, reason="timeout")))
+    assert event.event == "GAP"
+    assert event.timestamp == 1060
+    assert event.data == {"start": 1000, "reason": "timeout"}
+    assert event.items == {"start": 1000, "reason": "timeout"}
+    assert event.trigger is None
+
+
+def test_lazy_data():
+    raw = b'{"items":[{"key":"BSH.Common.Status.DoorState","value":"BSH.Common.EnumType.DoorState.Open"}]}'
+    event = HomeConnectEvent(event="STATUS", timestamp=1000.0, appliance_id="appliance", raw=raw)
+    assert not hasattr(event, "__dict__")
+    assert event == HomeConnectEvent(event="STATUS", timestamp=1000.0, appliance_id="appliance", data=loads(raw))
+    assert event.items is event.items  # Computed once.
+    [key] = event.items
+    assert key is intern("BSH.Common.Status.DoorState")
+    event.data = {"items": []}
+    assert event.items == {}
+
+
+def test_from_string_raw():
+    event = HomeConnectEvent(
+        event="NOTIFY",
+        timestamp=1000.0,
+        appliance_id="appliance",
+        data={"items": [{"key": "BSH.Common.Option.ProgramProgress", "value": 10, "timestamp": 990}]},
+    )
+    read = HomeConnectEvent.from_string(str(event))
+    assert read.raw_data is not None  # The data is not decoded until it is used.
+    assert (read.event, read.timestamp, read.appliance_id) == ("NOTIFY", 1000.0, "appliance")
+    assert read == event
+    assert read.raw_data is None
+
+
+def test_from_string_error():
+    line = str(HomeConnectEvent.from_request("STATUS", "appliance", {"error": {"key": "SDK.Error.HomeAppliance"}}))
+    event = HomeConnectEvent.from_string(line)
+    assert event.error == {"key": "SDK.Error.HomeAppliance"}
+    # Lines in another layout are decoded at once.
+    event = HomeConnectEvent.from_string('{"event": "STATUS", "data": {"items": []}, "timestamp": 1000.0}')
+    assert (event.raw_data, event.data, event.timestamp) == (None, {"items": []}, 1000.0)
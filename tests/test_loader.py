@@ -0,0 +1,101 @@
+from os import utime
+from pathlib import Path
+
+from homeconnect_watcher.db import WatcherDBClient
+from homeconnect_watcher.loader import BulkLoader, manifest_name, parse_file, resume_offset
+
+
+def test_parse_file(log_path: Path):
+    path = log_path / "hcw_2023-03-01.jsonl"
+    parsed = parse_file(path)
+    assert parsed.n_bytes == path.stat().st_size
+    assert len(parsed.rows) == len(path.read_text().splitlines())
+
+
+def test_load(log_path: Path, db_client: WatcherDBClient):
+    paths = sorted(log_path.glob("*.jsonl"))
+    loader = BulkLoader(connection_string=db_client.connection_string, batch_size=5, processes=2)
+    report = loader.load(paths)
+    assert report.n_files == 2
+    assert report.n_events == db_client.event_count
+    assert report.n_bytes == sum(path.stat().st_size for path in paths)
+    assert report.events_per_second > 0
+    db_client.cursor.execute(
+        "SELECT appliance_id::text, min(timestamp) FROM events WHERE appliance_id <> '' GROUP BY 1"
+    )
+    assert report.first_timestamps == dict(db_client.cursor.fetchall())
+    # Loading again does not add any events.
+    loader.load(paths)
+    assert report.n_events == db_client.event_count
+
+
+def test_parse_file_incomplete_line(log_path: Path):
+    path = log_path / "hcw_2023-03-01.jsonl"
+    complete = path.stat().st_size
+    with path.open("a") as fp:
+        fp.write('{"appliance_id": null, "event": "KEEP-ALIVE", ')
+    parsed = parse_file(path)
+    assert parsed.manifest.byte_offset == complete
+    assert parsed.manifest.size > complete
+
+
+def test_resume_offset(log_path: Path):
+    path = log_path / "hcw_2023-03-01.jsonl"
+    entry = parse_file(path).manifest
+    assert resume_offset(path, None) == 0
+    assert resume_offset(path, entry) is None
+    size = path.stat().st_size
+    with path.open("a") as fp:
+        fp.write(path.read_text().splitlines()[0] + "\n")
+    assert resume_offset(path, entry) == size
+    path.write_text("\n" + path.read_text())
+    assert resume_offset(path, entry) == 0
+
+
+def test_resume_offset_rewritten(log_path: Path):
+    path = log_path / "hcw_2023-03-01.jsonl"
+    entry = parse_file(path).manifest
+    # Rewrite a byte in the middle, outside of the hashed windows, keeping the size.
+    content = bytearray(path.read_bytes())
+    middle = next(i for i in range(len(content) // 2, len(content)) if content[i : i + 1] == b" ")
+    content[middle : middle + 1] = b"\t"
+    path.write_bytes(bytes(content))
+    utime(path, (entry.mtime + 1, entry.mtime + 1))
+    assert resume_offset(path, entry) == 0
+
+
+def test_incremental_load(log_path: Path, db_client: WatcherDBClient):
+    loader = BulkLoader(connection_string=db_client.connection_string, processes=1)
+    first, second = sorted(log_path.glob("*.jsonl"))
+    loader.load([first])
+    assert db_client.read_manifest()[first.name].byte_offset == first.stat().st_size
+    report = loader.load([first, second])
+    assert report.n_skipped == 1
+    assert report.n_files == 1
+    with first.open("a") as fp:
+        fp.write('{"appliance_id": null, "event": "KEEP-ALIVE", "timestamp": 1674291951.0}\n')
+    report = loader.load([first, second])
+    assert report.n_events == 1
+    assert report.n_skipped == 1
+
+
+def test_manifest_name(log_path: Path):
+    path = log_path / "hcw_2023-03-01.jsonl"
+    assert manifest_name(path) == "hcw_2023-03-01.jsonl"
+    assert manifest_name(log_path / "host-0" / path.name, root=log_path) == "host-0/hcw_2023-03-01.jsonl"
+    assert parse_file(path, name="host-0/hcw_2023-03-01.jsonl").manifest.file_name == "host-0/hcw_2023-03-01.jsonl"
+
+
+def test_load_workers(log_path: Path, db_client: WatcherDBClient):
+    """Files of the same name from different workers have their own manifest entries."""
+    for worker in ("host-0", "host-1"):
+        (log_path / worker).mkdir()
+    first, second = sorted(log_path.glob("*.jsonl"))
+    first.rename(log_path / "host-0" / "hcw.jsonl")
+    second.rename(log_path / "host-1" / "hcw.jsonl")
+    loader = BulkLoader(connection_string=db_client.connection_string, processes=1)
+    paths = sorted(log_path.glob("*/*.jsonl"))
+    report = loader.load(paths, root=log_path)
+    assert report.n_files == 2
+    assert sorted(db_client.read_manifest()) == ["host-0/hcw.jsonl", "host-1/hcw.jsonl"]
+    assert loader.load(paths, root=log_path).n_skipped == 2
@@ -0,0 +1,91 @@
+from asyncio import sleep
+from threading import Event
+
+from pytest import mark, raises
+
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.exporter.base import BaseExporter
+from homeconnect_watcher.pipeline import DropPolicy, ExportPipeline
+
+
+class CollectingExporter(BaseExporter):
+    def __init__(self, release: Event | None = None):
+        super().__init__()
+        self.batches: list[list[HomeConnectEvent]] = []
+        self.release = release
+
+    def export(self, event: HomeConnectEvent) -> None:
+        raise NotImplementedError
+
+    def bulk_export(self, events: list[HomeConnectEvent]) -> None:
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        self.batches.append(events)
+
+    @property
+    def events(self) -> list[HomeConnectEvent]:
+        return [event for batch in self.batches for event in batch]
+
+
+class FailingExporter(BaseExporter):
+    def export(self, event: HomeConnectEvent) -> None:
+        raise ValueError("Export failed.")
+
+
+def make_event(i: int) -> HomeConnectEvent:
+    return HomeConnectEvent(event="KEEP-ALIVE", timestamp=float(i))
+
+
+@mark.asyncio
+async def test_all_events_exported():
+    exporters = [CollectingExporter(), CollectingExporter()]
+    async with ExportPipeline(exporters, batch_size=10, batch_delay=0.01) as pipeline:
+        for i in range(25):
+            await pipeline.put(make_event(i))
+    for exporter in exporters:
+        assert [event.timestamp for event in exporter.events] == list(range(25))
+        assert all(len(batch) <= 10 for batch in exporter.batches)
+
+
+@mark.asyncio
+async def test_batched():
+    exporter = CollectingExporter()
+    async with ExportPipeline([exporter], batch_size=100, batch_delay=0.5) as pipeline:
+        for i in range(20):
+            await pipeline.put(make_event(i))
+    assert len(exporter.batches) == 1
+
+
+@mark.asyncio
+async def test_drop_newest():
+    release = Event()
+    exporter = CollectingExporter(release=release)
+    async with ExportPipeline([exporter], max_size=2, batch_size=1, drop_policy=DropPolicy.DROP_NEWEST) as pipeline:
+        await pipeline.put(make_event(0))
+        await sleep(0.05)  # Event 0 is now being exported, blocking the consumer.
+        for i in range(1, 5):
+            await pipeline.put(make_event(i))
+        release.set()
+    assert [event.timestamp for event in exporter.events] == [0, 1, 2]
+
+
+@mark.asyncio
+async def test_drop_oldest():
+    release = Event()
+    exporter = CollectingExporter(release=release)
+    async with ExportPipeline([exporter], max_size=2, batch_size=1, drop_policy=DropPolicy.DROP_OLDEST) as pipeline:
+        await pipeline.put(make_event(0))
+        await sleep(0.05)
+        for i in range(1, 5):
+            await pipeline.put(make_event(i))
+        release.set()
+    assert [event.timestamp for event in exporter.events] == [0, 3, 4]
+
+
+@mark.asyncio
+async def test_failure_raised():
+    with raises(ValueError):
+        async with ExportPipeline([FailingExporter()], batch_delay=0.01) as pipeline:
+            await pipeline.put(make_event(0))
+            await sleep(0.05)
+            await pipeline.put(make_event(1))
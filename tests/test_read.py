@@ -0,0 +1,89 @@
+from datetime import datetime
+from pathlib import Path
+from random import Random
+
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.read import INDEX_SUFFIX, index_file, log_files, read_archive, read_events
+
+APPLIANCES = ["SIEMENS-WM14T6H9NL-AB1234567890", "SIEMENS-WT8HXM90NL-AB1234567890"]
+
+
+def write_archive(path: Path, n_days: int = 5, per_day: int = 300) -> list[HomeConnectEvent]:
+    """Daily files as written by the FileExporter: roughly, but not exactly, in order of time."""
+    random = Random(0)
+    events = []
+    for day in range(n_days):
+        midnight = datetime(2024, 1, 1 + day).timestamp()
+        day_events = [
+            HomeConnectEvent(
+                event=random.choice(["STATUS", "NOTIFY", "KEEP-ALIVE"]),
+                timestamp=midnight + i * 280 + random.randint(-30, 30),
+                appliance_id=random.choice(APPLIANCES),
+            )
+            for i in range(per_day)
+        ]
+        (path / f"hcw_{datetime(2024, 1, 1 + day).strftime('%Y-%m-%d')}.jsonl").write_text(
+            "".join(str(event) for event in day_events)
+        )
+        events.extend(day_events)
+    return events
+
+
+def test_read_archive(tmp_path: Path):
+    events = write_archive(tmp_path)
+    assert list(read_archive(tmp_path)) == sorted(events, key=lambda event: (event.timestamp, event.event))
+
+
+def test_filters(tmp_path: Path):
+    events = write_archive(tmp_path)
+    start, end = datetime(2024, 1, 2, 12).timestamp(), datetime(2024, 1, 3, 6).timestamp()
+    expected = sorted(
+        (e for e in events if start <= e.timestamp < end and e.appliance_id == APPLIANCES[1] and e.event == "STATUS"),
+        key=lambda event: (event.timestamp, event.event),
+    )
+    assert len(expected) > 0
+    assert list(read_archive(tmp_path, start=start, end=end, appliance_id=APPLIANCES[1], event="STATUS")) == expected
+
+
+def test_skip_files(tmp_path: Path):
+    write_archive(tmp_path)
+    list(read_archive(tmp_path, start=datetime(2024, 1, 5).timestamp()))
+    # Files far away from the requested range are not even indexed.
+    assert sorted(f.name for f in tmp_path.glob(f"*{INDEX_SUFFIX}")) == [
+        "hcw_2024-01-04.jsonl.idx",
+        "hcw_2024-01-05.jsonl.idx",
+    ]
+
+
+def test_index_extended(tmp_path: Path):
+    path = tmp_path / "hcw_2024-01-01.jsonl"
+    events = [HomeConnectEvent(event="STATUS", timestamp=1704067200.0 + i) for i in range(25)]
+    # The last line is still being written.
+    path.write_text("".join(str(event) for event in events[:20]) + str(events[20])[:10])
+    chunks = index_file(path, chunk_size=8)
+    assert [(chunk.first_timestamp, chunk.last_timestamp) for chunk in chunks] == [
+        (1704067200.0, 1704067207.0),
+        (1704067208.0, 1704067215.0),
+        (1704067216.0, 1704067219.0),
+    ]
+    path.write_text("".join(str(event) for event in events) + "\n")
+    chunks = index_file(path, chunk_size=8)
+    assert sum(chunk.length for chunk in chunks) == path.stat().st_size - 1
+    assert chunks[-1].last_timestamp == 1704067224.0
+    assert list(read_archive(tmp_path)) == events
+
+
+def test_worker_directories(tmp_path: Path):
+    """Sharded workers write to subdirectories of the log directory, which are read as well."""
+    events = []
+    for worker in ("host-0", "host-1"):
+        (tmp_path / worker).mkdir()
+        events.extend(write_archive(tmp_path / worker, n_days=2, per_day=10))
+    assert [f.relative_to(tmp_path).as_posix() for f in log_files(tmp_path)] == [
+        "host-0/hcw_2024-01-01.jsonl",
+        "host-1/hcw_2024-01-01.jsonl",
+        "host-0/hcw_2024-01-02.jsonl",
+        "host-1/hcw_2024-01-02.jsonl",
+    ]
+    assert sum(len(batch) for batch in read_events(tmp_path)) == len(events)
+    assert list(read_archive(tmp_path)) == sorted(events, key=lambda event: (event.timestamp, event.event))
@@ -0,0 +1,125 @@
+from random import Random
+
+from pytest import mark
+
+from homeconnect_watcher.db import WatcherDBClient
+from homeconnect_watcher.event import HomeConnectEvent
+from homeconnect_watcher.session import RecordType, Session, Sessionizer, active_label
+
+APPLIANCE_ID = "SIEMENS-WM14T6H9NL-AB1234567890"
+OPERATION_STATES = [
+    "BSH.Common.EnumType.OperationState.Ready",
+    "BSH.Common.EnumType.OperationState.Run",
+    "BSH.Common.EnumType.OperationState.Pause",
+    "BSH.Common.EnumType.OperationState.Finished",
+]
+PROGRAMS = [None, None, "LaundryCare.Washer.Program.Cotton", "LaundryCare.Washer.Program.Mix"]
+
+
+def status(timestamp: float, operation_state: str) -> HomeConnectEvent:
+    return HomeConnectEvent(
+        appliance_id=APPLIANCE_ID,
+        event="STATUS",
+        timestamp=timestamp,
+        data={"items": [{"key": "BSH.Common.Status.OperationState", "value": operation_state}]},
+    )
+
+
+def notify(timestamp: float, program: str | None = None, remaining: int = 600) -> HomeConnectEvent:
+    items = [{"key": "BSH.Common.Option.RemainingProgramTime", "value": remaining}]
+    if program is not None:
+        items.append({"key": "BSH.Common.Root.ActiveProgram", "value": program})
+    return HomeConnectEvent(appliance_id=APPLIANCE_ID, event="NOTIFY", timestamp=timestamp, data={"items": items})
+
+
+def random_events(random: Random) -> list[HomeConnectEvent]:
+    """A random history, with many events on the same timestamp and long silences."""
+    events: dict[tuple[float, str], HomeConnectEvent] = {}
+    timestamp = 1704972036.0
+    for _ in range(random.randint(5, 40)):
+        timestamp += random.choice([0, 0, 1, 60, 6000])
+        kind = random.random()
+        if kind < 0.4:
+            event = status(timestamp, random.choice(OPERATION_STATES))
+        elif kind < 0.8:
+            event = notify(timestamp, random.choice(PROGRAMS), random.choice([0, 600]))
+        else:
+            event = HomeConnectEvent(
+                appliance_id=APPLIANCE_ID,
+                event=random.choice(["CONNECTED", "DISCONNECTED", "GAP"]),
+                timestamp=timestamp,
+            )
+        events.setdefault((event.timestamp, event.event), event)
+    return list(events.values())
+
+
+def sessionize(events: list[HomeConnectEvent]) -> list[Session]:
+    sessionizer = Sessionizer()
+    records = [record for event in events for record in sessionizer.feed(event)] + sessionizer.flush()
+    return [record.session for record in records if record.type == RecordType.END]
+
+
+def test_active_label():
+    assert active_label("CONNECTED", {}) is False
+    assert active_label("STATUS", {"BSH.Common.Status.OperationState": OPERATION_STATES[1]}) is True
+    assert active_label("STATUS", {"BSH.Common.Status.OperationState": OPERATION_STATES[0]}) is False
+    assert active_label("NOTIFY", {"BSH.Common.Root.ActiveProgram": PROGRAMS[2]}) is True
+    assert (
+        active_label(
+            "NOTIFY", {"BSH.Common.Root.ActiveProgram": PROGRAMS[2], "BSH.Common.Option.RemainingProgramTime": 0}
+        )
+        is None
+    )
+
+
+def test_records():
+    sessionizer = Sessionizer()
+    assert sessionizer.feed(status(1000, OPERATION_STATES[0])) == []
+    [start] = sessionizer.feed(notify(1010, PROGRAMS[2]))
+    assert start.type == RecordType.START
+    assert start.session.program == "Cotton"
+    assert sessionizer.feed(status(1020, OPERATION_STATES[1])) == []
+    assert sessionizer.feed(status(1030, OPERATION_STATES[3])) == []
+    [end, start] = sessionizer.feed(status(8000, OPERATION_STATES[1]))
+    assert end.type == RecordType.END
+    assert end.session.trigger_time.timestamp() == 1010
+    assert end.session.start_time.timestamp() == 1020
+    assert end.session.end_time.timestamp() == 1020
+    assert start.type == RecordType.START
+    [end] = sessionizer.flush()
+    assert end.session.trigger_time.timestamp() == 8000
+
+
+def test_timeout():
+    sessions = sessionize([status(1000, OPERATION_STATES[1]), status(1000 + 5401, OPERATION_STATES[2])])
+    assert len(sessions) == 2
+
+
+def test_gap():
+    """A session does not span a gap in the event stream."""
+    gap = HomeConnectEvent.gap(APPLIANCE_ID, start=1015, end=1020, reason="timeout")
+    sessions = sessionize([status(1000, OPERATION_STATES[1]), gap, status(1030, OPERATION_STATES[1])])
+    assert [session.trigger_time.timestamp() for session in sessions] == [1000, 1030]
+
+
+def test_program_change():
+    sessions = sessionize([notify(1000, PROGRAMS[2]), notify(1010, PROGRAMS[3])])
+    assert [session.program for session in sessions] == ["Cotton", "Mix"]
+
+
+@mark.parametrize("seed", range(25))
+def test_identical_to_view(db_client: WatcherDBClient, seed: int):
+    events = random_events(Random(seed))
+    db_client.write_events(events)
+    db_client.refresh_views()
+    db_client.cursor.execute(
+        "SELECT appliance_id, session_id, trigger_time, start_time, end_time, program, session_details "
+        "FROM v_sessions ORDER BY session_id NULLS FIRST"
+    )
+    # Which value of a key ends up in the view's session_details is undefined, so only the keys are compared.
+    expected = [(*row[:-1], row[-1].keys()) for row in db_client.cursor.fetchall()]
+    sessions = sessionize(sorted(events, key=lambda event: (event.timestamp, event.event)))
+    assert [
+        (s.appliance_id, s.session_id, s.trigger_time, s.start_time, s.end_time, s.program, s.details.keys())
+        for s in sessions
+    ] == expected
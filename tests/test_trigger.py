@@ -0,0 +1,14 @@
+from homeconnect_watcher.trigger import Trigger, TriggerTable
+
+
+def test_merge():
+    table = TriggerTable()
+    assert table.add(Trigger(appliance_id="a", status=True, interval=True))
+    assert not table.add(Trigger(appliance_id="a", status=True, settings=True, interval=True))
+    assert not table.add(Trigger(appliance_id="a", active_program=True, settings=True))
+    assert table.add(Trigger(appliance_id="b", selected_program=True))
+    assert len(table) == 2
+    assert table.pop("a") == {"status": True, "settings": False, "active_program": False}
+    assert table.pop("b") == {"selected_program": False}
+    assert table.pop("a") == {}
+    assert len(table) == 0
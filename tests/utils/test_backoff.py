@@ -0,0 +1,12 @@
+from homeconnect_watcher.utils import Backoff
+
+
+def test_backoff():
+    backoff = Backoff(initial=1, factor=2, maximum=10, seed=0)
+    delays = [backoff.next_delay() for _ in range(8)]
+    assert delays[0] == 0
+    for attempt, delay in enumerate(delays[1:], start=2):
+        assert 0 <= delay <= min(10, 2 ** (attempt - 2))
+    assert backoff.cap(1000) == 10
+    backoff.reset()
+    assert backoff.next_delay() == 0
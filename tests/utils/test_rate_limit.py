@@ -0,0 +1,36 @@
+from time import monotonic
+
+from pytest import mark
+
+from homeconnect_watcher.utils.rate_limit import RateLimiter, TokenBucket
+
+
+def test_token_bucket():
+    bucket = TokenBucket(capacity=2, period=10)
+    now = monotonic()
+    assert bucket.delay(now) == 0
+    bucket.take()
+    bucket.take()
+    assert 4.9 < bucket.delay(now) <= 5
+    assert bucket.delay(now + 5) == 0
+    assert bucket.delay(now + 100) == 0
+    assert bucket.tokens == 2  # Does not refill beyond its capacity.
+
+
+@mark.asyncio
+async def test_rate_limiter():
+    limiter = RateLimiter(limits=((3, 0.3), (100, 60)))
+    start = monotonic()
+    for _ in range(5):
+        await limiter.acquire()
+    # Three requests can be made right away, the next two at 0.1 second intervals.
+    assert 0.15 < monotonic() - start < 0.5
+
+
+@mark.asyncio
+async def test_back_off():
+    limiter = RateLimiter()
+    limiter.back_off(0.2)
+    start = monotonic()
+    await limiter.acquire()
+    assert monotonic() - start >= 0.2